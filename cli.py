@@ -1,13 +1,80 @@
 #!/usr/bin/env python3
+import sys
 
 from llm_service import llm_service
+from llm_service.utils.artifact_store import ArtifactStore, HANDLE_PREFIX, to_tsv
+
+HELP = """Commands:
+  /show <artifact> [rows]    print up to [rows] rows of a stored result (default 20)
+  /export <artifact> <path>  write a stored result to a CSV file
+  /plot <artifact>           plot a stored result (requires matplotlib)"""
+
+
+def handle_command(line):
+    """
+    Run a slash command on stored results. Artifacts are only loaded here,
+    never as part of the chat text.
+    """
+    parts = line.split()
+    command, args = parts[0], parts[1:]
+    if command == "/help" or not args:
+        print(HELP)
+        return
+
+    store = ArtifactStore()
+    artifact_id = args[0].removeprefix(HANDLE_PREFIX)
+    try:
+        if not store.exists(artifact_id):
+            print(f"Unknown artifact: {artifact_id}")
+            return
+
+        if command == "/show":
+            rows = int(args[1]) if len(args) > 1 else 20
+            columns, data = store.slice(artifact_id, max_rows=rows)
+            print(to_tsv(columns, data))
+        elif command == "/export":
+            if len(args) < 2:
+                print("Usage: /export <artifact> <path>")
+                return
+            columns, data = store.load(artifact_id)
+            with open(args[1], "w") as f:
+                f.write(",".join(columns) + "\n")
+                for row in data:
+                    f.write(",".join(f"{v:.10g}" for v in row) + "\n")
+            print(f"Wrote {len(data)} rows to {args[1]}")
+        elif command == "/plot":
+            try:
+                import matplotlib.pyplot as plt
+            except ImportError:
+                print("matplotlib is not installed; use /export instead.")
+                return
+            columns, data = store.load(artifact_id)
+            for i, name in enumerate(columns[1:], start=1):
+                plt.plot(data[:, 0], data[:, i], label=name)
+            plt.xlabel(columns[0])
+            plt.legend()
+            plt.show()
+        else:
+            print(HELP)
+    except (ValueError, KeyError, OSError) as err:
+        print(f"Error: {err}")
+
+
+def show_progress(tool, progress, total, message):
+    """
+    Redraw a one-line progress bar for a long-running tool
+    """
+    fraction = progress / total if total else 0.0
+    bar = "#" * int(fraction * 20)
+    sys.stdout.write(f"\r  {tool}: [{bar:<20}] {fraction:4.0%} {message or ''}".ljust(79)[:79])
+    sys.stdout.flush()
+
 
 def run_cli():
     """
     Simple command-line chat loop. Type 'exit' or 'quit' to end.
     """
-    history = []
-    print(f"Tellurium Chatbot CLI (Model: {llm_service.get_model_name()}). Type 'exit' or 'quit' to end.\n")
+    print(f"Tellurium Chatbot CLI (Model: {llm_service.get_model_name()}). Type 'exit' or 'quit' to end, '/help' for commands.\n")
     while True:
         try:
             prompt = input("You: ")
@@ -19,16 +86,22 @@ def run_cli():
             print("Goodbye!")
             break
 
-        # record user message
-        history.append({"role": "user", "content": prompt})
+        if prompt.startswith("/"):
+            handle_command(prompt)
+            continue
 
-        # send to your service
-        print("Assistant is thinking…")
-        reply = llm_service.send_message(prompt)
+        # send to your service (the session keeps the conversation state)
+        print("Assistant is thinking… (Ctrl+C to cancel)")
+        try:
+            reply = llm_service.send_message(prompt, on_progress=show_progress)
+        except KeyboardInterrupt:
+            # Interrupting the wait cancels the query and its server-side jobs
+            llm_service.cancel_message()
+            reply = "Cancelled."
+        print()
 
-        # show and record assistant reply
+        # show assistant reply
         print(f"Assistant: {reply}\n")
-        history.append({"role": "assistant", "content": reply})
 
 
 if __name__ == "__main__":
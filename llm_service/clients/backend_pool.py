@@ -0,0 +1,433 @@
+"""
+Pool of interchangeable LLM backends (several Ollama hosts, or several
+OpenAI-compatible base URLs) used as one.
+
+* Balancing: each request goes to the healthy backend with the fewest
+  outstanding requests (ties broken by recent latency).
+* Circuit breaking: after ``failure_threshold`` consecutive transient
+  failures a backend is skipped for ``cooldown`` seconds, then a single
+  trial request decides whether it rejoins the pool.
+* Health checks: a background task probes backends whose breaker is open.
+* Failover: a transient failure is retried once on another backend.
+* Hedging (optional): if the first answer has not arrived after the
+  pool's recent p95 latency, the same request is sent to a second backend
+  and whichever answers first wins.
+
+Run ``python -m llm_service.clients.backend_pool`` to exercise a pool
+against local stub Ollama servers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+
+from ..utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.backend_pool")
+
+T = TypeVar("T")
+Request = Callable[[Any], Awaitable[T]]
+
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0").lower() in ("1", "true", "yes")
+
+
+def split_urls(value: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated list of base URLs (e.g. OLLAMA_HOSTS)
+    """
+    return [u.strip() for u in (value or "").split(",") if u.strip()]
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Whether a failure says something about the backend rather than the request
+    """
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    try:
+        import openai
+        return isinstance(exc, openai.APIConnectionError)
+    except ImportError:
+        return False
+
+
+class Backend:
+    """
+    One base URL with its client, load and breaker state
+    """
+
+    def __init__(self, url: Optional[str], client: Any):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.failures = 0  # consecutive transient failures
+        self.state = "closed"  # closed → open → half_open → closed
+        self.opened_at = 0.0
+        self.latencies: Deque[float] = deque(maxlen=100)
+        self.stats = {"requests": 0, "errors": 0, "hedges_won": 0}
+
+    @property
+    def latency(self) -> float:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"state": self.state, "outstanding": self.outstanding, "consecutive_failures": self.failures,
+                "mean_latency_s": round(self.latency, 3), **self.stats}
+
+
+class BackendPool:
+    """
+    Least-outstanding-requests pool with circuit breaking, failover and hedging
+    """
+
+    def __init__(self, name: str, urls: Sequence[Optional[str]], make_client: Callable[[Optional[str]], Any],
+                 health_check: Optional[Request] = None, hedge: bool = LLM_HEDGING,
+                 hedge_quantile: float = 0.95, hedge_min_delay: float = 0.25, failure_threshold: int = 3,
+                 cooldown: float = 15.0, health_interval: float = 10.0, max_attempts: int = 2):
+        """
+        Initialize the pool
+
+        Args:
+            name: Label for logs and stats
+            urls: Base URLs (None means the client library's default)
+            make_client: Builds a client for one URL
+            health_check: Cheap request used to probe a backend
+            hedge: Send a duplicate request when the first is slower than usual
+            hedge_quantile: Latency quantile after which to hedge
+            hedge_min_delay: Never hedge sooner than this (seconds)
+            failure_threshold: Consecutive failures that open a breaker
+            cooldown: Seconds an open breaker waits before a trial request
+            health_interval: Seconds between health probes of open backends
+            max_attempts: Attempts per request, each on a different backend if possible
+        """
+        if not urls:
+            raise ValueError("A backend pool needs at least one URL")
+        self.name = name
+        self.backends = [Backend(url, make_client(url)) for url in urls]
+        self.health_check = health_check
+        self.hedge = hedge and len(self.backends) > 1
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.max_attempts = max_attempts
+        self.stats = {"requests": 0, "failovers": 0, "hedged": 0, "failed": 0}
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self._health_task: Optional[asyncio.Task] = None
+
+    # -- selection and breaker -------------------------------------------
+
+    def _usable(self, backend: Backend, now: float) -> bool:
+        """
+        Whether a backend may take a request: its breaker is closed, or open
+        past the cooldown (the request is then its one trial)
+        """
+        if backend.state == "closed":
+            return True
+        return backend.state == "open" and now - backend.opened_at >= self.cooldown
+
+    def pick(self, exclude: Sequence[Backend] = ()) -> Optional[Backend]:
+        """
+        Healthy backend with the fewest outstanding requests
+
+        Only the returned backend changes state: if its breaker was open,
+        it turns half open so no second trial is sent while this one runs.
+        """
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and self._usable(b, now)]
+        if not candidates:
+            return None
+        backend = min(candidates, key=lambda b: (b.outstanding, b.latency, random.random()))
+        if backend.state == "open":
+            backend.state = "half_open"
+        return backend
+
+    def _on_success(self, backend: Backend, latency: float):
+        if backend.state != "closed":
+            logger.info(f"{self.name}: backend {backend.url or 'default'} recovered")
+        backend.state = "closed"
+        backend.failures = 0
+        backend.latencies.append(latency)
+        self._latencies.append(latency)
+
+    def _on_failure(self, backend: Backend, exc: BaseException):
+        backend.stats["errors"] += 1
+        if not is_transient(exc):
+            return
+        backend.failures += 1
+        if backend.state == "half_open" or backend.failures >= self.failure_threshold:
+            if backend.state != "open":
+                logger.warning(f"{self.name}: opening circuit for {backend.url or 'default'}: {exc}")
+            backend.state = "open"
+            backend.opened_at = time.monotonic()
+
+    def hedge_delay(self) -> float:
+        """
+        Recent latency quantile, the wait before sending a hedge
+        """
+        if len(self._latencies) < 20:
+            return max(self.hedge_min_delay, 2.0)
+        ordered = sorted(self._latencies)
+        return max(self.hedge_min_delay, ordered[int(self.hedge_quantile * (len(ordered) - 1))])
+
+    # -- requests ----------------------------------------------------------
+
+    def _launch(self, backend: Backend, request: Request) -> asyncio.Future:
+        # Count the request before yielding, so concurrent picks see it
+        backend.outstanding += 1
+        backend.stats["requests"] += 1
+        return asyncio.ensure_future(self._attempt(backend, request))
+
+    async def _attempt(self, backend: Backend, request: Request):
+        start = time.perf_counter()
+        try:
+            result = await request(backend.client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._on_failure(backend, e)
+            raise
+        finally:
+            backend.outstanding -= 1
+        self._on_success(backend, time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, backend: Backend, request: Request):
+        """
+        Run on backend; if it is slow, race a duplicate on another backend
+        """
+        primary = self._launch(backend, request)
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        other = self.pick(exclude=[backend])
+        if other is None:
+            return await primary
+        self.stats["hedged"] += 1
+        secondary = self._launch(other, request)
+        pending = {primary, secondary}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            other.stats["hedges_won"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _ensure_health_checks(self):
+        if self.health_check is None or (self._health_task is not None and not self._health_task.done()):
+            return
+        try:
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+        except RuntimeError:
+            pass
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for backend in self.backends:
+                if backend.state == "closed":
+                    continue
+                start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self.health_check(backend.client), timeout=5.0)
+                except Exception as e:
+                    backend.opened_at = time.monotonic()
+                    backend.state = "open"
+                    logger.debug(f"{self.name}: health check of {backend.url or 'default'} failed: {e}")
+                else:
+                    self._on_success(backend, time.perf_counter() - start)
+
+    async def call(self, request: Request) -> T:
+        """
+        Run request(client) on the best backend, with failover and optional hedging
+
+        Args:
+            request: Coroutine function taking a client
+
+        Returns:
+            The request's result
+        """
+        self._ensure_health_checks()
+        self.stats["requests"] += 1
+        tried: List[Backend] = []
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_attempts):
+            backend = self.pick(exclude=tried) or (self.pick() if tried else None)
+            if backend is None:
+                # Every breaker is open: try the one that failed longest ago
+                backend = min(self.backends, key=lambda b: b.opened_at)
+            tried.append(backend)
+            try:
+                if self.hedge:
+                    return await self._hedged(backend, request)
+                return await self._launch(backend, request)
+            except Exception as e:
+                last_error = e
+                if not is_transient(e) or attempt + 1 == self.max_attempts:
+                    break
+                self.stats["failovers"] += 1
+                logger.warning(f"{self.name}: {backend.url or 'default'} failed ({e}); retrying")
+                await asyncio.sleep(random.uniform(0.05, 0.25) * (attempt + 1))
+        self.stats["failed"] += 1
+        raise last_error
+
+    async def broadcast(self, request: Request) -> List[Any]:
+        """
+        Run request on every backend (e.g. to preload a model everywhere)
+
+        Returns:
+            Results or exceptions, one per backend
+        """
+        return await asyncio.gather(*(self._launch(b, request) for b in self.backends),
+                                    return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "hedging": self.hedge,
+            "hedge_delay_s": round(self.hedge_delay(), 3) if self.hedge else None,
+            "backends": {b.url or "default": b.as_dict() for b in self.backends},
+        }
+
+
+_pools: Dict[Tuple[str, Tuple[Optional[str], ...]], BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_backend_pool(name: str, urls: Sequence[Optional[str]], make_client: Callable[[Optional[str]], Any],
+                     **kwargs) -> BackendPool:
+    """
+    Process-wide pool for a set of URLs, so breakers, load counts and
+    health checks are shared by every session's adapter
+    """
+    key = (name, tuple(urls))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = BackendPool(name, urls, make_client, **kwargs)
+        return pool
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    with _pools_lock:
+        return {f"{name} {','.join(u or 'default' for u in urls)}": p.get_stats()
+                for (name, urls), p in _pools.items()}
+
+
+# ----------------------------------------------------------------------
+#  Stub servers for local testing
+# ----------------------------------------------------------------------
+
+def start_stub_ollama(port: int = 0, delay: float = 0.05, jitter: float = 0.0, failure_rate: float = 0.0):
+    """
+    Start a minimal Ollama look-alike (/api/tags, /api/chat) on a thread
+
+    Args:
+        port: Local port (0 picks a free one; see server.server_port)
+        delay: Seconds before each chat reply
+        jitter: Extra random delay up to this many seconds (creates a tail)
+        failure_rate: Fraction of chat requests answered with HTTP 500
+
+    Returns:
+        The HTTP server (call shutdown() to stop it)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: Dict[str, Any]):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._send(200, {"models": []})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(delay + random.uniform(0, jitter))
+            if random.random() < failure_rate:
+                self._send(500, {"error": "stub failure"})
+                return
+            self._send(200, {
+                "model": request.get("model", "stub"),
+                "created_at": "1970-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": f"reply from stub :{port}"},
+                "done": True,
+                "prompt_eval_count": 1,
+                "eval_count": 1,
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, name=f"stub-ollama-{port}", daemon=True).start()
+    return server
+
+
+async def _demo(args):
+    from ollama import AsyncClient
+
+    servers = [
+        start_stub_ollama(args.port, delay=0.05),
+        start_stub_ollama(args.port + 1, delay=0.05, jitter=args.jitter),
+        start_stub_ollama(args.port + 2, delay=0.05, failure_rate=args.failure_rate),
+    ]
+    urls = [f"http://127.0.0.1:{args.port + i}" for i in range(len(servers))]
+    pool = BackendPool("stub-ollama", urls, lambda url: AsyncClient(host=url),
+                       health_check=lambda c: c.list(), hedge=args.hedge, health_interval=1.0)
+
+    async def one():
+        start = time.perf_counter()
+        await pool.call(lambda c: c.chat(model="stub", messages=[{"role": "user", "content": "hi"}]))
+        return time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.requests // args.concurrency):
+        latencies += await asyncio.gather(*(one() for _ in range(args.concurrency)), return_exceptions=True)
+    ok = sorted(l for l in latencies if isinstance(l, float))
+    print(json.dumps(pool.get_stats(), indent=2))
+    if ok:
+        print(f"ok={len(ok)} failed={len(latencies) - len(ok)} "
+              f"p50={ok[len(ok) // 2] * 1000:.0f}ms p95={ok[int(0.95 * (len(ok) - 1))] * 1000:.0f}ms")
+    for server in servers:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise a backend pool against local stub Ollama servers")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--jitter", type=float, default=1.0, help="Tail latency of the second stub")
+    parser.add_argument("--failure-rate", type=float, default=0.5, help="Error rate of the third stub")
+    parser.add_argument("--hedge", action="store_true")
+    asyncio.run(_demo(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
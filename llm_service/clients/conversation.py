@@ -0,0 +1,220 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils.logging_utils import setup_logging
+from ..utils.tokens import estimate_tokens, truncate_to_tokens
+
+logger = setup_logging("llm_service.conversation")
+
+Turn = Tuple[str, str]  # (user message, assistant reply)
+Summarizer = Callable[[str, List[Turn], int], Awaitable[str]]
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+RETRIEVAL_HEADER = "Possibly relevant earlier exchanges:"
+
+# Sent verbatim as the first message of every request. Prompt caches
+# (OpenAI prompt caching, Ollama's KV cache) only reuse an identical
+# prefix, so this text must not vary between requests.
+SYSTEM_PROMPT = (
+    "You are a modelling assistant for systems biology with Tellurium and "
+    "Antimony. Use the available tools to build, simulate and fit models "
+    "instead of inventing numerical results, and keep answers concise."
+)
+
+
+class ConversationState:
+    """
+    Rolling conversation window with an incrementally updated summary
+
+    The last `window_turns` turns are sent verbatim. Older turns are folded
+    into a running summary in the background after each turn, so the prompt
+    stays within a fixed budget however long the session runs.
+    """
+
+    def __init__(self, window_turns: int = 4, summary_token_budget: int = 300, turn_token_limit: int = 400):
+        """
+        Initialize the conversation state
+
+        Args:
+            window_turns: Number of most recent turns kept verbatim
+            summary_token_budget: Maximum size of the running summary
+            turn_token_limit: Maximum size of each verbatim message
+        """
+        self.window_turns = window_turns
+        self.summary_token_budget = summary_token_budget
+        self.turn_token_limit = turn_token_limit
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self._pending: List[Turn] = []  # folded out of the window, not yet summarized
+        self._summary_lock = asyncio.Lock()
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def build_messages(self, query: str) -> List[Dict[str, str]]:
+        """
+        Build the message list for a new query
+
+        Args:
+            query: User query text
+
+        Returns:
+            System prompt, summary (as a system message), recent turns and
+            the new user message, most stable first
+        """
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"{SUMMARY_HEADER}\n{self.summary}"
+            })
+
+        # Turns awaiting summarization are still sent so no context is lost
+        for user_msg, assistant_msg in self._pending + self.turns:
+            messages.append({"role": "user", "content": truncate_to_tokens(user_msg, self.turn_token_limit)})
+            messages.append({"role": "assistant", "content": truncate_to_tokens(assistant_msg, self.turn_token_limit)})
+
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    def record_turn(self, user_msg: str, assistant_msg: str, summarizer: Optional[Summarizer] = None):
+        """
+        Append a completed turn and fold overflow into the summary in the background
+
+        Args:
+            user_msg: User message of the turn
+            assistant_msg: Assistant reply of the turn
+            summarizer: Coroutine (summary, turns, max_tokens) -> new summary
+        """
+        self.turns.append((user_msg, assistant_msg))
+        while len(self.turns) > self.window_turns:
+            self._pending.append(self.turns.pop(0))
+
+        if self._pending and (self._summary_task is None or self._summary_task.done()):
+            self._summary_task = asyncio.create_task(self._update_summary(summarizer))
+
+    async def _update_summary(self, summarizer: Optional[Summarizer]):
+        """
+        Fold pending turns into the running summary
+        """
+        async with self._summary_lock:
+            while self._pending:
+                batch = list(self._pending)
+                try:
+                    if summarizer is None:
+                        raise RuntimeError("no summarizer available")
+                    summary = await summarizer(self.summary, batch, self.summary_token_budget)
+                except Exception as e:
+                    logger.warning(f"Summarization failed, falling back to truncation: {e}")
+                    lines = [f"User: {u}\nAssistant: {a}" for u, a in batch]
+                    summary = "\n".join([self.summary] + lines).strip()
+
+                # Keep the most recent information if the summarizer overshoots
+                self.summary = truncate_to_tokens(summary, self.summary_token_budget, keep="tail")
+                del self._pending[:len(batch)]
+                logger.debug(f"Summary updated ({estimate_tokens(self.summary)} tokens)")
+
+    async def flush(self):
+        """
+        Wait for any background summarization to finish
+        """
+        if self._summary_task is not None:
+            await self._summary_task
+
+    def clear(self):
+        """
+        Forget all turns and the summary
+        """
+        self.summary = ""
+        self.turns.clear()
+        self._pending.clear()
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and a "
+    "Tellurium modelling assistant. Merge the new turns into the existing "
+    "summary. Keep models, parameter values, simulation settings, results and "
+    "open questions; drop pleasantries and raw data tables. Reply with the "
+    "updated summary only, at most {max_tokens} tokens."
+)
+
+
+def build_summary_messages(summary: str, turns: List[Turn], max_tokens: int) -> List[Dict[str, str]]:
+    """
+    Build the prompt asking a model to fold turns into the running summary
+
+    Args:
+        summary: Current summary (may be empty)
+        turns: Turns to fold in
+        max_tokens: Token budget for the new summary
+
+    Returns:
+        Message list for a chat completion
+    """
+    new_turns = "\n\n".join(
+        f"User: {truncate_to_tokens(u, max_tokens)}\nAssistant: {truncate_to_tokens(a, max_tokens)}"
+        for u, a in turns
+    )
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_tokens=max_tokens)},
+        {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{new_turns}"},
+    ]
+
+
+def insert_retrieved(messages: List[Dict[str, Any]], turns: List[Turn]) -> List[Dict[str, Any]]:
+    """
+    Add retrieved turns as one system message just before the new user message
+
+    Retrieval changes with every query, so it goes after the stable prefix
+    (system prompt, summary, recent turns) instead of in front of it.
+
+    Args:
+        messages: Messages from build_messages (ending with the user message)
+        turns: Retrieved (user, assistant) turns
+
+    Returns:
+        New message list
+    """
+    if not turns:
+        return list(messages)
+    block = "\n\n".join(f"User: {u}\nAssistant: {a}" for u, a in turns)
+    context = {"role": "system", "content": f"{RETRIEVAL_HEADER}\n{block}"}
+    return list(messages[:-1]) + [context] + list(messages[-1:])
+
+
+_tool_schemas: "OrderedDict[int, Tuple[List[Any], List[Dict[str, Any]]]]" = OrderedDict()
+
+
+def tool_schemas(tools: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Function-calling definitions of MCP tools, in the format both OpenAI and
+    Ollama accept
+
+    Tools are sorted by name and schemas normalized to sorted keys, so the
+    serialized definitions are byte-identical from request to request. The
+    result is computed once per tool list (the client keeps one list until
+    it refreshes its tools) and reused.
+
+    Args:
+        tools: MCP Tool objects
+
+    Returns:
+        List of {"type": "function", "function": {...}} definitions
+    """
+    cached = _tool_schemas.get(id(tools))
+    if cached is not None and cached[0] is tools:
+        return cached[1]
+    schemas = [{
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": tool.description or "",
+            "parameters": json.loads(json.dumps(
+                tool.inputSchema or {"type": "object", "properties": {}}, sort_keys=True)),
+        },
+    } for tool in sorted(tools, key=lambda t: t.name)]
+    # Holding the list keeps its id from being reused by another one
+    _tool_schemas[id(tools)] = (tools, schemas)
+    while len(_tool_schemas) > 16:
+        _tool_schemas.popitem(last=False)
+    return schemas
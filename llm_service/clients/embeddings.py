@@ -0,0 +1,398 @@
+"""
+Embedding backends for retrieval and the response cache.
+
+The same sentence-transformers model can run on three CPU backends:
+
+* ``torch``: the stock PyTorch model (default)
+* ``onnx``: ONNX Runtime, exported once and cached locally
+* ``onnx-int8``: ONNX Runtime with dynamic int8 quantization for the host CPU
+
+The backend is chosen with the ``EMBED_BACKEND`` environment variable.
+Exported models live under ``EMBED_CACHE_DIR``. The ONNX backends need
+``optimum[onnxruntime]``; if it is missing the service falls back to
+``torch`` (the benchmark refuses to, so it never mislabels a backend).
+
+All sessions share one model per (model, backend) through
+``get_embedding_service()``. It collects encode requests from every
+caller and runs them as micro-batches on a single worker thread.
+
+Run ``python -m llm_service.clients.embeddings`` to compare the backends.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import queue
+import re
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.embeddings")
+
+DEFAULT_EMBED_MODEL = "all-MiniLM-L6-v2"
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_CACHE_DIR = os.getenv(
+    "EMBED_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tellurium_chatbot", "embeddings"),
+)
+
+
+def _quantization_config() -> str:
+    """
+    Pick the int8 kernel set matching this CPU
+    """
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(EMBED_CACHE_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name) + "-onnx")
+
+
+def _load_onnx(model_name: str, quantize: bool):
+    from sentence_transformers import SentenceTransformer
+
+    export_dir = _export_dir(model_name)
+    if not os.path.isfile(os.path.join(export_dir, "onnx", "model.onnx")):
+        logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+        model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        model.save_pretrained(export_dir)
+    else:
+        model = SentenceTransformer(export_dir, backend="onnx", device="cpu")
+
+    if not quantize:
+        return model
+
+    config = _quantization_config()
+    file_name = os.path.join("onnx", f"model_qint8_{config}.onnx")
+    if not os.path.isfile(os.path.join(export_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        logger.info(f"Quantizing {model_name} to int8 ({config})")
+        export_dynamic_quantized_onnx_model(model, config, export_dir)
+    return SentenceTransformer(export_dir, backend="onnx", device="cpu",
+                               model_kwargs={"file_name": file_name})
+
+
+def create_embedder(model_name: str = DEFAULT_EMBED_MODEL, backend: Optional[str] = None,
+                    fallback: bool = True):
+    """
+    Load a sentence-transformers model on the configured CPU backend
+
+    Args:
+        model_name: sentence-transformers model name or path
+        backend: One of EMBED_BACKENDS (defaults to EMBED_BACKEND)
+        fallback: Load the torch model if an ONNX backend is unavailable
+                  (otherwise the error is raised)
+
+    Returns:
+        SentenceTransformer instance
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or EMBED_BACKEND
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; choose from {EMBED_BACKENDS}")
+
+    if backend != "torch":
+        try:
+            return _load_onnx(model_name, quantize=backend == "onnx-int8")
+        except Exception as e:
+            if not fallback:
+                raise
+            if isinstance(e, ImportError):
+                logger.warning(f"{backend} embeddings unavailable ({e}); install optimum[onnxruntime]. "
+                               "Falling back to torch.")
+            else:
+                logger.warning(f"Could not load {backend} embeddings ({e}); falling back to torch.")
+
+    return SentenceTransformer(model_name, device="cpu")
+
+
+class EmbeddingService:
+    """
+    Micro-batching front end for one embedding model
+
+    Requests from any thread or event loop are queued. A worker thread takes
+    whatever arrives within ``max_wait`` seconds of the first request (up to
+    ``max_batch`` texts) and encodes it in one forward pass. Results come
+    back through futures. ``encode`` mirrors SentenceTransformer.encode, so
+    the service is a drop-in replacement for the adapters' embedder.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBED_MODEL, backend: Optional[str] = None,
+                 max_batch: int = 64, max_wait: float = 0.005):
+        """
+        Load the model and start the worker
+
+        Args:
+            model_name: sentence-transformers model name or path
+            backend: One of EMBED_BACKENDS (defaults to EMBED_BACKEND)
+            max_batch: Maximum number of texts per forward pass
+            max_wait: Seconds to wait for more requests after the first one
+        """
+        self.model = create_embedder(model_name, backend)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "errors": 0}
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        """
+        Queue texts for encoding
+
+        Returns:
+            Future resolving to a float32 array of shape (len(texts), dimension)
+        """
+        if self._closed:
+            raise RuntimeError("Embedding service is closed")
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, sentences: Union[str, Sequence[str]], **kwargs) -> np.ndarray:
+        """
+        Blocking encode (one vector for a string, a matrix for a list)
+        """
+        single = isinstance(sentences, str)
+        result = self.submit([sentences] if single else sentences).result()
+        return result[0] if single else result
+
+    async def aencode(self, sentences: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Encode without blocking the event loop, so concurrent sessions batch together
+        """
+        single = isinstance(sentences, str)
+        result = await asyncio.wrap_future(self.submit([sentences] if single else sentences))
+        return result[0] if single else result
+
+    def _collect(self, first: Tuple[List[str], Future]) -> List[Tuple[List[str], Future]]:
+        batch, size = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let _run see the shutdown marker
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [(texts, f) for texts, f in self._collect(item) if f.set_running_or_notify_cancel()]
+            texts = [t for request, _ in batch for t in request]
+            if not texts:
+                for _, future in batch:
+                    future.set_result(np.zeros((0, self.dimension), dtype=np.float32))
+                continue
+            try:
+                vectors = np.asarray(
+                    self.model.encode(texts, batch_size=len(texts), show_progress_bar=False),
+                    dtype=np.float32,
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+            offset = 0
+            for request, future in batch:
+                future.set_result(vectors[offset:offset + len(request)])
+                offset += len(request)
+
+    def get_stats(self) -> Dict[str, float]:
+        stats = dict(self.stats)
+        stats["mean_batch_size"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        """
+        Stop the worker after the queued requests are served
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+
+
+_services: Dict[Tuple[str, str], EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_EMBED_MODEL, backend: Optional[str] = None) -> EmbeddingService:
+    """
+    Process-wide embedding service for a model and backend (one model copy per host process)
+    """
+    key = (model_name, backend or EMBED_BACKEND)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = EmbeddingService(model_name, key[1])
+        return service
+
+
+def get_embedding_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Batching metrics of every loaded embedding service
+    """
+    with _services_lock:
+        return {f"{name}/{backend}": s.get_stats() for (name, backend), s in _services.items()}
+
+
+# ----------------------------------------------------------------------
+#  Benchmark
+# ----------------------------------------------------------------------
+
+BENCHMARK_SENTENCES = [
+    "Simulate S1 -> S2 with k1 = 0.1 from 0 to 50.",
+    "What does the Hill coefficient control in a repression model?",
+    "Plot the oscillations of the repressilator for 500 time units.",
+    "Fit k1 and k2 to my time-course data.",
+    "Which tellurium version is installed on the server?",
+    "Explain the difference between mass-action and Michaelis-Menten kinetics.",
+    "Add a degradation reaction for protein P with rate kd.",
+    "Why does my model reach steady state so quickly?",
+    "Compute the steady state of the glycolysis model.",
+    "How do I define an event that triggers at time 10?",
+    "Show the concentration of ATP at the end of the simulation.",
+    "Change the initial concentration of S1 to 5 and rerun.",
+    "What is a boundary species in Antimony?",
+    "Run a parameter scan over k1 between 0.01 and 1.",
+    "Export the last result as CSV.",
+    "Summarize what we have done in this conversation so far.",
+]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _top_k(embeddings: np.ndarray, k: int) -> List[set]:
+    e = _normalize(embeddings)
+    scores = e @ e.T
+    np.fill_diagonal(scores, -np.inf)
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def benchmark_backend(backend: str, model_name: str = DEFAULT_EMBED_MODEL,
+                      sentences: List[str] = BENCHMARK_SENTENCES, repeats: int = 50) -> Dict[str, object]:
+    """
+    Measure load time, encode latency and peak memory for one backend
+
+    Each backend should run in a fresh process so the memory figure is not
+    polluted by the previous one; the CLI below does that.
+
+    Raises:
+        Exception: The backend can't be loaded (no fallback to torch here,
+                   which would be reported under the wrong name)
+    """
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model = create_embedder(model_name, backend, fallback=False)
+    load_s = time.perf_counter() - start
+    built = getattr(model, "backend", "torch")
+    if built != backend.split("-")[0]:
+        raise RuntimeError(f"Asked for the {backend} backend but {type(model).__name__} loaded {built}")
+
+    model.encode(sentences[0])  # first call pays one-off graph setup
+    single = []
+    for i in range(repeats):
+        t = time.perf_counter()
+        model.encode(sentences[i % len(sentences)])
+        single.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    batch = model.encode(sentences)
+    batch_ms = (time.perf_counter() - t) * 1000
+
+    return {
+        "backend": backend,
+        "built": f"{type(model).__name__}({built})",
+        "load_s": load_s,
+        "single_p50_ms": statistics.median(single),
+        "single_p95_ms": sorted(single)[int(0.95 * (len(single) - 1))],
+        "batch_ms": batch_ms,
+        "rss_delta_mb": _rss_mb() - rss_before,
+        "embeddings": np.asarray(batch, dtype=np.float32),
+    }
+
+
+def _run_in_subprocess(backend: str, model_name: str, repeats: int) -> Dict[str, object]:
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(benchmark_backend, (backend, model_name, BENCHMARK_SENTENCES, repeats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU embedding backends")
+    parser.add_argument("--model", default=DEFAULT_EMBED_MODEL)
+    parser.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS), choices=EMBED_BACKENDS)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("-k", type=int, default=3, help="Neighbours compared for retrieval agreement")
+    args = parser.parse_args()
+
+    results = [_run_in_subprocess(b, args.model, args.repeats) for b in args.backends]
+    reference = results[0]["embeddings"]
+    reference_top = _top_k(reference, args.k)
+
+    print(f"{'backend':<10} {'built':<26} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'batch ms':>9} "
+          f"{'RSS MB':>7} {'cosine':>7} {'top-k':>6}")
+    for r in results:
+        emb = r["embeddings"]
+        cosine = float(np.mean(np.sum(_normalize(emb) * _normalize(reference), axis=1)))
+        agreement = float(np.mean([len(a & b) / args.k for a, b in zip(_top_k(emb, args.k), reference_top)]))
+        print(f"{r['backend']:<10} {r['built']:<26} {r['load_s']:>7.2f} {r['single_p50_ms']:>7.2f} {r['single_p95_ms']:>7.2f} "
+              f"{r['batch_ms']:>9.2f} {r['rss_delta_mb']:>7.0f} {cosine:>7.4f} {agreement:>6.2f}")
+    print(f"cosine and top-{args.k} agreement are relative to {results[0]['backend']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+_STATUS = re.compile(
+    r"^\s*(please\s+)?((check|show|get|what'?s|what is)\s+(the\s+)?)?(server|api|backend)?\s*(status|health)\s*[?.!]?\s*$"
+    r"|^\s*is\s+the\s+(server|api|backend)\s+(up|alive|running|online)\s*[?.!]?\s*$",
+    re.IGNORECASE,
+)
+_VERSION = re.compile(
+    r"^\s*(please\s+)?((what|which)\s+(version\s+of\s+)?tellurium(\s+version)?\s+(is\s+)?(installed|running|available|do you (have|use))"
+    r"|(what\s+is\s+|what'?s\s+|show\s+|get\s+)?(the\s+)?(installed\s+)?tellurium\s+version)\s*[?.!]?\s*$",
+    re.IGNORECASE,
+)
+
+_SIMULATE = re.compile(r"\b(simulate|run)\b", re.IGNORECASE)
+_CODE = re.compile(r"```(?:antimony)?\s*(.+?)```|`([^`]+)`", re.DOTALL | re.IGNORECASE)
+_NUMBER = r"[-+]?\d+(?:\.\d+)?"
+_TIME_RANGE = re.compile(
+    rf"\bfrom\s+(?:t\s*=\s*)?({_NUMBER})\s+(?:to|until|-)\s+(?:t\s*=\s*)?({_NUMBER})\b"
+    rf"|\b(?:for|until|to)\s+(?:t\s*=\s*)?({_NUMBER})(?!\s*(?:points|steps|samples|rows))\s*(?:time\s*units|seconds|s|minutes|min|hours|h)?\b",
+    re.IGNORECASE,
+)
+_STEPS = re.compile(rf"\b({_NUMBER})\s*(?:points|steps|samples|time\s*points|rows)\b", re.IGNORECASE)
+_WORD = re.compile(r"[^\s,.;:!?()]+")
+# Words a plain simulate command may contain besides the model, the time
+# range and the step count; any other word needs the LLM
+_FILLER = frozenset(
+    "please can could would you me for simulate run a an the this that model simulation it with using "
+    "and of time units".split()
+)
+
+DEFAULT_N_STEPS = 100
+
+
+@dataclass
+class Intent:
+    """
+    An explicit tool invocation recognized without the LLM
+    """
+    tool: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+
+
+def _as_int(text: str) -> Optional[int]:
+    value = float(text)
+    return int(value) if value.is_integer() else None
+
+
+def _parse_simulation(query: str) -> Optional[Intent]:
+    """
+    Parse 'simulate `<antimony>` from A to B [with N points]'
+
+    Only the model, the time range, the step count and filler words may
+    appear; anything else sends the query to the LLM.
+    """
+    if not _SIMULATE.search(query):
+        return None
+
+    blocks = [m.group(1) or m.group(2) for m in _CODE.finditer(query)]
+    models = [b.strip() for b in blocks if b and ("->" in b or "=" in b)]
+    if len(models) != 1:
+        return None
+    antimony = models[0]
+
+    # Time range and step count are read from the text outside the model
+    rest = _CODE.sub(" ", query)
+    time_match = _TIME_RANGE.search(rest)
+    if not time_match:
+        return None
+    steps_match = _STEPS.search(rest)
+
+    # Whatever is left besides filler (parameter edits, follow-up requests,
+    # column choices, ...) is something the tool call would silently ignore
+    leftover = rest
+    for match in sorted(filter(None, (time_match, steps_match)), key=lambda m: m.start(), reverse=True):
+        leftover = leftover[:match.start()] + " " + leftover[match.end():]
+    if any(word.lower() not in _FILLER for word in _WORD.findall(leftover)):
+        return None
+    if time_match.group(1) is not None:
+        t_start, t_end = _as_int(time_match.group(1)), _as_int(time_match.group(2))
+    else:
+        t_start, t_end = 0, _as_int(time_match.group(3))
+
+    n_steps = _as_int(steps_match.group(1)) if steps_match else DEFAULT_N_STEPS
+
+    # Values the tool would reject are left for the LLM to sort out
+    if t_start is None or t_end is None or n_steps is None:
+        return None
+    if t_start < 0 or t_end <= t_start or not 10 <= n_steps <= 1000:
+        return None
+
+    return Intent("tellurium_simulate", {
+        "antimony": antimony,
+        "t_start": t_start,
+        "t_end": t_end,
+        "n_steps": n_steps,
+    })
+
+
+def parse_intent(query: str) -> Optional[Intent]:
+    """
+    Recognize an explicit command that can run without the LLM
+
+    Args:
+        query: User query text
+
+    Returns:
+        Intent, or None when the query is not an unambiguous command
+    """
+    if _STATUS.match(query):
+        return Intent("status")
+    if _VERSION.match(query):
+        return Intent("tellurium_version")
+    return _parse_simulation(query)
+
+
+def _is_error(output: str) -> bool:
+    return output.startswith(("Error", "❌", "Unable"))
+
+
+def render_result(intent: Intent, output: str) -> str:
+    """
+    Templated reply for a fast-path tool call
+
+    Args:
+        intent: The executed intent
+        output: Raw tool output
+
+    Returns:
+        Reply text
+    """
+    if _is_error(output):
+        return output
+
+    if intent.tool == "status":
+        return f"Server status:\n{output}"
+    if intent.tool == "tellurium_version":
+        return f"Installed Tellurium version information:\n{output}"
+    if intent.tool == "tellurium_simulate":
+        # The tool already returns a handle plus a per-species summary
+        return f"Simulation complete.\n{output}"
+    return output
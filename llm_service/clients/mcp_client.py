@@ -1,46 +1,102 @@
 import json
 import asyncio
 import os
-from typing import Optional, Dict, Any, List, Callable
+from typing import Optional, Dict, Any, List, Callable, Set
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters, Tool
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 
 from ..utils.logging_utils import setup_logging
+from .mcp_connection import MCPConnection, ProgressHandler, SessionToolCaller, acquire_connection, release_connection
+from .conversation import ConversationState
+from .response_cache import ResponseCache
+from .retrieval import SessionMemory
+from .usage import UsageTracker
+from .model_router import ModelRouter
+from .intent_parser import Intent, parse_intent, render_result
 from .openai_adapter import OpenAIAdapter
 from .ollama_adapter import OllamaAdapter
 
 # Set up logging
 logger = setup_logging("llm_service.mcp_client")
 
+# Model warm-ups running in the background, kept referenced until they finish
+_warm_ups: Set[asyncio.Task] = set()
+
 
 class MCPClient:
     """
     Client for interacting with MCP (Model Control Protocol) server
     """
 
-    def __init__(self, server_script: str, model_name: str):
+    def __init__(
+            self,
+            server_script: str,
+            model_name: str,
+            namespace: str = "default",
+            server_url: Optional[str] = None,
+            response_cache: Optional[ResponseCache] = None,
+            small_model_name: Optional[str] = None,
+    ):
         """
         Initialize MCP client
 
         Args:
-            server_script: Path to MCP server script
+            server_script: Path to MCP server script (spawned over stdio when no server_url is given)
             model_name: Model to use for queries
+            namespace: Identifier of the conversation this client serves
+            server_url: Streamable HTTP endpoint of an already running MCP server
+            response_cache: Optional semantic cache (may be shared between clients)
+            small_model_name: Fast model for simple queries; enables routing when given
         """
         self.server_script = server_script
+        self.server_url = server_url
+        self._connection: Optional[MCPConnection] = None
         self.model_name = model_name
+        self.namespace = namespace
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
+        self._runner: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
         self.available_tools: List[Tool] = []
         self.tool_map: Dict[str, Tool] = {}
         self.using_openai = self._is_openai_model(model_name)
+        self.conversation = ConversationState()
+        self.usage = UsageTracker(namespace)
+        # Outlives adapter swaps, so switching models keeps the session's memories
+        self.retrieval = SessionMemory(namespace)
+        self.response_cache = response_cache
+
+        self.small_model_name = small_model_name
+        self.fast_path_hits = 0
+
+        # Initialize appropriate model adapter (or a router over two)
+        self.model_adapter = self._create_adapter(model_name)
+        if small_model_name and small_model_name != model_name:
+            self.model_adapter = ModelRouter(
+                small_adapter=self._create_adapter(small_model_name),
+                large_adapter=self.model_adapter,
+            )
+
+    def _create_adapter(self, model_name: str):
+        """
+        Instantiate the adapter matching a model name
 
-        # Initialize appropriate model adapter
-        if self.using_openai:
-            self.model_adapter = OpenAIAdapter(model_name=model_name)
+        Args:
+            model_name: Name of the model
+
+        Returns:
+            OpenAIAdapter or OllamaAdapter
+        """
+        if self._is_openai_model(model_name):
+            adapter = OpenAIAdapter(model_name=model_name, retrieval=self.retrieval)
         else:
-            self.model_adapter = OllamaAdapter(model_name=model_name)
+            adapter = OllamaAdapter(model_name=model_name, retrieval=self.retrieval)
+        adapter.usage = self.usage
+        return adapter
 
     def _is_openai_model(self, model_name: str) -> bool:
         """
@@ -63,6 +119,18 @@ class MCPClient:
             self for method chaining
         """
         try:
+            if self.server_url:
+                logger.info(f"Connecting to MCP server: {self.server_url}")
+                read, write, _ = await self.exit_stack.enter_async_context(
+                    streamablehttp_client(self.server_url)
+                )
+                self.session = await self.exit_stack.enter_async_context(
+                    ClientSession(read, write)
+                )
+                await self.session.initialize()
+                await self._refresh_tools()
+                return self
+
             server_script_path = self.server_script
             is_python = server_script_path.endswith('.py')
             is_js = server_script_path.endswith('.js')
@@ -143,12 +211,13 @@ class MCPClient:
             logger.error(f"Error validating tool arguments: {e}")
             raise ValueError(f"Invalid arguments for tool '{tool_name}': {e}")
 
-    async def process_query(self, query: str) -> str:
+    async def process_query(self, query: str, on_progress: Optional[ProgressHandler] = None) -> str:
         """
         Process a query using the model and available tools
 
         Args:
             query: User query text
+            on_progress: Receives progress notifications of long-running tools
 
         Returns:
             Response text
@@ -156,21 +225,71 @@ class MCPClient:
         if not self.session:
             await self.connect_to_server()
 
-        # Start with the user message
-        messages = [{"role": "user", "content": query}]
+        # Summary of older turns, recent turns verbatim, then the new message
+        messages = self.conversation.build_messages(query)
 
         try:
+            # Explicit commands skip the LLM entirely
+            intent = parse_intent(query)
+            if intent is not None and intent.tool in self.tool_map:
+                reply = await self._run_intent(intent, on_progress)
+                self.conversation.record_turn(query, reply, summarizer=self.model_adapter.summarize)
+                return reply
+
+            query_embedding = None
+            if self.response_cache is not None:
+                query_embedding = await self.retrieval.embed_query(query)
+                cached = self.response_cache.lookup(query, query_embedding)
+                if cached is not None:
+                    self.conversation.record_turn(query, cached, summarizer=self.model_adapter.summarize)
+                    return cached
+
             # Process with appropriate adapter
             interaction_history = await self.model_adapter.process_query(
                 messages,
                 self.available_tools,
-                self.session
+                self._tool_caller(on_progress)
             )
-            return self._format_output(interaction_history)
+            reply = self._format_output(interaction_history)
+            self.conversation.record_turn(query, reply, summarizer=self.model_adapter.summarize)
+
+            # Stored once here rather than by each adapter, so an escalated
+            # query is not remembered twice
+            answers = [h["content"] for h in interaction_history if h["role"] in ("assistant", "assistant_final")]
+            await self.retrieval.store(query, answers[-1] if answers else "")
+
+            if self.response_cache is not None:
+                tool_calls = [h for h in interaction_history if h["role"] in ("tool", "tool_error")]
+                self.response_cache.store(query, query_embedding, reply, tool_calls)
+            return reply
         except Exception as e:
             logger.error(f"Error processing query: {e}")
             return f"Error processing your query: {str(e)}"
 
+    def _tool_caller(self, on_progress: Optional[ProgressHandler] = None) -> SessionToolCaller:
+        """
+        Session wrapper that tags tool calls with this client's namespace
+        and forwards their progress
+        """
+        return SessionToolCaller(self.session, self.namespace, on_progress, self.server_url)
+
+    async def _run_intent(self, intent: Intent, on_progress: Optional[ProgressHandler] = None) -> str:
+        """
+        Execute a parsed command directly and answer from a template
+
+        Args:
+            intent: Intent recognized by the parser
+            on_progress: Receives progress notifications of the tool
+
+        Returns:
+            Response text
+        """
+        args = self._validate_tool_args(intent.tool, intent.arguments)
+        logger.info("Fast path: calling tool %s without the LLM", intent.tool)
+        result = await self._tool_caller(on_progress).call_tool(intent.tool, args)
+        self.fast_path_hits += 1
+        return render_result(intent, "".join(tc.text for tc in result.content))
+
     def _format_output(self, history):
         """
         Format the interaction history into a readable output
@@ -235,19 +354,48 @@ class MCPClient:
             Status message
         """
         new_is_openai = self._is_openai_model(model_name)
+        large = self.model_adapter.large if isinstance(self.model_adapter, ModelRouter) else self.model_adapter
 
         # If switching between API types, initialize the new adapter
         if new_is_openai != self.using_openai:
-            if new_is_openai:
-                self.model_adapter = OpenAIAdapter(model_name=model_name)
-            else:
-                self.model_adapter = OllamaAdapter(model_name=model_name)
+            large = self._create_adapter(model_name)
+        else:
+            large.model_name = model_name
+            if isinstance(large, OllamaAdapter):
+                task = asyncio.create_task(large.warm_up())
+                _warm_ups.add(task)
+                task.add_done_callback(_warm_ups.discard)
+
+        if isinstance(self.model_adapter, ModelRouter):
+            self.model_adapter.large = large
+        else:
+            self.model_adapter = large
 
         self.model_name = model_name
         self.using_openai = new_is_openai
         logger.info(f"Model changed to: {model_name} (API: {'OpenAI' if self.using_openai else 'Ollama'})")
         return f"Model changed to: {model_name} (API: {'OpenAI' if self.using_openai else 'Ollama'})"
 
+    def get_route_stats(self) -> Dict[str, Any]:
+        """
+        Per-route latency and success metrics (empty when routing is off)
+        """
+        if isinstance(self.model_adapter, ModelRouter):
+            return self.model_adapter.get_stats()
+        return {}
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        Token counts, timings, cost and prompt composition of this session's LLM calls
+        """
+        return self.usage.get_stats()
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """
+        Size and eviction metrics of the session's retrieval memory
+        """
+        return self.retrieval.get_stats()
+
     async def cleanup(self):
         """
         Close all connections and clean up resources
@@ -255,6 +403,75 @@ class MCPClient:
         logger.info("Cleaning up resources")
         await self.exit_stack.aclose()
 
+    async def start(self):
+        """
+        Open a persistent connection
+
+        With a server_url the client joins the process-wide shared
+        connection to that server. Otherwise a private stdio server is
+        spawned; its transport's context managers must be exited by the
+        task that entered them, so a dedicated task owns the connection
+        while any other task on the same loop may issue queries through it.
+
+        Returns:
+            self for method chaining
+        """
+        if self.server_url:
+            if self._connection is None:
+                self._connection = await acquire_connection(self.server_url)
+                self.session = self._connection.session
+                self.available_tools = self._connection.available_tools
+                self.tool_map = {t.name: t for t in self.available_tools}
+            return self
+
+        if self._runner is not None and not self._runner.done():
+            return self
+
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._runner = asyncio.create_task(self._hold_connection())
+        await self._ready.wait()
+
+        if self.session is None:
+            # Connection failed: surface the runner's exception
+            runner, self._runner = self._runner, None
+            await runner
+            raise RuntimeError("Not connected to MCP server")
+        return self
+
+    async def _hold_connection(self):
+        """
+        Keep the server connection open until stop() is called
+        """
+        try:
+            await self.connect_to_server()
+            self._ready.set()
+            await self._closing.wait()
+        finally:
+            self._ready.set()
+            await self.cleanup()
+            self.session = None
+            self.exit_stack = AsyncExitStack()
+
+    async def stop(self):
+        """
+        Close a connection opened with start()
+        """
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self.session = None
+            await release_connection(connection)
+            return
+
+        if self._runner is None:
+            return
+        self._closing.set()
+        try:
+            await self._runner
+        except Exception as e:
+            logger.error(f"Error while closing MCP connection: {e}")
+        self._runner = None
+
     async def ask_async(self, query: str) -> str:
         """
         Send a single query and return the response
@@ -269,6 +486,8 @@ class MCPClient:
             await self.connect_to_server()
             return await self.process_query(query)
         finally:
+            # The loop may close after this call; let the summary settle first
+            await self.conversation.flush()
             await self.cleanup()
 
     def ask(self, query: str) -> str:
@@ -0,0 +1,206 @@
+import asyncio
+import uuid
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+import httpx
+from mcp import ClientSession, Tool, types
+from mcp.client.streamable_http import streamablehttp_client
+
+from ..utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.mcp_connection")
+
+# Receives (tool name, progress, total, message) for each progress notification
+ProgressHandler = Callable[[str, float, Optional[float], Optional[str]], Awaitable[None]]
+
+# Cancellation notices being sent, kept referenced until they finish
+_cancellations: Set[asyncio.Task] = set()
+
+
+class MCPConnection:
+    """
+    Long-lived MCP session to a network server, shared by many clients
+    """
+
+    def __init__(self, server_url: str):
+        """
+        Initialize the connection
+
+        Args:
+            server_url: Streamable HTTP endpoint of the MCP server (e.g. http://127.0.0.1:8000/mcp)
+        """
+        self.server_url = server_url
+        self.session: Optional[ClientSession] = None
+        self.available_tools: List[Tool] = []
+        self.refcount = 0
+        self._runner: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+
+    async def open(self):
+        """
+        Connect in a background task that owns the transport
+
+        Returns:
+            self for method chaining
+        """
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._hold())
+        await self._ready.wait()
+
+        if self.session is None:
+            runner, self._runner = self._runner, None
+            await runner
+            raise RuntimeError(f"Not connected to MCP server at {self.server_url}")
+        return self
+
+    async def _hold(self):
+        """
+        Keep the transport open until close() is called
+        """
+        try:
+            async with AsyncExitStack() as stack:
+                read, write, _ = await stack.enter_async_context(
+                    streamablehttp_client(self.server_url)
+                )
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                response = await session.list_tools()
+                self.available_tools = response.tools
+                self.session = session
+                logger.info(f"Connected to MCP server: {self.server_url}")
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            logger.error(f"MCP connection to {self.server_url} failed: {e}")
+            raise
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        """
+        Close the transport and wait for the owner task to finish
+        """
+        if self._runner is None:
+            return
+        self._closing.set()
+        try:
+            await self._runner
+        except Exception as e:
+            logger.error(f"Error while closing MCP connection: {e}")
+        self._runner = None
+
+
+class SessionToolCaller:
+    """
+    Tool-calling view of a (possibly shared) ClientSession for one chat session
+
+    Each call carries the chat session id in the request's _meta, so the
+    server can account load to sessions even though they share a connection.
+    Progress notifications are passed to on_progress. A call with progress
+    runs as a job on the server under an id chosen here, so cancelling the
+    call cancels the job through DELETE /jobs/<id> next to the server URL
+    (streamable HTTP only; over stdio the server finishes the job).
+    Everything else is delegated to the underlying session.
+    """
+
+    def __init__(self, session: ClientSession, session_id: str, on_progress: Optional[ProgressHandler] = None,
+                 server_url: Optional[str] = None):
+        self.session = session
+        self.session_id = session_id
+        self.on_progress = on_progress
+        self.jobs_url = urljoin(server_url, "/jobs/") if server_url else None
+
+    def _cancel_job(self, job_id: str):
+        async def cancel():
+            try:
+                async with httpx.AsyncClient() as client:
+                    await client.delete(self.jobs_url + job_id, timeout=5.0)
+            except Exception as e:
+                logger.debug("Could not cancel job %s: %s", job_id, e)
+
+        # A separate task, so it is sent even though the caller is being cancelled
+        task = asyncio.get_running_loop().create_task(cancel())
+        _cancellations.add(task)
+        task.add_done_callback(_cancellations.discard)
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> types.CallToolResult:
+        progress_callback = None
+        job_id = None
+        if self.on_progress is not None:
+            async def progress_callback(progress: float, total: Optional[float], message: Optional[str]):
+                await self.on_progress(name, progress, total, message)
+
+            if self.jobs_url is not None:
+                job_id = uuid.uuid4().hex
+
+        request = types.ClientRequest(
+            types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=name,
+                    arguments=arguments,
+                    _meta=types.RequestParams.Meta(session_id=self.session_id, job_id=job_id),
+                ),
+            )
+        )
+        try:
+            return await self.session.send_request(request, types.CallToolResult,
+                                                   progress_callback=progress_callback)
+        except asyncio.CancelledError:
+            if job_id is not None:
+                self._cancel_job(job_id)
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+# One connection per (event loop, server URL), reference counted
+_connections: Dict[Tuple[int, str], MCPConnection] = {}
+_connections_lock: Optional[asyncio.Lock] = None
+
+
+async def acquire_connection(server_url: str) -> MCPConnection:
+    """
+    Return the shared connection to server_url, opening it on first use
+
+    Args:
+        server_url: Streamable HTTP endpoint of the MCP server
+
+    Returns:
+        Open MCPConnection
+    """
+    global _connections_lock
+    if _connections_lock is None:
+        _connections_lock = asyncio.Lock()
+
+    key = (id(asyncio.get_running_loop()), server_url)
+    async with _connections_lock:
+        conn = _connections.get(key)
+        if conn is None or conn.session is None:
+            conn = MCPConnection(server_url)
+            await conn.open()
+            _connections[key] = conn
+        conn.refcount += 1
+        return conn
+
+
+async def release_connection(conn: MCPConnection):
+    """
+    Drop one reference to a shared connection, closing it when unused
+
+    Args:
+        conn: Connection returned by acquire_connection
+    """
+    key = (id(asyncio.get_running_loop()), conn.server_url)
+    async with _connections_lock:
+        conn.refcount -= 1
+        if conn.refcount > 0:
+            return
+        if _connections.get(key) is conn:
+            del _connections[key]
+    await conn.close()
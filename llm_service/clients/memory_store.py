@@ -0,0 +1,358 @@
+"""
+Bounded, namespaced store of past interactions for retrieval augmentation.
+
+One store is shared per embedding model and process. Each namespace
+(a chat session) gets its own partition and FAISS ``IndexIDMap``, so a
+search only ever sees and scans that session's memories. Partitions
+take a readers-writer lock: searches run concurrently, inserts and index
+swaps are exclusive. The methods block, so async callers run them on an
+executor thread (see ``retrieval.SessionMemory``), never on the event loop.
+
+Evicted entries are dropped from the entry table at once (searches skip
+them) and left in the index as tombstones. A background thread rebuilds
+the index without them once enough have accumulated, then swaps it in,
+so searches never wait for a rebuild.
+"""
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import faiss
+import numpy as np
+
+from ..utils.logging_utils import setup_logging
+from ..utils.rwlock import RWLock
+
+logger = setup_logging("llm_service.memory_store")
+
+EVICTION_POLICIES = ("lru", "age", "score")
+MEMORY_CAPACITY = int(os.getenv("MEMORY_CAPACITY", "2000"))  # entries per namespace
+MEMORY_POLICY = os.getenv("MEMORY_POLICY", "lru")
+
+
+@dataclass
+class MemoryEntry:
+    entry_id: int
+    user_msg: str
+    assistant_msg: str
+    embedding: np.ndarray
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    hits: int = 0
+
+    def score(self, now: float, half_life: float) -> float:
+        """
+        Usefulness: retrievals, decayed by the time since the last one
+        """
+        return (1 + self.hits) * 0.5 ** ((now - self.last_used) / half_life)
+
+
+class _Partition:
+    """
+    Entries and index of one namespace
+    """
+
+    def __init__(self, dim: int):
+        self.index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+        self.entries: Dict[int, MemoryEntry] = {}
+        self.tombstones: Set[int] = set()
+        self.lock = RWLock()
+        self.compacting = False
+        self.generation = 0  # bumped by clear() so a running compaction discards its result
+
+
+class MemoryStore:
+    """
+    Capacity-bounded vector memory with per-namespace partitions, eviction
+    and background compaction
+    """
+
+    def __init__(self, dim: int, capacity: int = MEMORY_CAPACITY, policy: str = MEMORY_POLICY,
+                 max_age: Optional[float] = None, score_half_life: float = 3600.0,
+                 compact_ratio: float = 0.2):
+        """
+        Initialize the store
+
+        Args:
+            dim: Embedding dimension
+            capacity: Maximum number of live entries per namespace
+            policy: Which entry to evict when full: "lru" (least recently
+                    retrieved), "age" (oldest) or "score" (least useful)
+            max_age: Seconds after which entries expire regardless of use
+            score_half_life: Decay half-life in seconds for the "score" policy
+            compact_ratio: Rebuild a namespace's index when its tombstones
+                           exceed this fraction of its live entries
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}; choose from {EVICTION_POLICIES}")
+        self.dim = dim
+        self.capacity = capacity
+        self.policy = policy
+        self.max_age = max_age
+        self.score_half_life = score_half_life
+        self.compact_ratio = compact_ratio
+
+        self.stats = {"added": 0, "searches": 0, "evicted_capacity": 0, "evicted_expired": 0,
+                      "compactions": 0}
+        self._stats_lock = threading.Lock()
+        self._partitions: Dict[str, _Partition] = {}
+        self._partitions_lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _partition(self, namespace: str, create: bool = False) -> Optional[_Partition]:
+        with self._partitions_lock:
+            partition = self._partitions.get(namespace)
+            if partition is None and create:
+                partition = self._partitions[namespace] = _Partition(self.dim)
+            return partition
+
+    def size(self, namespace: str) -> int:
+        partition = self._partition(namespace)
+        return len(partition.entries) if partition is not None else 0
+
+    def namespaces(self) -> List[str]:
+        with self._partitions_lock:
+            return list(self._partitions)
+
+    def _victim(self, partition: _Partition, now: float) -> int:
+        entries = partition.entries.values()
+        if self.policy == "age":
+            return min(entries, key=lambda e: e.created).entry_id
+        if self.policy == "score":
+            return min(entries, key=lambda e: e.score(now, self.score_half_life)).entry_id
+        return min(entries, key=lambda e: e.last_used).entry_id
+
+    def _expired(self, partition: _Partition, now: float) -> int:
+        """
+        Number of entries past max_age that are not evicted yet. Caller holds a lock.
+        """
+        if self.max_age is None:
+            return 0
+        # Entries are kept in insertion order, so the expired ones come first
+        count = 0
+        for entry in partition.entries.values():
+            if now - entry.created <= self.max_age:
+                break
+            count += 1
+        return count
+
+    @staticmethod
+    def _drop(partition: _Partition, entry_id: int):
+        del partition.entries[entry_id]
+        partition.tombstones.add(entry_id)
+
+    def _evict(self, partition: _Partition, now: float):
+        """
+        Expire old entries, then evict until within capacity. Caller holds the write lock.
+        """
+        if self.max_age is not None:
+            expired = [i for i, e in partition.entries.items() if now - e.created > self.max_age]
+            for entry_id in expired:
+                self._drop(partition, entry_id)
+            self._count("evicted_expired", len(expired))
+        while len(partition.entries) > self.capacity:
+            self._drop(partition, self._victim(partition, now))
+            self._count("evicted_capacity")
+
+    def add(self, namespace: str, user_msg: str, assistant_msg: str, embedding: np.ndarray) -> int:
+        """
+        Store an interaction in a namespace
+
+        Returns:
+            Entry ID
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        now = time.time()
+        partition = self._partition(namespace, create=True)
+        entry_id = next(self._ids)
+        with partition.lock.write():
+            partition.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            partition.entries[entry_id] = MemoryEntry(entry_id, user_msg, assistant_msg, vector[0], now, now)
+            self._evict(partition, now)
+            compact = self._claim_compaction(partition)
+        self._count("added")
+        if compact:
+            self._start_compaction(namespace, partition)
+        return entry_id
+
+    def search(self, namespace: str, embedding: np.ndarray, k: int) -> List[MemoryEntry]:
+        """
+        Find the k nearest live entries of a namespace (and mark them as used)
+        """
+        partition = self._partition(namespace)
+        if partition is None:
+            return []
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        now = time.time()
+        found = []
+        with partition.lock.read():
+            if not partition.entries:
+                return []
+            # Over-fetch so tombstones and expired entries still in the index
+            # don't crowd out live entries
+            fetch = min(k + len(partition.tombstones) + self._expired(partition, now), partition.index.ntotal)
+            _, ids = partition.index.search(vector, fetch)
+            for entry_id in ids[0]:
+                entry = partition.entries.get(int(entry_id))
+                if entry is None:
+                    continue
+                if self.max_age is not None and now - entry.created > self.max_age:
+                    continue
+                # Usage bookkeeping only feeds eviction, so racing readers are harmless
+                entry.last_used = now
+                entry.hits += 1
+                found.append(entry)
+                if len(found) == k:
+                    break
+        self._count("searches")
+        return found
+
+    def remove(self, namespace: str, entry_ids: List[int]) -> int:
+        """
+        Remove entries of a namespace by ID
+
+        Returns:
+            Number of entries removed
+        """
+        partition = self._partition(namespace)
+        if partition is None:
+            return 0
+        with partition.lock.write():
+            removed = [i for i in entry_ids if i in partition.entries]
+            for entry_id in removed:
+                self._drop(partition, entry_id)
+            compact = self._claim_compaction(partition)
+        if compact:
+            self._start_compaction(namespace, partition)
+        return len(removed)
+
+    def drop_namespace(self, namespace: str) -> int:
+        """
+        Forget a namespace entirely (e.g. when its session closes)
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._partitions_lock:
+            partition = self._partitions.pop(namespace, None)
+        if partition is None:
+            return 0
+        with partition.lock.write():
+            partition.generation += 1
+            return len(partition.entries)
+
+    def _claim_compaction(self, partition: _Partition) -> bool:
+        """
+        Decide whether to rebuild the index. Caller holds the write lock.
+        """
+        if partition.compacting or not partition.tombstones:
+            return False
+        if len(partition.tombstones) < max(16, self.compact_ratio * len(partition.entries)):
+            return False
+        partition.compacting = True
+        return True
+
+    def _start_compaction(self, namespace: str, partition: _Partition):
+        threading.Thread(target=self._compact, args=(namespace, partition),
+                         name="memory-compaction", daemon=True).start()
+
+    def compact(self, namespace: str):
+        """
+        Rebuild a namespace's index from its live entries and swap it in
+        """
+        partition = self._partition(namespace)
+        if partition is not None:
+            self._compact(namespace, partition)
+
+    def _compact(self, namespace: str, partition: _Partition):
+        # The rebuild runs outside the write lock; entries added meanwhile are
+        # copied into the new index just before the swap.
+        try:
+            with partition.lock.read():
+                snapshot = list(partition.entries.values())
+                dead = set(partition.tombstones)
+                generation = partition.generation
+
+            index = faiss.IndexIDMap(faiss.IndexFlatL2(self.dim))
+            if snapshot:
+                index.add_with_ids(np.vstack([e.embedding for e in snapshot]),
+                                   np.array([e.entry_id for e in snapshot], dtype=np.int64))
+
+            with partition.lock.write():
+                if generation != partition.generation:
+                    return
+                known = {e.entry_id for e in snapshot}
+                added = [e for i, e in partition.entries.items() if i not in known]
+                if added:
+                    index.add_with_ids(np.vstack([e.embedding for e in added]),
+                                       np.array([e.entry_id for e in added], dtype=np.int64))
+                # Entries dropped during the rebuild are still in the new index
+                partition.tombstones = {i for i in partition.tombstones - dead if i in known}
+                partition.index = index
+            self._count("compactions")
+            logger.debug(f"Compacted memory index of {namespace} to {index.ntotal} vectors")
+        finally:
+            with partition.lock.write():
+                partition.compacting = False
+
+    def clear(self, namespace: str):
+        partition = self._partition(namespace)
+        if partition is None:
+            return
+        with partition.lock.write():
+            partition.index.reset()
+            partition.entries.clear()
+            partition.tombstones.clear()
+            partition.generation += 1
+
+    def get_stats(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        """
+        Store-wide counters, plus the size of one namespace or of all of them
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        with self._partitions_lock:
+            partitions = ([self._partitions[namespace]] if namespace in self._partitions else []) \
+                if namespace is not None else list(self._partitions.values())
+            stats["namespaces"] = len(self._partitions)
+        stats.update(
+            size=sum(len(p.entries) for p in partitions),
+            capacity=self.capacity,
+            tombstones=sum(len(p.tombstones) for p in partitions),
+            index_vectors=sum(int(p.index.ntotal) for p in partitions),
+        )
+        return stats
+
+
+_stores: Dict[str, MemoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_memory_store(embed_model_name: str, dim: int) -> MemoryStore:
+    """
+    Process-wide memory store for one embedding model
+    """
+    with _stores_lock:
+        store = _stores.get(embed_model_name)
+        if store is None:
+            store = _stores[embed_model_name] = MemoryStore(dim)
+        return store
+
+
+def drop_namespace(namespace: str) -> int:
+    """
+    Forget a namespace in every store
+
+    Returns:
+        Number of entries dropped
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    return sum(store.drop_namespace(namespace) for store in stores)
@@ -0,0 +1,224 @@
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List
+
+from ..utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.model_router")
+
+# Signals that a request needs multi-step reasoning rather than a tool call
+_COMPLEX_HINTS = re.compile(
+    r"\b(why|explain|compare|derive|design|build|write|create|fit|estimate|analy[sz]e|interpret|"
+    r"steady[- ]state|stability|bifurcation|sensitivity|optimi[sz]e|mechanism|debug|fix)\b",
+    re.IGNORECASE,
+)
+_SIMPLE_HINTS = re.compile(
+    r"\b(status|version|installed|alive|echo|ping|simulate|run|plot)\b",
+    re.IGNORECASE,
+)
+# Tools too costly to run twice for one request; once the small model has a
+# result from one, the large model gets that result instead of the tool
+_EXPENSIVE_TOOLS = frozenset({"tellurium_simulate", "tellurium_fit"})
+_TOOL_RESULTS_HEADER = (
+    "Tool results already obtained for the latest request. Use them instead of "
+    "calling the same tools again:"
+)
+_LOW_CONFIDENCE = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i cannot|i can'?t|unable to|not able to|as an ai)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RouteStats:
+    """
+    Latency and outcome counters for one route
+    """
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    escalations: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+
+    def record(self, latency: float, ok: bool):
+        self.requests += 1
+        self.latencies.append(latency)
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "escalations": self.escalations,
+            "success_rate": self.successes / self.requests if self.requests else 0.0,
+            "p50_latency": self.percentile(0.5),
+            "p95_latency": self.percentile(0.95),
+        }
+
+
+class ModelRouter:
+    """
+    Routes each query to a fast small model or a larger model
+
+    Simple and tool-only requests go to the small model; requests that look
+    like multi-step reasoning go straight to the large one. A small-model
+    answer that fails or looks unsure is retried on the large model.
+    The router exposes the same interface as the adapters it wraps.
+    """
+
+    def __init__(self, small_adapter, large_adapter, max_simple_words: int = 40):
+        """
+        Initialize the router
+
+        Args:
+            small_adapter: Adapter for the fast model
+            large_adapter: Adapter for the capable model
+            max_simple_words: Longer queries are treated as complex
+        """
+        self.small = small_adapter
+        self.large = large_adapter
+        self.max_simple_words = max_simple_words
+        self.stats: Dict[str, RouteStats] = {"small": RouteStats(), "large": RouteStats()}
+
+    @property
+    def model_name(self) -> str:
+        return self.large.model_name
+
+    def classify(self, query: str) -> str:
+        """
+        Decide which route a query takes
+
+        Args:
+            query: User query text
+
+        Returns:
+            "small" or "large"
+        """
+        words = len(query.split())
+        if words > self.max_simple_words or query.count("?") > 1:
+            return "large"
+        if _COMPLEX_HINTS.search(query):
+            return "large"
+        if _SIMPLE_HINTS.search(query) or words <= 12:
+            return "small"
+        return "large"
+
+    @staticmethod
+    def is_confident(history: List[Dict[str, Any]]) -> bool:
+        """
+        Judge whether an interaction history is a usable answer
+
+        Args:
+            history: Interaction history returned by an adapter
+
+        Returns:
+            False if a tool failed or the final answer is empty or unsure
+        """
+        if any(h["role"] == "tool_error" for h in history):
+            return False
+        answers = [h["content"] for h in history if h["role"] in ("assistant", "assistant_final")]
+        final = answers[-1] if answers else ""
+        return bool(final.strip()) and not _LOW_CONFIDENCE.search(final)
+
+    @staticmethod
+    def _latest_user_message(messages: List[Dict[str, str]]) -> str:
+        for msg in reversed(messages):
+            if msg.get("role") == "user":
+                return msg.get("content", "")
+        return ""
+
+    @staticmethod
+    def _continue_from(messages: List[Dict[str, Any]], tools: List[Any], history: List[Dict[str, Any]]):
+        """
+        Carry the small model's tool results over to the large model
+
+        Args:
+            messages: Messages the small model was given
+            tools: Available MCP tools
+            history: The small model's interaction history
+
+        Returns:
+            (messages, tools) for the large model: the results as a system
+            message after the user message, and the tools without the
+            expensive ones that already succeeded
+        """
+        results = [h for h in history if h["role"] == "tool"]
+        if not results:
+            return list(messages), tools
+        block = "\n\n".join(
+            f"{h['name']}({json.dumps(h['arguments'], default=str)}) returned:\n{h['result']}" for h in results
+        )
+        context = {"role": "system", "content": f"{_TOOL_RESULTS_HEADER}\n{block}"}
+        done = {h["name"] for h in results} & _EXPENSIVE_TOOLS
+        return list(messages) + [context], [t for t in tools if t.name not in done]
+
+    async def process_query(self, messages, tools, mcp_session):
+        """
+        Process a query on the chosen route, escalating if needed
+
+        Args:
+            messages: List of message objects
+            tools: List of MCP Tool objects
+            mcp_session: MCP client session
+
+        Returns:
+            Interaction history
+        """
+        route = self.classify(self._latest_user_message(messages))
+        small_history: List[Dict[str, Any]] = []
+        large_messages, large_tools = list(messages), tools
+
+        if route == "small":
+            start = time.perf_counter()
+            try:
+                history = await self.small.process_query(list(messages), tools, mcp_session)
+                ok = self.is_confident(history)
+            except Exception as e:
+                logger.warning(f"Small model {self.small.model_name} failed: {e}")
+                history, ok = [], False
+            self.stats["small"].record(time.perf_counter() - start, ok)
+            if ok:
+                return history
+            self.stats["small"].escalations += 1
+            logger.info("Escalating from %s to %s", self.small.model_name, self.large.model_name)
+            # Continue from the tool calls the small model made rather than
+            # running them again; they stay in the history for the reply
+            small_history = [h for h in history if h["role"] in ("tool", "tool_error")]
+            large_messages, large_tools = self._continue_from(messages, tools, history)
+
+        start = time.perf_counter()
+        try:
+            history = await self.large.process_query(large_messages, large_tools, mcp_session)
+        except Exception:
+            self.stats["large"].record(time.perf_counter() - start, False)
+            raise
+        self.stats["large"].record(time.perf_counter() - start, self.is_confident(history))
+        return small_history + history
+
+    async def summarize(self, summary: str, turns: List, max_tokens: int) -> str:
+        """
+        Summaries are routine work for the small model
+        """
+        return await self.small.summarize(summary, turns, max_tokens)
+
+    async def list_models(self):
+        return await self.large.list_models()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-route latency and success metrics
+        """
+        return {route: stats.as_dict() for route, stats in self.stats.items()}
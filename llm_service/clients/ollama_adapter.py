@@ -1,22 +1,34 @@
 import json
 import asyncio
-from typing import Dict, Any, List
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
 import logging
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
 
-from ..utils.logging_utils import setup_logging
+from ..utils.logging_utils import Truncated, setup_logging
+from ..utils.tokens import estimate_tokens
+from .conversation import build_summary_messages, insert_retrieved, tool_schemas
+from .backend_pool import get_backend_pool, split_urls
+from .retrieval import SessionMemory
+from .usage import UsageTracker, ollama_usage, profile_prompt
 
 logger = setup_logging("llm_service.ollama_adapter")
 
+# Ollama reloads a model whenever num_ctx changes, so context sizes are
+# rounded up to a few buckets and only ever grow for a given adapter.
+CONTEXT_BUCKETS = (2048, 4096, 8192, 16384, 32768)
+RESPONSE_HEADROOM = 1024  # tokens reserved for the model's reply
+
 
 class OllamaAdapter:
     """
     Adapter for Ollama API interactions
     """
 
-    def __init__(self, model_name="llama3.2", embed_model_name="all-MiniLM-L6-v2", top_k=5):
+    def __init__(self, model_name="llama3.2", embed_model_name="all-MiniLM-L6-v2", top_k=5,
+                 embed_backend=None, namespace="default", host=None, keep_alive="30m", max_concurrent=4,
+                 min_context=4096, max_context=32768, warm_up=True, retrieval: Optional[SessionMemory] = None):
         """
         Initialize Ollama adapter with retrieval capabilities
 
@@ -24,42 +36,155 @@ class OllamaAdapter:
             model_name: Ollama model to use
             embed_model_name: SentenceTransformer model for embeddings
             top_k: Number of similar past interactions to retrieve
+            embed_backend: Embedding backend (torch, onnx, onnx-int8; defaults to EMBED_BACKEND)
+            namespace: Memory partition (session) this adapter reads and writes
+            retrieval: Session memory to use instead of a private one for namespace
+            host: Ollama server URL, or several separated by commas (defaults to
+                  OLLAMA_HOSTS, then OLLAMA_HOST or localhost); several hosts are
+                  used as one load-balanced pool
+            keep_alive: How long Ollama keeps the model resident after a request
+            max_concurrent: Maximum number of in-flight requests from this adapter
+            min_context: Initial num_ctx, used for the preload
+            max_context: Upper bound for the num_ctx option
+            warm_up: Preload the model in the background on creation
         """
         try:
-            from ollama import chat
-            self.chat = chat
+            from ollama import AsyncClient
+            self.hosts = split_urls(host or os.getenv("OLLAMA_HOSTS")) or [None]
+            self.host = self.hosts[0]
+            # Shared per host set: load, breakers and health checks span all sessions
+            self.pool = get_backend_pool(
+                "ollama", self.hosts, lambda url: AsyncClient(host=url),
+                health_check=lambda client: client.list(),
+            )
             self.model_name = model_name
+            self.keep_alive = keep_alive
+            self.max_context = max_context
+            self._num_ctx = min(min_context, max_context)
+            self._semaphore = asyncio.Semaphore(max_concurrent)
+            self._warm_up_task: Optional[asyncio.Task] = None
 
-            # Initialize embedding model
-            self.embedder = SentenceTransformer(embed_model_name)
-            self.embed_dim = self.embedder.get_sentence_embedding_dimension()
-
-            # Initialize FAISS index for similarity search
-            self.index = faiss.IndexFlatL2(self.embed_dim)
-
-            # Storage for past interactions
-            self.memories = []  # List of (user_message, assistant_response) tuples
+            # Retrieval memory of the session, normally shared by the owning
+            # client with every adapter it creates
+            self.retrieval = retrieval or SessionMemory(namespace, embed_model_name, top_k, embed_backend)
+            self.embedder = self.retrieval.embedder
 
-            # Retrieval settings
-            self.top_k = top_k
+            # Token accounting, set by the owning client
+            self.usage: Optional[UsageTracker] = None
 
         except ImportError as e:
             logger.error(f"Required package not installed: {str(e)}")
             logger.error("Install with: pip install ollama sentence-transformers faiss-cpu")
             raise ImportError("Required packages: ollama, sentence-transformers, faiss-cpu")
 
-    def _embed_interaction(self, user_msg: str, assistant_msg: str) -> np.ndarray:
+        if warm_up:
+            self._start_warm_up()
+
+    def _start_warm_up(self):
         """
-        Create an embedding for a user-assistant interaction
+        Preload the model without blocking the caller
         """
-        combined = f"User: {user_msg}\nAssistant: {assistant_msg}"
-        return self.embedder.encode(combined)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None:
+            self._warm_up_task = loop.create_task(self.warm_up())
+            return
+
+        # No running loop: the async client can't be shared across loops,
+        # so preload with a throwaway synchronous client on a thread.
+        def _preload():
+            from ollama import Client
+            for host in self.hosts:
+                try:
+                    Client(host=host).generate(
+                        model=self.model_name,
+                        prompt="",
+                        keep_alive=self.keep_alive,
+                        options={"num_ctx": self._num_ctx}
+                    )
+                    logger.info(f"Preloaded Ollama model {self.model_name} on {host or 'default host'}")
+                except Exception as e:
+                    logger.warning(f"Could not preload Ollama model {self.model_name} on {host or 'default host'}: {e}")
+
+        threading.Thread(target=_preload, name="ollama-warm-up", daemon=True).start()
+
+    async def warm_up(self):
+        """
+        Load the model into memory and keep it resident for keep_alive
 
-    def _embed_query(self, query: str) -> np.ndarray:
+        An empty prompt makes Ollama load the model without generating.
+        Every host of the pool is preloaded, so failover doesn't pay a cold load.
         """
-        Create an embedding for a user query
+        results = await self.pool.broadcast(lambda client: client.generate(
+            model=self.model_name,
+            prompt="",
+            keep_alive=self.keep_alive,
+            options={"num_ctx": self._num_ctx}
+        ))
+        for host, result in zip(self.hosts, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not preload Ollama model {self.model_name} on {host or 'default host'}: {result}")
+            else:
+                logger.info(f"Preloaded Ollama model {self.model_name} on {host or 'default host'}")
+
+    def _context_size(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
         """
-        return self.embedder.encode(query)
+        Pick num_ctx from the actual prompt size
+
+        Args:
+            messages: Messages about to be sent
+            tools: Tool definitions about to be sent
+
+        Returns:
+            Smallest context bucket that fits the prompt plus reply headroom,
+            never smaller than the one already in use
+        """
+        needed = sum(estimate_tokens(str(m.get("content", ""))) + 4 for m in messages)
+        if tools:
+            needed += estimate_tokens(json.dumps(tools))
+        needed += RESPONSE_HEADROOM
+
+        bucket = next((size for size in CONTEXT_BUCKETS if size >= needed), self.max_context)
+        if bucket > self._num_ctx:
+            self._num_ctx = min(bucket, self.max_context)
+            logger.info(f"Raising Ollama context size to {self._num_ctx} tokens")
+        return self._num_ctx
+
+    async def _chat(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None,
+                    options: Optional[Dict[str, Any]] = None, purpose: str = "chat"):
+        """
+        Send one chat request through the async client and record its usage
+
+        Args:
+            messages: Chat messages
+            tools: Optional tool definitions
+            options: Extra Ollama options (merged with the computed num_ctx)
+            purpose: "chat", "follow_up" or "summary" (for accounting)
+
+        Returns:
+            Ollama chat response
+        """
+        request_options = {"num_ctx": self._context_size(messages, tools)}
+        request_options.update(options or {})
+        estimate = profile_prompt(messages, tools)
+        prefix = self.usage.shared_prefix(messages, tools) if self.usage is not None and purpose != "summary" else 0
+        async with self._semaphore:
+            start = time.perf_counter()
+            response = await self.pool.call(lambda client: client.chat(
+                model=self.model_name,
+                messages=messages,
+                tools=tools,
+                stream=False,
+                keep_alive=self.keep_alive,
+                options=request_options
+            ))
+        if self.usage is not None:
+            self.usage.record(ollama_usage(response, self.model_name, purpose,
+                                           time.perf_counter() - start, estimate, prefix))
+        return response
 
     def _get_latest_user_message(self, messages: List[Dict[str, str]]) -> str:
         """
@@ -71,85 +196,31 @@ class OllamaAdapter:
                 return msg.get('content', '')
         return ''
 
-    def _store_interaction(self, user_msg: str, assistant_response: str):
-        """
-        Store an interaction in memory and update the index
-        """
-        # Create embedding
-        embedding = self._embed_interaction(user_msg, assistant_response)
-
-        # Add to FAISS index
-        self.index.add(np.vstack([embedding]))
-
-        # Store in memory
-        self.memories.append((user_msg, assistant_response))
-
-        logger.debug(f"Stored interaction in memory (total: {len(self.memories)})")
-
-    def _retrieve_relevant_memories(self, query: str) -> List[Dict[str, str]]:
-        """
-        Retrieve relevant past interactions based on query similarity
-        """
-        if len(self.memories) == 0:
-            return []
-
-        # Embed the query
-        query_emb = self._embed_query(query)
-
-        # Find similar past interactions
-        k = min(self.top_k, len(self.memories))
-        distances, indices = self.index.search(np.vstack([query_emb]), k)
-
-        # Convert to message format
-        messages = []
-        for idx in indices[0]:
-            if idx < 0 or idx >= len(self.memories):  # Handle potential out-of-bounds
-                continue
-
-            user_msg, assistant_msg = self.memories[idx]
-            messages.append({"role": "user", "content": user_msg})
-            messages.append({"role": "assistant", "content": assistant_msg})
-
-        logger.info(f"Retrieved {len(messages) // 2} relevant past interactions")
-        return messages
-
     async def process_query(self, messages: List[Dict[str, str]], tools: List[Any], mcp_session) -> List[
         Dict[str, Any]]:
         """
         Process a query using the Ollama API with retrieval augmentation
         """
         interaction_history = []
-        loop = asyncio.get_event_loop()
 
         # Get the latest user message
         current_query = self._get_latest_user_message(messages)
 
         # Retrieve relevant past interactions
-        retrieved_messages = self._retrieve_relevant_memories(current_query)
+        retrieved_messages = await self.retrieval.retrieve(current_query)
 
-        # Augment the messages with retrieved context
-        # We'll inject the retrieved messages at the beginning, preserving the recent conversation flow
-        augmented_messages = retrieved_messages + messages
-        logger.info(f"Augmented messages with {len(retrieved_messages)} retrieved messages")
+        # Retrieved context goes right before the new user message, after the
+        # stable prefix (system prompt, tools, summary, recent turns) that
+        # prompt caching can reuse
+        augmented_messages = insert_retrieved(messages, retrieved_messages)
+        logger.info("Augmented messages with %d retrieved interactions", len(retrieved_messages))
 
-        # Format tools for Ollama
-        ollama_tools = [{
-            "name": t.name,
-            "description": t.description,
-            "input_schema": t.inputSchema
-        } for t in tools]
+        # Precomputed, byte-identical tool definitions in Ollama's function format
+        ollama_tools = tool_schemas(tools)
 
         # First chat invocation with augmented context
-        logger.info(f"Sending augmented query to Ollama model: {self.model_name}")
-        ollama_resp = await loop.run_in_executor(
-            None,
-            lambda: self.chat(
-                model=self.model_name,
-                messages=augmented_messages,
-                tools=ollama_tools,
-                stream=False
-            )
-        )
+        logger.info("Sending augmented query to Ollama model: %s", self.model_name)
+        ollama_resp = await self._chat(augmented_messages, tools=ollama_tools)
 
         first_text = ollama_resp.message.content or ""
         tool_calls = getattr(ollama_resp.message, 'tool_calls', []) or []
@@ -162,13 +233,13 @@ class OllamaAdapter:
         })
 
         # Add assistant reply to history for tool-call context
-        augmented_messages.append({"role": "assistant", "content": first_text})
+        augmented_messages.append({"role": "assistant", "content": first_text, "tool_calls": tool_calls or None})
 
         # Handle any tool/function calls
         for call in tool_calls:
             try:
                 fname = call.function.name
-                logger.info(f"Processing tool call: {fname}")
+                logger.info("Processing tool call: %s", fname)
 
                 # Parse arguments properly
                 try:
@@ -177,11 +248,11 @@ class OllamaAdapter:
                     else:
                         fargs = call.function.arguments
                 except json.JSONDecodeError:
-                    logger.error(f"Invalid JSON in tool arguments: {call.function.arguments}")
+                    logger.error("Invalid JSON in tool arguments: %s", Truncated(call.function.arguments))
                     fargs = {}
 
                 # Run the tool via MCP
-                logger.info(f"Calling tool {fname} with args: {fargs}")
+                logger.info("Calling tool %s with args: %s", fname, Truncated(fargs))
                 result = await mcp_session.call_tool(fname, fargs)
 
                 # Extract raw text from TextContent list
@@ -195,9 +266,9 @@ class OllamaAdapter:
                     "result": tool_output
                 })
 
-                # Feed the result back into the model as a function response
+                # Feed the result back into the model as a tool message
                 augmented_messages.append({
-                    "role": "function",
+                    "role": "tool",
                     "name": fname,
                     "content": tool_output
                 })
@@ -206,7 +277,7 @@ class OllamaAdapter:
                 error_msg = f"Error executing tool {fname}: {str(e)}"
                 logger.error(error_msg)
                 augmented_messages.append({
-                    "role": "function",
+                    "role": "tool",
                     "name": fname,
                     "content": f"ERROR: {error_msg}"
                 })
@@ -220,14 +291,8 @@ class OllamaAdapter:
         final_response = first_text
         if tool_calls:
             logger.info("Getting final response after tool calls")
-            ollama_resp = await loop.run_in_executor(
-                None,
-                lambda: self.chat(
-                    model=self.model_name,
-                    messages=augmented_messages,
-                    stream=False
-                )
-            )
+            # Same tools as the first call, so the follow-up extends its prefix
+            ollama_resp = await self._chat(augmented_messages, tools=ollama_tools, purpose="follow_up")
             final_response = ollama_resp.message.content or ""
 
             interaction_history.append({
@@ -235,11 +300,27 @@ class OllamaAdapter:
                 "content": final_response
             })
 
-        # Store this interaction in memory for future retrieval
-        self._store_interaction(current_query, final_response)
-
         return interaction_history
 
+    async def summarize(self, summary: str, turns: List, max_tokens: int) -> str:
+        """
+        Fold conversation turns into the running summary
+
+        Args:
+            summary: Current summary
+            turns: (user, assistant) turns to fold in
+            max_tokens: Token budget for the new summary
+
+        Returns:
+            Updated summary text
+        """
+        ollama_resp = await self._chat(
+            build_summary_messages(summary, turns, max_tokens),
+            options={"num_predict": max_tokens},
+            purpose="summary"
+        )
+        return ollama_resp.message.content or summary
+
     async def list_models(self):
         """
         List available Ollama models
@@ -1,13 +1,15 @@
 import os
 import json
 import asyncio
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional
 import logging
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
 
-from ..utils.logging_utils import setup_logging
+from ..utils.logging_utils import Truncated, setup_logging
+from .conversation import build_summary_messages, insert_retrieved, tool_schemas
+from .backend_pool import get_backend_pool, split_urls
+from .retrieval import SessionMemory
+from .usage import UsageTracker, openai_usage, profile_prompt
 
 logger = setup_logging("llm_service.openai_adapter")
 
@@ -17,7 +19,8 @@ class OpenAIAdapter:
     Adapter for OpenAI API interactions
     """
 
-    def __init__(self, model_name="gpt-4o", embed_model_name="all-MiniLM-L6-v2", top_k=5):
+    def __init__(self, model_name="gpt-4o", embed_model_name="all-MiniLM-L6-v2", top_k=5, embed_backend=None,
+                 namespace="default", retrieval: Optional[SessionMemory] = None):
         """
         Initialize OpenAI adapter with retrieval capabilities
 
@@ -25,6 +28,9 @@ class OpenAIAdapter:
             model_name: OpenAI model to use
             embed_model_name: SentenceTransformer model for embeddings
             top_k: Number of similar past interactions to retrieve
+            embed_backend: Embedding backend (torch, onnx, onnx-int8; defaults to EMBED_BACKEND)
+            namespace: Memory partition (session) this adapter reads and writes
+            retrieval: Session memory to use instead of a private one for namespace
         """
         try:
             from openai import AsyncOpenAI
@@ -44,40 +50,29 @@ class OpenAIAdapter:
                 print("      export OPENAI_API_KEY='your-api-key'")
                 raise RuntimeError("Cannot initialize OpenAIAdapter without OPENAI_API_KEY")
 
-            self.client = AsyncOpenAI(api_key=api_key)
+            # OPENAI_BASE_URLS lists compatible endpoints to use as one pool;
+            # the pool does failover itself, so the SDK's own retries are off
+            self.base_urls = split_urls(os.getenv("OPENAI_BASE_URLS")) or [os.getenv("OPENAI_BASE_URL")]
+            self.pool = get_backend_pool(
+                "openai", self.base_urls,
+                lambda url: AsyncOpenAI(api_key=api_key, base_url=url, max_retries=0),
+                health_check=lambda client: client.models.list(),
+            )
             self.model_name = model_name
 
-            # Initialize embedding model
-            self.embedder = SentenceTransformer(embed_model_name)
-            self.embed_dim = self.embedder.get_sentence_embedding_dimension()
-
-            # Initialize FAISS index for similarity search
-            self.index = faiss.IndexFlatL2(self.embed_dim)
-
-            # Storage for past interactions
-            self.memories = []  # List of (user_message, assistant_response) tuples
+            # Retrieval memory of the session, normally shared by the owning
+            # client with every adapter it creates
+            self.retrieval = retrieval or SessionMemory(namespace, embed_model_name, top_k, embed_backend)
+            self.embedder = self.retrieval.embedder
 
-            # Retrieval settings
-            self.top_k = top_k
+            # Token accounting, set by the owning client
+            self.usage: Optional[UsageTracker] = None
 
         except ImportError as e:
             logger.error(f"Required package not installed: {str(e)}")
             logger.error("Install with: pip install openai sentence-transformers faiss-cpu")
             raise ImportError("Required packages: openai, sentence-transformers, faiss-cpu")
 
-    def _embed_interaction(self, user_msg: str, assistant_msg: str) -> np.ndarray:
-        """
-        Create an embedding for a user-assistant interaction
-        """
-        combined = f"User: {user_msg}\nAssistant: {assistant_msg}"
-        return self.embedder.encode(combined)
-
-    def _embed_query(self, query: str) -> np.ndarray:
-        """
-        Create an embedding for a user query
-        """
-        return self.embedder.encode(query)
-
     def _get_latest_user_message(self, messages: List[Dict[str, str]]) -> str:
         """
         Extract the content of the most recent user message
@@ -88,72 +83,33 @@ class OpenAIAdapter:
                 return msg.get('content', '')
         return ''
 
-    def _store_interaction(self, user_msg: str, assistant_response: str):
-        """
-        Store an interaction in memory and update the index
+    async def _create(self, purpose: str, messages, tools=None, **kwargs):
         """
-        # Create embedding
-        embedding = self._embed_interaction(user_msg, assistant_response)
-
-        # Add to FAISS index
-        self.index.add(np.vstack([embedding]))
-
-        # Store in memory
-        self.memories.append((user_msg, assistant_response))
-
-        logger.debug(f"Stored interaction in memory (total: {len(self.memories)})")
-
-    def _retrieve_relevant_memories(self, query: str) -> List[Dict[str, str]]:
-        """
-        Retrieve relevant past interactions based on query similarity
-        """
-        if len(self.memories) == 0:
-            return []
-
-        # Embed the query
-        query_emb = self._embed_query(query)
-
-        # Find similar past interactions
-        k = min(self.top_k, len(self.memories))
-        distances, indices = self.index.search(np.vstack([query_emb]), k)
-
-        # Convert to message format
-        messages = []
-        for idx in indices[0]:
-            if idx < 0 or idx >= len(self.memories):  # Handle potential out-of-bounds
-                continue
-
-            user_msg, assistant_msg = self.memories[idx]
-            messages.append({"role": "user", "content": user_msg})
-            messages.append({"role": "assistant", "content": assistant_msg})
-
-        logger.info(f"Retrieved {len(messages) // 2} relevant past interactions")
-        return messages
-
-    def _convert_tools_to_openai_format(self, tools: List) -> List[Dict[str, Any]]:
-        """
-        Convert MCP tools to OpenAI tools format
+        Send one chat completion and record its usage
 
         Args:
-            tools: List of MCP Tool objects
+            purpose: "chat", "follow_up" or "summary" (for accounting)
+            messages: Chat messages
+            tools: Optional tool definitions
+            **kwargs: Extra request parameters
 
         Returns:
-            List of tools in OpenAI format
+            OpenAI chat completion
         """
-        openai_tools = []
-
-        for tool in tools:
-            openai_tool = {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.inputSchema if tool.inputSchema else {"type": "object", "properties": {}}
-                }
-            }
-            openai_tools.append(openai_tool)
-
-        return openai_tools
+        estimate = profile_prompt(messages, tools)
+        prefix = self.usage.shared_prefix(messages, tools) if self.usage is not None and purpose != "summary" else 0
+        if tools:
+            kwargs["tools"] = tools
+        start = time.perf_counter()
+        response = await self.pool.call(lambda client: client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            **kwargs
+        ))
+        if self.usage is not None:
+            self.usage.record(openai_usage(response, self.model_name, purpose,
+                                           time.perf_counter() - start, estimate, prefix))
+        return response
 
     async def process_query(self, messages, tools, mcp_session):
         """
@@ -173,21 +129,22 @@ class OpenAIAdapter:
         current_query = self._get_latest_user_message(messages)
 
         # Retrieve relevant past interactions
-        retrieved_messages = self._retrieve_relevant_memories(current_query)
+        retrieved_messages = await self.retrieval.retrieve(current_query)
 
-        # Augment the messages with retrieved context
-        # We'll inject the retrieved messages at the beginning, preserving the recent conversation flow
-        augmented_messages = retrieved_messages + messages
-        logger.info(f"Augmented messages with {len(retrieved_messages)} retrieved messages")
+        # Retrieved context goes right before the new user message, after the
+        # stable prefix (system prompt, tools, summary, recent turns) that
+        # prompt caching can reuse
+        augmented_messages = insert_retrieved(messages, retrieved_messages)
+        logger.info("Augmented messages with %d retrieved interactions", len(retrieved_messages))
 
-        # Format tools for OpenAI
-        openai_tools = self._convert_tools_to_openai_format(tools)
+        # Precomputed, byte-identical tool definitions
+        openai_tools = tool_schemas(tools)
 
         # First chat invocation with augmented context
-        logger.info(f"Sending augmented query to OpenAI model: {self.model_name}")
-        response = await self.client.chat.completions.create(
-            model=self.model_name,
-            messages=augmented_messages,
+        logger.info("Sending augmented query to OpenAI model: %s", self.model_name)
+        response = await self._create(
+            "chat",
+            augmented_messages,
             tools=openai_tools,
             tool_choice="auto"
         )
@@ -214,7 +171,7 @@ class OpenAIAdapter:
         for call in tool_calls:
             try:
                 fname = call.function.name
-                logger.info(f"Processing tool call: {fname}")
+                logger.info("Processing tool call: %s", fname)
 
                 # Parse arguments properly
                 try:
@@ -223,11 +180,11 @@ class OpenAIAdapter:
                     else:
                         fargs = call.function.arguments
                 except json.JSONDecodeError:
-                    logger.error(f"Invalid JSON in tool arguments: {call.function.arguments}")
+                    logger.error("Invalid JSON in tool arguments: %s", Truncated(call.function.arguments))
                     fargs = {}
 
                 # Run the tool via MCP
-                logger.info(f"Calling tool {fname} with args: {fargs}")
+                logger.info("Calling tool %s with args: %s", fname, Truncated(fargs))
                 result = await mcp_session.call_tool(fname, fargs)
 
                 # Extract raw text from TextContent list
@@ -268,9 +225,13 @@ class OpenAIAdapter:
         final_response = first_text
         if tool_calls:
             logger.info("Getting final response after tool calls")
-            follow_response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=augmented_messages
+            # Same tools as the first call, so the follow-up extends its
+            # cached prefix; tool_choice="none" asks for the final answer
+            follow_response = await self._create(
+                "follow_up",
+                augmented_messages,
+                tools=openai_tools,
+                tool_choice="none"
             )
             final_response = follow_response.choices[0].message.content or ""
 
@@ -279,11 +240,27 @@ class OpenAIAdapter:
                 "content": final_response
             })
 
-        # Store this interaction in memory for future retrieval
-        self._store_interaction(current_query, final_response)
-
         return interaction_history
 
+    async def summarize(self, summary: str, turns: List, max_tokens: int) -> str:
+        """
+        Fold conversation turns into the running summary
+
+        Args:
+            summary: Current summary
+            turns: (user, assistant) turns to fold in
+            max_tokens: Token budget for the new summary
+
+        Returns:
+            Updated summary text
+        """
+        response = await self._create(
+            "summary",
+            build_summary_messages(summary, turns, max_tokens),
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content or summary
+
     async def list_models(self):
         """
         List available OpenAI models
@@ -292,7 +269,7 @@ class OpenAIAdapter:
             List of model IDs
         """
         try:
-            models = await self.client.models.list()
+            models = await self.pool.call(lambda client: client.models.list())
             return [model.id for model in models.data if "gpt" in model.id]
         except Exception as e:
             logger.error(f"Error listing models: {e}")
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from ..utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.response_cache")
+
+# Tools whose output depends only on their arguments
+DETERMINISTIC_TOOLS = {"tellurium_simulate", "tellurium_slice_artifact", "tellurium_version", "echo"}
+
+# Queries that lean on earlier turns can't be answered out of context
+_FOLLOW_UP = re.compile(
+    r"^\s*(and|also|then|now|what about|how about|same|again|instead)\b|\b(it|that|this|those|these|previous|above|again)\b",
+    re.IGNORECASE,
+)
+_LITERAL = re.compile(r"`[^`]*`|[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?")
+
+
+@dataclass
+class CacheEntry:
+    """
+    One cached (question, answer) pair
+    """
+    query: str
+    answer: str
+    fingerprint: str
+    tools: List[str]
+    created: float
+    expires_at: float
+    hits: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    skipped: int = 0
+    expired: int = 0
+    invalidated: int = 0
+    evicted: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {**self.__dict__, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class ResponseCache:
+    """
+    Opt-in semantic cache that answers near-duplicate questions without the LLM
+
+    A query hits when its embedding is within `threshold` cosine similarity
+    of a cached query *and* both carry the same explicit literals (numbers,
+    code spans), so a different k1 or time range never reuses an answer.
+    Only answers whose tool calls were all deterministic are stored.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 1000):
+        """
+        Initialize the cache
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an entry stays valid
+            max_entries: Capacity; the oldest entry is evicted beyond it
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: Dict[int, CacheEntry] = {}
+        self._index: Optional[faiss.IndexIDMap] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(query: str) -> str:
+        """
+        Normalized explicit literals of a query (numbers and `code` spans)
+        """
+        return "|".join(m.group(0).strip("`").strip() for m in _LITERAL.finditer(query))
+
+    @staticmethod
+    def is_cacheable_query(query: str) -> bool:
+        """
+        Whether a query is self-contained enough to be answered from cache
+        """
+        return len(query.split()) >= 3 and not _FOLLOW_UP.search(query)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vec = np.asarray(embedding, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vec)
+        return vec
+
+    def _remove(self, entry_ids: List[int]):
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+        if entry_ids and self._index is not None:
+            self._index.remove_ids(np.asarray(entry_ids, dtype="int64"))
+
+    def lookup(self, query: str, embedding: np.ndarray) -> Optional[str]:
+        """
+        Return a cached answer for a near-duplicate query, if any
+
+        Args:
+            query: User query text
+            embedding: Embedding of the query
+
+        Returns:
+            Cached answer or None
+        """
+        if not self.is_cacheable_query(query):
+            return None
+
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.stats.misses += 1
+                return None
+
+            now = time.time()
+            expired = [i for i, e in self._entries.items() if e.expires_at <= now]
+            if expired:
+                self._remove(expired)
+                self.stats.expired += len(expired)
+
+            fingerprint = self.fingerprint(query)
+            k = min(5, self._index.ntotal)
+            if k == 0:
+                self.stats.misses += 1
+                return None
+            scores, ids = self._index.search(self._normalize(embedding), k)
+
+            for score, entry_id in zip(scores[0], ids[0]):
+                entry = self._entries.get(int(entry_id))
+                if entry is None or score < self.threshold:
+                    continue
+                if entry.fingerprint != fingerprint:
+                    continue
+                entry.hits += 1
+                self.stats.hits += 1
+                logger.info("Response cache hit (similarity %.3f, entry hits %d)", score, entry.hits)
+                return entry.answer
+
+            self.stats.misses += 1
+            return None
+
+    def store(self, query: str, embedding: np.ndarray, answer: str, tool_calls: List[Dict[str, Any]]) -> bool:
+        """
+        Cache an answer if the turn was deterministic
+
+        Args:
+            query: User query text
+            embedding: Embedding of the query
+            answer: Final answer text
+            tool_calls: Tool interactions of the turn (interaction history entries)
+
+        Returns:
+            True if the answer was stored
+        """
+        tools = [c.get("name", "") for c in tool_calls]
+        failed = any(c.get("role") == "tool_error" for c in tool_calls)
+        if failed or not answer or not self.is_cacheable_query(query) \
+                or any(t not in DETERMINISTIC_TOOLS for t in tools):
+            self.stats.skipped += 1
+            return False
+
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap(faiss.IndexFlatIP(vec.shape[1]))
+
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda i: self._entries[i].created)
+                self._remove([oldest])
+                self.stats.evicted += 1
+
+            entry_id = self._next_id
+            self._next_id += 1
+            now = time.time()
+            self._entries[entry_id] = CacheEntry(
+                query=query,
+                answer=answer,
+                fingerprint=self.fingerprint(query),
+                tools=tools,
+                created=now,
+                expires_at=now + self.ttl,
+            )
+            self._index.add_with_ids(vec, np.asarray([entry_id], dtype="int64"))
+            self.stats.stores += 1
+        return True
+
+    def invalidate(self, tool_name: Optional[str] = None) -> int:
+        """
+        Drop cached entries
+
+        Args:
+            tool_name: Only drop entries that used this tool; all entries if omitted
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            ids = [i for i, e in self._entries.items() if tool_name is None or tool_name in e.tools]
+            self._remove(ids)
+            self.stats.invalidated += len(ids)
+        return len(ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters and current size
+        """
+        with self._lock:
+            return {**self.stats.as_dict(), "size": len(self._entries)}
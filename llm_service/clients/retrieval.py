@@ -0,0 +1,92 @@
+"""
+Retrieval memory of one chat session.
+
+A ``SessionMemory`` owns the session's namespace in the process-wide
+memory store and uses the process-wide embedding service, so building
+one never loads a model. The client creates it once per session and
+hands it to every adapter it creates; switching models (or escalating
+from the small to the large model) keeps the same memory and reuses the
+query embedding that was already computed for the turn. Store calls
+take locks and scan the index, so they run on the default executor
+rather than on the event loop.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.logging_utils import setup_logging
+from .embeddings import DEFAULT_EMBED_MODEL, get_embedding_service
+from .memory_store import get_memory_store
+
+logger = setup_logging("llm_service.retrieval")
+
+Turn = Tuple[str, str]
+
+
+class SessionMemory:
+    """
+    Embeds, stores and retrieves the past interactions of one namespace
+    """
+
+    def __init__(self, namespace: str = "default", embed_model_name: str = DEFAULT_EMBED_MODEL,
+                 top_k: int = 5, embed_backend: Optional[str] = None):
+        """
+        Initialize the memory
+
+        Args:
+            namespace: Memory partition (session) read and written
+            embed_model_name: SentenceTransformer model for embeddings
+            top_k: Number of similar past interactions to retrieve
+            embed_backend: Embedding backend (torch, onnx, onnx-int8; defaults to EMBED_BACKEND)
+        """
+        # Shared, micro-batched embedding model
+        self.embedder = get_embedding_service(embed_model_name, embed_backend)
+        self.embed_dim = self.embedder.get_sentence_embedding_dimension()
+
+        # Shared, bounded store of past interactions; only this namespace is visible
+        self.memory = get_memory_store(embed_model_name, self.embed_dim)
+        self.namespace = namespace
+        self.top_k = top_k
+
+        # Embedding and retrieval of the current query, reused until the next store
+        self._query: Optional[str] = None
+        self._query_embedding: Optional[np.ndarray] = None
+        self._turns: Optional[List[Turn]] = None
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embedding of a user query (computed once per query)
+        """
+        if query != self._query or self._query_embedding is None:
+            self._query, self._query_embedding, self._turns = query, await self.embedder.aencode(query), None
+        return self._query_embedding
+
+    async def retrieve(self, query: str) -> List[Turn]:
+        """
+        Past (user, assistant) turns most similar to a query, oldest first
+        so the same memories always render the same way
+        """
+        if self.memory.size(self.namespace) == 0:
+            return []
+        query_emb = await self.embed_query(query)
+        if self._turns is None:
+            found = await asyncio.get_running_loop().run_in_executor(
+                None, self.memory.search, self.namespace, query_emb, self.top_k)
+            entries = sorted(found, key=lambda e: e.entry_id)
+            self._turns = [(entry.user_msg, entry.assistant_msg) for entry in entries]
+            logger.info("Retrieved %d relevant past interactions", len(self._turns))
+        return list(self._turns)
+
+    async def store(self, user_msg: str, assistant_msg: str):
+        """
+        Store an interaction for future retrieval
+        """
+        embedding = await self.embedder.aencode(f"User: {user_msg}\nAssistant: {assistant_msg}")
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.memory.add, self.namespace, user_msg, assistant_msg, embedding)
+        self._turns = None
+        logger.debug("Stored interaction in memory (total: %d)", self.memory.size(self.namespace))
+
+    def get_stats(self):
+        return self.memory.get_stats(self.namespace)
@@ -0,0 +1,269 @@
+"""
+Token, timing and cost accounting for LLM calls.
+
+Every chat request records what the provider reports (prompt, completion
+and cached tokens; Ollama's load/prompt-eval/eval timings) together with
+a profile of the prompt split into segments: system text, conversation
+summary, retrieved memories, earlier turns, the user message, tool
+schemas and tool results. Segment sizes are estimated locally and scaled
+to the provider's prompt token count, so they add up to what was billed.
+
+Each call also records how much of its prompt repeats the previous
+request's prompt verbatim (the part a prefix cache can reuse). OpenAI
+reports the cached part itself; for Ollama this is the only measure.
+"""
+import json
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..utils.logging_utils import setup_logging
+from ..utils.tokens import estimate_tokens
+from .conversation import RETRIEVAL_HEADER, SUMMARY_HEADER
+
+logger = setup_logging("llm_service.usage")
+
+SEGMENTS = ("system", "summary", "retrieved", "history", "user", "tools", "tool_results")
+
+# USD per million tokens: (input, cached input, output). Local models cost nothing.
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+MESSAGE_OVERHEAD = 4  # tokens of role/formatting per chat message
+
+
+def _price(model: str):
+    # Longest prefix wins, so "gpt-4o-mini-2024-07-18" is priced as gpt-4o-mini
+    matches = [name for name in PRICES if model.startswith(name)]
+    return PRICES[max(matches, key=len)] if matches else None
+
+
+def _message_tokens(message: Dict[str, Any]) -> int:
+    content = message.get("content") or ""
+    tokens = estimate_tokens(content if isinstance(content, str) else json.dumps(content))
+    if message.get("role") == "assistant" and message.get("tool_calls"):
+        tokens += estimate_tokens(str(message["tool_calls"]))
+    return tokens + MESSAGE_OVERHEAD
+
+
+def profile_prompt(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Estimate how many prompt tokens each segment contributes
+
+    Args:
+        messages: Messages as sent to the model
+        tools: Tool definitions as sent to the model
+
+    Returns:
+        Estimated tokens per segment
+    """
+    profile = dict.fromkeys(SEGMENTS, 0)
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    for i, message in enumerate(messages):
+        role = message.get("role")
+        content = str(message.get("content") or "")
+        tokens = _message_tokens(message)
+
+        if role == "system" and content.startswith(RETRIEVAL_HEADER):
+            segment = "retrieved"
+        elif role == "system":
+            segment = "summary" if content.startswith(SUMMARY_HEADER) else "system"
+        elif role in ("tool", "function"):
+            segment = "tool_results"
+        elif i == last_user:
+            segment = "user"
+        else:
+            segment = "history"
+        profile[segment] += tokens
+
+    if tools:
+        profile["tools"] = estimate_tokens(json.dumps(tools))
+    return profile
+
+
+@dataclass
+class CallUsage:
+    model: str
+    purpose: str  # "chat", "follow_up" or "summary"
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    prefix_tokens: int = 0  # leading prompt tokens identical to the previous request
+    latency_s: float = 0.0
+    # Ollama-side timings (seconds); zero for OpenAI
+    load_s: float = 0.0
+    prompt_eval_s: float = 0.0
+    eval_s: float = 0.0
+    segments: Dict[str, int] = field(default_factory=dict)
+    cost_usd: float = 0.0
+
+    def scale_segments(self, estimate: Dict[str, int], prefix: int = 0):
+        """
+        Distribute the reported prompt tokens over the estimated segments
+        (and scale the estimated reusable prefix alike)
+        """
+        total = sum(estimate.values())
+        if not total or not self.prompt_tokens:
+            self.segments = dict(estimate)
+            self.prefix_tokens = prefix
+            return
+        factor = self.prompt_tokens / total
+        self.segments = {name: round(tokens * factor) for name, tokens in estimate.items()}
+        self.prefix_tokens = min(self.prompt_tokens, round(prefix * factor))
+
+    def price(self):
+        prices = _price(self.model)
+        if prices is None:
+            return
+        price_in, price_cached, price_out = prices
+        uncached = self.prompt_tokens - self.cached_tokens
+        self.cost_usd = (uncached * price_in + self.cached_tokens * price_cached
+                         + self.completion_tokens * price_out) / 1e6
+
+
+def openai_usage(response, model: str, purpose: str, latency: float, estimate: Dict[str, int],
+                 prefix: int = 0) -> CallUsage:
+    """
+    Build a CallUsage from an OpenAI chat completion
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    call = CallUsage(
+        model=model,
+        purpose=purpose,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        latency_s=latency,
+    )
+    call.scale_segments(estimate, prefix)
+    call.price()
+    return call
+
+
+def ollama_usage(response, model: str, purpose: str, latency: float, estimate: Dict[str, int],
+                 prefix: int = 0) -> CallUsage:
+    """
+    Build a CallUsage from an Ollama chat response (durations are in nanoseconds)
+    """
+    def seconds(name):
+        return (getattr(response, name, 0) or 0) / 1e9
+
+    call = CallUsage(
+        model=model,
+        purpose=purpose,
+        prompt_tokens=getattr(response, "prompt_eval_count", 0) or 0,
+        completion_tokens=getattr(response, "eval_count", 0) or 0,
+        latency_s=latency,
+        load_s=seconds("load_duration"),
+        prompt_eval_s=seconds("prompt_eval_duration"),
+        eval_s=seconds("eval_duration"),
+    )
+    call.scale_segments(estimate, prefix)
+    return call
+
+
+class UsageTracker:
+    """
+    Per-session aggregation of LLM call usage
+    """
+
+    def __init__(self, session_id: str = "default", keep_calls: int = 50):
+        """
+        Initialize the tracker
+
+        Args:
+            session_id: Session the usage belongs to (for logs)
+            keep_calls: Number of recent calls kept verbatim
+        """
+        self.session_id = session_id
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.prefix_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_s = 0.0
+        self.segments = dict.fromkeys(SEGMENTS, 0)
+        self.by_model: Dict[str, Dict[str, float]] = {}
+        self.recent: Deque[CallUsage] = deque(maxlen=keep_calls)
+        self._last_prompt: Tuple[str, List[str]] = ("", [])
+        self._lock = threading.Lock()
+
+    def shared_prefix(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Estimated tokens at the start of this prompt that repeat the previous
+        prompt byte for byte, then remember this prompt
+
+        Tool definitions come before the messages in the rendered prompt, so
+        they are compared first.
+        """
+        tools_part = json.dumps(tools or [], sort_keys=True)
+        parts = [json.dumps(m, sort_keys=True, default=str) for m in messages]
+        with self._lock:
+            previous_tools, previous = self._last_prompt
+            self._last_prompt = (tools_part, parts)
+        if tools_part != previous_tools:
+            return 0
+        shared = estimate_tokens(tools_part) if tools else 0
+        for message, part, before in zip(messages, parts, previous):
+            if part != before:
+                break
+            shared += _message_tokens(message)
+        return shared
+
+    def record(self, call: CallUsage):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += call.prompt_tokens
+            self.completion_tokens += call.completion_tokens
+            self.cached_tokens += call.cached_tokens
+            self.prefix_tokens += call.prefix_tokens
+            self.cost_usd += call.cost_usd
+            self.latency_s += call.latency_s
+            for name, tokens in call.segments.items():
+                self.segments[name] = self.segments.get(name, 0) + tokens
+            model = self.by_model.setdefault(call.model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                          "completion_tokens": 0, "cost_usd": 0.0})
+            model["calls"] += 1
+            model["prompt_tokens"] += call.prompt_tokens
+            model["cached_tokens"] += call.cached_tokens
+            model["completion_tokens"] += call.completion_tokens
+            model["cost_usd"] += call.cost_usd
+            self.recent.append(call)
+
+        top = sorted(call.segments.items(), key=lambda kv: kv[1], reverse=True)[:3]
+        logger.info(
+            "[%s] %s %s: prompt=%d (cached %d, stable prefix %d) completion=%d latency=%.2fs cost=$%.5f "
+            "top segments: %s",
+            self.session_id, call.model, call.purpose, call.prompt_tokens, call.cached_tokens,
+            call.prefix_tokens, call.completion_tokens, call.latency_s, call.cost_usd,
+            ", ".join(f"{n}={t}" for n, t in top if t),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompt = self.prompt_tokens
+            return {
+                "calls": self.calls,
+                "prompt_tokens": prompt,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_rate": self.cached_tokens / prompt if prompt else 0.0,
+                "prefix_tokens": self.prefix_tokens,
+                "prefix_rate": self.prefix_tokens / prompt if prompt else 0.0,
+                "cost_usd": round(self.cost_usd, 6),
+                "mean_latency_s": self.latency_s / self.calls if self.calls else 0.0,
+                "prompt_segments": dict(self.segments),
+                "prompt_share": {n: t / prompt for n, t in self.segments.items()} if prompt else {},
+                "by_model": {m: {**v, "cached_rate": v["cached_tokens"] / v["prompt_tokens"]
+                                 if v["prompt_tokens"] else 0.0} for m, v in self.by_model.items()},
+                "recent": [asdict(c) for c in self.recent],
+            }
@@ -1,51 +1,160 @@
 # llm_service.py
+import threading
+from concurrent.futures import CancelledError
+
 import streamlit as st
 import requests
 
 from llm_service.servers.server_manager import ServerManager
-from llm_service.clients import MCPClient
+from llm_service.clients.backend_pool import get_pool_stats as _get_pool_stats
+from llm_service.clients.embeddings import get_embedding_stats as _get_embedding_stats
+from llm_service.clients.response_cache import ResponseCache
+from llm_service.sessions import ProgressCallback, SessionManager
+
+DEFAULT_SESSION = "default"
 
-# —– module-level singletons —–
+# —– process-wide service: one runtime, many sessions —–
 _server_manager = ServerManager()
-_client: MCPClient | None = None
+_servers_started = False
+_servers_lock = threading.Lock()
+_sessions = SessionManager(
+    server_script="llm_service/servers/mcp_server.py",
+    server_url=_server_manager.mcp_url,
+    default_model="gpt-4o",
+)
+
+def set_model_name(name: str, session_id: str | None = None) -> None:
+    """
+    Configure which LLM model to use.
+
+    Without a session_id this sets the default for sessions created afterwards
+    (and for the default session); with one it switches only that session.
+    """
+    if session_id is None:
+        _sessions.default_model = name
+        session_id = DEFAULT_SESSION
+        if session_id not in _sessions.list_sessions():
+            return
+    _sessions.set_model(session_id, name)
+
+def set_small_model_name(name: str | None) -> None:
+    """
+    Route simple queries of sessions created afterwards to a fast small model,
+    escalating to the main model when needed. None disables routing.
+    """
+    _sessions.small_model_name = name
+
+def get_route_stats(session_id: str = DEFAULT_SESSION) -> dict:
+    """
+    Per-route latency and success metrics of a session (empty without routing).
+    """
+    if session_id not in _sessions.list_sessions():
+        return {}
+    client = _sessions.get_session(session_id).client
+    return client.get_route_stats() if client is not None else {}
+
+def get_usage_stats(session_id: str | None = DEFAULT_SESSION) -> dict:
+    """
+    Token, timing and cost accounting of a session's LLM calls, split by
+    prompt segment, with the share of prompt tokens served from the
+    provider's cache (cached_rate) and repeated verbatim from the previous
+    request (prefix_rate). With session_id=None, returns every open
+    session's stats.
+    """
+    if session_id is None:
+        return {sid: get_usage_stats(sid) for sid in _sessions.list_sessions()}
+    if session_id not in _sessions.list_sessions():
+        return {}
+    client = _sessions.get_session(session_id).client
+    return client.get_usage_stats() if client is not None else {}
+
+def get_memory_stats(session_id: str = DEFAULT_SESSION) -> dict:
+    """
+    Retrieval memory size and eviction counts of a session.
+    """
+    if session_id not in _sessions.list_sessions():
+        return {}
+    client = _sessions.get_session(session_id).client
+    return client.get_memory_stats() if client is not None else {}
 
-# default; overridden by set_model_name()
-_model_name = "gpt-4o"
+def set_simulation_backend(name: str) -> None:
+    """
+    Choose where simulations run: "http" (Flask endpoint), "inprocess" or "pool".
+    Must be called before the first message starts the servers.
+    """
+    _server_manager.simulation_backend = name
+
+def enable_response_cache(threshold: float = 0.95, ttl: float = 3600.0) -> ResponseCache:
+    """
+    Turn on the shared semantic response cache for sessions created afterwards.
+    """
+    if _sessions.response_cache is None:
+        _sessions.response_cache = ResponseCache(threshold=threshold, ttl=ttl)
+    return _sessions.response_cache
+
+def get_response_cache_stats() -> dict:
+    """
+    Hit/miss metrics of the response cache (empty if disabled).
+    """
+    cache = _sessions.response_cache
+    return cache.get_stats() if cache is not None else {}
+
+def get_embedding_stats() -> dict:
+    """
+    Batching metrics of the shared embedding service(s).
+    """
+    return _get_embedding_stats()
+
+def get_backend_stats() -> dict:
+    """
+    Load, latency and circuit-breaker state of each LLM backend pool.
+    """
+    return _get_pool_stats()
 
-def set_model_name(name: str) -> None:
+def get_model_name(session_id: str | None = None) -> str:
     """
-    Configure which LLM model to use for all subsequent send_message() calls.
+    Retrieve the model name in use by a session (or the default).
     """
-    global _model_name
-    _model_name = name
+    if session_id is None or session_id not in _sessions.list_sessions():
+        return _sessions.default_model
+    return _sessions.get_session(session_id).model_name
 
-def get_model_name() -> str:
+def _ensure_servers() -> None:
     """
-    Retrieve the current model name in use.
+    Lazily start the backend servers once per process.
     """
-    return _model_name
+    global _servers_started
+    with _servers_lock:
+        if not _servers_started:
+            _server_manager.ensure_running()
+            _servers_started = True
 
-def _get_client() -> MCPClient:
+def close_session(session_id: str) -> None:
     """
-    Lazily start the server and instantiate the MCPClient,
-    caching it for reuse.
+    Release the connections and memory held by a session.
     """
-    global _client
-    if _client is None:
-        _server_manager.ensure_running()
-        _client = MCPClient(
-            server_script="llm_service/servers/mcp_server.py",
-            model_name=_model_name,
-        )
-    return _client
+    _sessions.close_session(session_id)
 
-def send_message(query: str) -> str:
+def cancel_message(session_id: str = DEFAULT_SESSION) -> None:
     """
-    Forward `query` to the running MCP server via a persistent client.
+    Abort the message a session is processing, including any simulation or
+    fit it is waiting on, which stops on the server too.
+    """
+    _sessions.cancel(session_id)
+
+def send_message(query: str, session_id: str = DEFAULT_SESSION,
+                 on_progress: ProgressCallback | None = None) -> str:
+    """
+    Forward `query` to the MCP server within the given conversation session.
+
+    on_progress(tool, progress, total, message) is called in the caller's
+    thread while long-running tools advance.
     """
     try:
-        client = _get_client()
-        return client.ask(query)
+        _ensure_servers()
+        return _sessions.send(session_id, query, on_progress=on_progress)
+    except CancelledError:
+        return "Cancelled."
     except requests.RequestException as err:
         st.error(f"Backend error: {err}")
         return "Sorry, something went wrong."
@@ -0,0 +1,224 @@
+"""
+Admission control for the simulation endpoint.
+
+Heavy routes run under an ``AdmissionController``: at most
+``max_concurrent`` requests execute and at most ``max_queue`` wait.
+Waiting requests are granted slots session by session (the session with
+the fewest running requests goes next), so one chatty session cannot
+monopolise the host. When the queue is full, a session below its fair
+share of queue slots displaces the newest request of the session holding
+the most. Anything else beyond the bounds is rejected at once with
+``Rejected``, which the endpoint turns into ``429`` plus ``Retry-After``.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+ANONYMOUS = "anonymous"
+
+
+class Rejected(Exception):
+    """
+    Request refused because the server is at capacity
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("session_id", "event", "since", "granted", "shed")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.event = threading.Event()
+        self.since = time.monotonic()
+        self.granted = False
+        self.shed = False
+
+
+class AdmissionController:
+    """
+    Bounded concurrency and queue depth with per-session fair share
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float = 30.0):
+        """
+        Initialize the controller
+
+        Args:
+            name: Label used in messages and stats
+            max_concurrent: Requests allowed to run at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait before it is rejected
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.stats = {"admitted": 0, "rejected_full": 0, "rejected_share": 0, "rejected_timeout": 0}
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[_Waiter]] = {}
+        self._active = 0
+        self._queued = 0
+        self._service_time = 1.0  # EWMA of seconds per request
+        self._wait_time = 0.0  # EWMA of seconds spent queued
+
+    def _retry_after(self) -> int:
+        """
+        Rough time until a newly queued request would start. Caller holds the lock.
+        """
+        backlog = self._queued + self._active
+        return max(1, math.ceil(backlog / self.max_concurrent * self._service_time))
+
+    def _fair_share(self, session_id: str) -> int:
+        """
+        Queue slots one session may hold: the queue split across active sessions
+        """
+        sessions = len(set(self._running) | set(self._waiting) | {session_id})
+        return max(1, self.max_queue // sessions)
+
+    def _shed_heaviest(self, session_id: str) -> bool:
+        """
+        Drop the newest waiter of the session queueing the most, if it is
+        over its fair share and a different session. Caller holds the lock.
+        """
+        share = self._fair_share(session_id)
+        heaviest = max(self._waiting, key=lambda s: len(self._waiting[s]), default=None)
+        if heaviest is None or heaviest == session_id or len(self._waiting[heaviest]) <= share:
+            return False
+        waiter = self._waiting[heaviest].pop()
+        if not self._waiting[heaviest]:
+            del self._waiting[heaviest]
+        self._queued -= 1
+        waiter.shed = True
+        waiter.event.set()
+        return True
+
+    def _remove_waiter(self, waiter: _Waiter):
+        queue = self._waiting.get(waiter.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[waiter.session_id]
+            self._queued -= 1
+
+    def _grant_next(self):
+        """
+        Hand a free slot to the waiting session with the fewest running requests
+        """
+        while self._active < self.max_concurrent and self._waiting:
+            session_id = min(
+                self._waiting,
+                key=lambda s: (self._running.get(s, 0), self._waiting[s][0].since),
+            )
+            queue = self._waiting[session_id]
+            waiter = queue.popleft()
+            if not queue:
+                del self._waiting[session_id]
+            self._queued -= 1
+            self._start(session_id)
+            waiter.granted = True
+            waiter.event.set()
+
+    def _start(self, session_id: str):
+        self._active += 1
+        self._running[session_id] = self._running.get(session_id, 0) + 1
+        self.stats["admitted"] += 1
+
+    def _finish(self, session_id: str, elapsed: float):
+        self._active -= 1
+        self._running[session_id] -= 1
+        if not self._running[session_id]:
+            del self._running[session_id]
+        self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+        self._grant_next()
+
+    def _reject(self, counter: str, reason: str):
+        self.stats[counter] += 1
+        raise Rejected(f"{self.name} is at capacity: {reason}", self._retry_after())
+
+    def acquire(self, session_id: Optional[str] = None) -> str:
+        """
+        Wait for a slot or raise Rejected
+
+        Returns:
+            The session id the slot is accounted to (pass it to release)
+        """
+        session_id = session_id or ANONYMOUS
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._start(session_id)
+                return session_id
+            if len(self._waiting.get(session_id, ())) >= self._fair_share(session_id):
+                self._reject("rejected_share", "this session already has its share of queued requests")
+            if self._queued >= self.max_queue and not self._shed_heaviest(session_id):
+                self._reject("rejected_full", "queue is full")
+            waiter = _Waiter(session_id)
+            self._waiting.setdefault(session_id, deque()).append(waiter)
+            self._queued += 1
+
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            if waiter.shed:
+                self._reject("rejected_share", "queue slot given to another session")
+            if not waiter.granted:
+                self._remove_waiter(waiter)
+                self._reject("rejected_timeout", "timed out waiting for a slot")
+            self._wait_time = 0.8 * self._wait_time + 0.2 * (time.monotonic() - waiter.since)
+        return session_id
+
+    def release(self, session_id: str, elapsed: float):
+        with self._lock:
+            self._finish(session_id, elapsed)
+
+    @contextmanager
+    def admit(self, session_id: Optional[str] = None) -> Iterator[None]:
+        """
+        Run the body in an admitted slot
+
+        Raises:
+            Rejected: The server is overloaded
+        """
+        session_id = self.acquire(session_id)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(session_id, time.monotonic() - start)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self.stats,
+                "running": self._active,
+                "queued": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "avg_service_s": round(self._service_time, 3),
+                "avg_wait_s": round(self._wait_time, 3),
+            }
+
+
+_cpus = os.cpu_count() or 1
+
+# Simulations each use one core; a fit already spreads over every core
+SIMULATE_ADMISSION = AdmissionController(
+    "simulation server",
+    max_concurrent=int(os.getenv("SIMULATE_MAX_CONCURRENT", str(_cpus))),
+    max_queue=int(os.getenv("SIMULATE_MAX_QUEUE", str(4 * _cpus))),
+    queue_timeout=5.0,  # well inside the MCP server's request timeout
+)
+FIT_ADMISSION = AdmissionController(
+    "fitting server",
+    max_concurrent=int(os.getenv("FIT_MAX_CONCURRENT", "1")),
+    max_queue=int(os.getenv("FIT_MAX_QUEUE", "4")),
+    queue_timeout=300.0,
+)
@@ -1,84 +1,156 @@
-from flask import Flask, jsonify, request
-from importlib import import_module
-from typing import Dict
+import json
+import os
+import sys
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+# Allow running as a script (python llm_service/servers/endpoint.py)
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from llm_service.servers import simulation
+from llm_service.servers import jobs
+from llm_service.servers.admission import FIT_ADMISSION, SIMULATE_ADMISSION, AdmissionController, Rejected
 
 app = Flask(__name__)
 
+
+def run_admitted(controller: AdmissionController, handler):
+    """
+    Run a heavy handler under admission control; overload becomes 429 + Retry-After.
+    Requests are accounted to the chat session named in X-Session-Id.
+    """
+    try:
+        with controller.admit(request.headers.get("X-Session-Id")):
+            body, code = handler(request.get_json(silent=True))
+    except Rejected as exc:
+        return busy_response(exc)
+    return jsonify(body), code
+
+
+def busy_response(exc: Rejected):
+    resp = jsonify({"error": exc.reason, "retry_after": exc.retry_after})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(exc.retry_after)
+    return resp
+
+
+def run_streamed(controller: AdmissionController, handler):
+    """
+    Run a heavy handler under admission control, streaming its progress as
+    newline-delimited JSON (see jobs.stream_events for the events).
+
+    The slot is held until the handler returns, not just until the client
+    disconnects, so abandoned jobs still count until they stop. If the
+    client goes away, the job is cancelled at the handler's next check.
+    An X-Job-Id header names the job, so the caller can cancel it via
+    DELETE /jobs/<id> before it saw the first event.
+    """
+    try:
+        session_id = controller.acquire(request.headers.get("X-Session-Id"))
+    except Rejected as exc:
+        return busy_response(exc)
+    start = time.monotonic()
+    stream = jobs.stream_events(handler, request.get_json(silent=True),
+                                on_finish=lambda: controller.release(session_id, time.monotonic() - start),
+                                job_id=request.headers.get("X-Job-Id"))
+
+    def lines():
+        for event in stream:
+            yield json.dumps(event) + "\n"
+
+    resp = Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+    resp.call_on_close(stream.close)  # cancels the job if the client went away
+    return resp
+
+
 # Root endpoint
 @app.get("/")
 def index():
-    return jsonify(message="Welcome to the API"), 200
+    body, code = simulation.index()
+    return jsonify(body), code
 
 
 # Basic health-check or “status” endpoint
 @app.get("/status")
 def status():
-    return jsonify(ok=True, message="API is alive"), 200
+    body, code = simulation.status()
+    return jsonify(body), code
 
 
 # Example POST endpoint that echoes JSON back
 @app.post("/echo")
 def echo():
-    data = request.get_json(silent=True) or {}
-    return jsonify(received=data, length=len(data)), 200
-
-
-from importlib import metadata
+    body, code = simulation.echo(request.get_json(silent=True))
+    return jsonify(body), code
 
 
 @app.get("/version")
 def version():
-    try:
-        ver = metadata.version("tellurium")
-    except metadata.PackageNotFoundError:
-        ver = "not-installed"
-    return jsonify(package="tellurium", version=ver), 200
+    body, code = simulation.version()
+    return jsonify(body), code
+
+
+@app.get("/cache")
+def cache():
+    body, code = simulation.cache_stats()
+    return jsonify(body), code
+
+
+@app.get("/admission")
+def admission():
+    return jsonify({"simulate": SIMULATE_ADMISSION.get_stats(), "fit": FIT_ADMISSION.get_stats()}), 200
 
 
 @app.post("/simulate")
 def simulate():
     """
-    Body JSON:
-        {
-          "antimony": "<Antimony text>",
-          "t_start": 0,
-          "t_end":   100,
-          "n_steps": 200
-        }
-    Returns:
-        {
-          "columns": [...],
-          "data":    [[row0], [row1], ...]
-        }
+    Run a simulation; see simulation.simulate for the body and response format.
     """
-    payload = request.get_json(silent=True) or {}
-    antimony = payload.get("antimony")
-    t0 = int(payload.get("t_start", 0))
-    t1 = int(payload.get("t_end", 100))
-    n_steps = int(payload.get("n_steps", 100))
+    return run_admitted(SIMULATE_ADMISSION, simulation.simulate)
 
-    if not antimony:
-        return jsonify(error="Field 'antimony' is required."), 400
 
-    # Import tellurium only when needed (avoids startup cost elsewhere)
-    try:
-        te = import_module("tellurium")
-    except ModuleNotFoundError:
-        return jsonify(error="Tellurium is not installed on the server"), 500
+@app.post("/fit")
+def fit():
+    """
+    Parallel parameter estimation; see simulation.fit for the body and response format.
+    """
+    return run_admitted(FIT_ADMISSION, simulation.fit)
 
-    try:
-        rr = te.loada(antimony)
-        result = rr.simulate(t0, t1, n_steps)
 
-        columns = list(result.colnames)
-        data = result.tolist()  # numpy ndarray → list of lists
+@app.post("/simulate/stream")
+def simulate_stream():
+    """
+    Like /simulate, but streams progress events before the result.
+    """
+    return run_streamed(SIMULATE_ADMISSION, simulation.simulate)
 
-        return jsonify(columns=columns, data=data), 200
-    except Exception as exc:
-        return jsonify(error=str(exc)), 500
+
+@app.post("/fit/stream")
+def fit_stream():
+    """
+    Like /fit, but streams progress after each optimizer generation.
+    """
+    return run_streamed(FIT_ADMISSION, simulation.fit)
+
+
+@app.delete("/jobs/<job_id>")
+def cancel_job(job_id):
+    """
+    Cancel a streamed simulation or fit by the id from its first event
+    (or the X-Job-Id the caller sent with it).
+    """
+    if not jobs.cancel_job(job_id):
+        return jsonify({"error": f"No running job {job_id}"}), 404
+    return jsonify({"cancelled": job_id}), 200
 
 
 if __name__ == "__main__":
+    # Rehydrate popular models in the background so startup isn't delayed
+    threading.Thread(target=simulation.warm_up, name="model-warm-up", daemon=True).start()
+
     # • debug=True ⇢ auto-reload on code change
     # • host="0.0.0.0" ⇢ bind all interfaces (LAN) instead of only 127.0.0.1
     app.run(port=5000, debug=True)
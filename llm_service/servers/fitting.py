@@ -0,0 +1,249 @@
+"""
+Parallel parameter estimation for the /fit endpoint and the tellurium_fit tool.
+
+The optimizer is a bounded differential evolution (rand/1/bin). Each
+generation's candidates are scored as one batch across a process pool;
+every worker compiles the model once in its initializer and reuses it
+for all of its objective evaluations.
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llm_service.servers.jobs import Job
+from llm_service.servers.model_cache import bind_values, get_model_cache
+
+FAILED = 1e300  # objective value for simulations that fail
+MAX_ITERATIONS = 500  # generations one request may ask for
+MAX_POPULATION = 200  # candidates per generation one request may ask for
+
+# Per-worker state, set by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(antimony: str, names: Sequence[str], species: Sequence[str],
+                 times: Sequence[float], observed: np.ndarray):
+    rr, values = get_model_cache().instance(antimony)
+    grid = np.unique(np.concatenate([[0.0], np.asarray(times, dtype=float)]))
+    _worker.update(
+        rr=rr,
+        values=values,
+        names=list(names),
+        selections=["time"] + list(species),
+        grid=grid,
+        rows=np.searchsorted(grid, times),
+        observed=observed,
+    )
+
+
+def _simulate(theta: Sequence[float]) -> np.ndarray:
+    """
+    Simulate the worker's model with parameter vector theta at the observed times
+    """
+    rr = _worker["rr"]
+    bind_values(rr, _worker["values"])
+    for name, value in zip(_worker["names"], theta):
+        rr.setValue(name, float(value))
+    result = rr.simulate(times=_worker["grid"], selections=_worker["selections"])
+    return np.asarray(result)[_worker["rows"], 1:]
+
+
+def _evaluate(theta: Sequence[float]) -> float:
+    try:
+        diff = _simulate(theta) - _worker["observed"]
+    except Exception:
+        return FAILED
+    value = float(np.nansum(diff ** 2))
+    return value if math.isfinite(value) else FAILED
+
+
+def _residuals(theta: Sequence[float]) -> np.ndarray:
+    return _simulate(theta) - _worker["observed"]
+
+
+class FitProblem:
+    """
+    Validated fit request
+    """
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.antimony = payload.get("antimony")
+        if not self.antimony:
+            raise ValueError("Field 'antimony' is required.")
+
+        params = payload.get("parameters") or {}
+        if not isinstance(params, dict) or not params:
+            raise ValueError("Field 'parameters' must map parameter names to [lower, upper] bounds.")
+        self.names = list(params)
+        bounds = np.asarray([params[n] for n in self.names], dtype=float)
+        if bounds.shape != (len(self.names), 2) or np.any(bounds[:, 0] >= bounds[:, 1]):
+            raise ValueError("Each parameter needs bounds [lower, upper] with lower < upper.")
+        self.lower, self.upper = bounds[:, 0], bounds[:, 1]
+        # Search positive ranges spanning orders of magnitude in log space
+        self.log_scale = (self.lower > 0) & (self.upper / np.where(self.lower > 0, self.lower, 1) >= 100)
+
+        data = payload.get("data") or {}
+        if "time" not in data:
+            raise ValueError("Field 'data' must contain a 'time' column and at least one species.")
+        self.times = np.asarray(data["time"], dtype=float)
+        self.species = [k for k in data if k != "time"]
+        if not self.species or len(self.times) < 2:
+            raise ValueError("Field 'data' needs at least two time points and one species.")
+        if np.any(np.diff(self.times) <= 0) or self.times[0] < 0:
+            raise ValueError("Observed times must be non-negative and strictly increasing.")
+        columns = [np.asarray(data[s], dtype=float) for s in self.species]
+        if any(len(c) != len(self.times) for c in columns):
+            raise ValueError("Every data column must have as many values as 'time'.")
+        self.observed = np.column_stack(columns)
+
+        self.max_iterations = int(payload.get("max_iterations", 50))
+        if not 1 <= self.max_iterations <= MAX_ITERATIONS:
+            raise ValueError(f"'max_iterations' must be between 1 and {MAX_ITERATIONS}.")
+        self.population = max(4, int(payload.get("population", min(MAX_POPULATION, max(8, 5 * len(self.names))))))
+        if self.population > MAX_POPULATION:
+            raise ValueError(f"'population' must be at most {MAX_POPULATION}.")
+        # Each worker is a process with its own compiled model; never more than the cores
+        cores = os.cpu_count() or 1
+        self.workers = min(cores, max(1, int(payload.get("workers") or cores)))
+        self.tolerance = float(payload.get("tolerance", 1e-8))
+        self.seed = payload.get("seed")
+
+    def from_unit(self, u: np.ndarray) -> np.ndarray:
+        lo, hi = self.lower.copy(), self.upper.copy()
+        lo[self.log_scale], hi[self.log_scale] = np.log10(lo[self.log_scale]), np.log10(hi[self.log_scale])
+        x = lo + np.clip(u, 0.0, 1.0) * (hi - lo)
+        x[..., self.log_scale] = 10 ** x[..., self.log_scale]
+        return x
+
+
+def _check_model(problem: FitProblem):
+    """
+    Compile once in the parent (also seeding the disk cache for the workers)
+    and check that every parameter and species exists.
+    """
+    with get_model_cache().checkout(problem.antimony) as rr:
+        model = rr.model
+        settable = set(model.getGlobalParameterIds()) | set(model.getFloatingSpeciesIds()) \
+            | set(model.getBoundarySpeciesIds()) | set(model.getCompartmentIds())
+        observable = set(model.getFloatingSpeciesIds()) | set(model.getBoundarySpeciesIds())
+    unknown = [n for n in problem.names if n not in settable and not n.startswith("init(")]
+    if unknown:
+        raise ValueError(f"Unknown parameters: {unknown}")
+    missing = [s for s in problem.species if s not in observable]
+    if missing:
+        raise ValueError(f"Observed species not in model: {missing}")
+
+
+def differential_evolution(score: Callable[[np.ndarray], np.ndarray], dim: int, size: int,
+                           max_iterations: int, tolerance: float, rng: np.random.Generator,
+                           on_generation: Optional[Callable[[int, float], None]] = None
+                           ) -> Tuple[np.ndarray, np.ndarray, int, int, bool]:
+    """
+    Minimize over the unit cube with rand/1/bin differential evolution
+
+    Args:
+        score: Objective values of a (candidates, dim) batch
+        dim: Number of parameters
+        size: Population size (at least 4)
+        max_iterations: Generations to run at most
+        tolerance: Stop once the population's objective values agree to
+                   this relative spread
+        rng: Random generator (seed it for reproducible fits)
+        on_generation: Called with (generation, best value) after each one;
+                       may raise to stop the search
+
+    Returns:
+        (population, fitness, evaluations, iterations, converged)
+    """
+    mutation, crossover = 0.7, 0.9
+
+    # Latin hypercube initial population
+    population = (rng.permuted(np.tile(np.arange(size), (dim, 1)), axis=1).T
+                  + rng.random((size, dim))) / size
+    fitness = score(population)
+    evaluations, iterations, converged = size, 0, False
+
+    for iterations in range(1, max_iterations + 1):
+        idx = np.array([rng.choice(np.delete(np.arange(size), i), 3, replace=False) for i in range(size)])
+        a, b, c = population[idx[:, 0]], population[idx[:, 1]], population[idx[:, 2]]
+        mutant = np.clip(a + mutation * (b - c), 0.0, 1.0)
+        cross = rng.random((size, dim)) < crossover
+        cross[np.arange(size), rng.integers(0, dim, size)] = True
+        trial = np.where(cross, mutant, population)
+
+        trial_fitness = score(trial)
+        evaluations += size
+        better = trial_fitness <= fitness
+        population[better], fitness[better] = trial[better], trial_fitness[better]
+        if on_generation is not None:
+            on_generation(iterations, float(fitness.min()))
+
+        finite = fitness[fitness < FAILED]
+        if len(finite) == size and np.std(finite) <= tolerance * (1 + abs(np.mean(finite))):
+            converged = True
+            break
+    return population, fitness, evaluations, iterations, converged
+
+
+def run_fit(problem: FitProblem, job: Optional[Job] = None) -> Dict[str, Any]:
+    """
+    Run differential evolution with batched parallel objective evaluations
+
+    Args:
+        problem: Validated fit request
+        job: Receives progress after each generation; cancelling it stops
+             the fit (raises Cancelled) before the next generation
+
+    Returns:
+        Best-fit values, objective, per-species residuals and timing
+    """
+    _check_model(problem)
+    start = time.perf_counter()
+    rng = np.random.default_rng(problem.seed)
+
+    def on_generation(iteration: int, best: float):
+        if job is not None:
+            job.report(iteration / problem.max_iterations,
+                       f"generation {iteration} of {problem.max_iterations}, best SSE {best:.4g}")
+            job.check()
+
+    with ProcessPoolExecutor(
+            max_workers=problem.workers,
+            initializer=_init_worker,
+            initargs=(problem.antimony, problem.names, problem.species, problem.times, problem.observed),
+    ) as pool:
+        def score(unit_batch: np.ndarray) -> np.ndarray:
+            thetas = problem.from_unit(unit_batch)
+            chunk = max(1, len(thetas) // (problem.workers * 2))
+            return np.asarray(list(pool.map(_evaluate, thetas, chunksize=chunk)))
+
+        population, fitness, evaluations, iterations, converged = differential_evolution(
+            score, len(problem.names), problem.population, problem.max_iterations, problem.tolerance,
+            rng, on_generation)
+
+        best = int(np.argmin(fitness))
+        best_theta = problem.from_unit(population[best])
+        try:
+            residuals = pool.submit(_residuals, best_theta).result()
+        except Exception:
+            residuals = np.full_like(problem.observed, np.nan)
+
+    sse = float(fitness[best])
+    n_points = int(np.sum(~np.isnan(problem.observed)))
+    return {
+        "parameters": {n: float(v) for n, v in zip(problem.names, best_theta)},
+        "sse": sse,
+        "rmse": math.sqrt(sse / n_points) if n_points and sse < FAILED else None,
+        "residuals": {"time": problem.times.tolist(),
+                      **{s: np.where(np.isnan(residuals[:, i]), None, residuals[:, i]).tolist()
+                         for i, s in enumerate(problem.species)}},
+        "evaluations": evaluations,
+        "iterations": iterations,
+        "converged": converged,
+        "workers": problem.workers,
+        "elapsed": time.perf_counter() - start,
+    }
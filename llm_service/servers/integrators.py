@@ -0,0 +1,250 @@
+"""
+Integrator selection and automatic tuning for simulations.
+
+A request may name a RoadRunner integrator and its settings, e.g.
+``{"name": "rk45"}`` or ``{"name": "cvode", "stiff": true,
+"relative_tolerance": 1e-8}``; ``use_integrator`` applies them to a
+cached instance for one run and restores the instance afterwards.
+
+``"auto"`` tunes instead: ``tune`` integrates the model once with tight
+CVODE tolerances as a reference, times a few cheaper configurations
+(``CANDIDATES``) on the same grid, and picks the fastest whose output
+stays within ``ACCURACY`` of the reference. Stiffness depends on the
+parameter values and the horizon as much as on the structure, so the
+model cache remembers each choice per structure together with the
+values and horizon it was tuned for (``tuning_context``). Another value
+set or horizon reuses the latest choice only after ``verify`` compares
+one run of it with a reference run.
+
+Run ``python -m llm_service.servers.integrators`` to compare the tuned
+choice with the default integrator on a few reference models.
+"""
+import argparse
+import hashlib
+import json
+import math
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+INTEGRATORS = ("cvode", "rk45", "rk4", "euler")
+FIXED_STEP = ("rk4", "euler")  # step once per output interval; no variable-step output
+DEFAULT_INTEGRATOR = "cvode"
+AUTO = "auto"
+
+ACCURACY = 1e-3  # largest error allowed per column, as a fraction of its range
+REFERENCE = {"name": "cvode", "stiff": True, "relative_tolerance": 1e-10, "absolute_tolerance": 1e-14}
+# Cheapest first; fixed-step integrators are left out since their accuracy
+# depends on the output grid, which changes between requests
+CANDIDATES = [
+    {"name": "rk45"},
+    {"name": "cvode", "stiff": False},
+    {"name": "cvode", "stiff": False, "relative_tolerance": 1e-4, "absolute_tolerance": 1e-8},
+    {"name": "cvode", "stiff": True},
+    {"name": "cvode", "stiff": True, "relative_tolerance": 1e-4, "absolute_tolerance": 1e-8},
+    {"name": "cvode", "stiff": True, "maximum_num_steps": 100000},
+]
+
+Settings = Dict[str, Any]
+
+
+def parse_settings(spec: Any) -> Optional[Settings]:
+    """
+    Validate the "integrator" field of a request
+
+    Args:
+        spec: None, an integrator name, "auto", or a dict with "name" and
+              integrator settings
+
+    Returns:
+        Settings dict, AUTO, or None for the model's current integrator
+
+    Raises:
+        ValueError: The spec is malformed or names an unknown integrator
+    """
+    if spec is None or spec == AUTO:
+        return spec
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    if not isinstance(spec, dict):
+        raise ValueError("'integrator' must be a name, \"auto\" or an object")
+    settings = dict(spec)
+    name = settings.setdefault("name", DEFAULT_INTEGRATOR)
+    if name not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator {name!r}; choose from {INTEGRATORS}")
+    for key, value in settings.items():
+        if key != "name" and not isinstance(value, (int, float, bool)):
+            raise ValueError(f"Integrator setting {key!r} must be a number or boolean")
+    return settings
+
+
+@contextmanager
+def use_integrator(rr, settings: Optional[Settings]) -> Iterator[None]:
+    """
+    Run the body with an integrator selected and configured
+
+    The instance goes back to the model cache afterwards, so the changed
+    settings and the previous integrator are restored.
+
+    Raises:
+        ValueError: A setting does not exist for the chosen integrator
+    """
+    if not settings:
+        yield
+        return
+    previous = rr.getIntegrator().getName()
+    rr.setIntegrator(settings["name"])
+    integrator = rr.getIntegrator()
+    saved = {}
+    try:
+        known = set(integrator.getSettings())
+        for key, value in settings.items():
+            if key == "name":
+                continue
+            if key not in known:
+                raise ValueError(f"Integrator {settings['name']!r} has no setting {key!r}")
+            saved[key] = integrator.getValue(key)
+            integrator.setValue(key, value)
+        yield
+    finally:
+        for key, value in saved.items():
+            integrator.setValue(key, value)
+        rr.setIntegrator(previous)
+
+
+def _run(rr, settings: Settings, t0: float, t1: float, points: int) -> Tuple[float, np.ndarray]:
+    rr.reset()
+    with use_integrator(rr, settings):
+        start = time.perf_counter()
+        result = rr.simulate(t0, t1, points)
+        elapsed = time.perf_counter() - start
+    return elapsed, np.asarray(result, dtype=float)
+
+
+def _error(result: np.ndarray, reference: np.ndarray) -> float:
+    """
+    Largest deviation from the reference, per column relative to its range
+    """
+    if result.shape != reference.shape or not np.all(np.isfinite(result)):
+        return math.inf
+    scale = np.ptp(reference[:, 1:], axis=0)
+    scale[scale == 0] = 1.0
+    return float((np.abs(result[:, 1:] - reference[:, 1:]) / scale).max(initial=0.0))
+
+
+def tuning_context(values: Dict[str, float], t0: float, t1: float) -> str:
+    """
+    Identifies the parameter values and horizon a choice was tuned for
+    """
+    text = json.dumps([sorted(values.items()), t0, t1])
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def verify(rr, settings: Settings, t0: float, t1: float, points: int = 101,
+           accuracy: float = ACCURACY) -> bool:
+    """
+    Check that settings tuned elsewhere still match a tight reference run
+    here (two integrations instead of a full tune)
+    """
+    try:
+        _, reference = _run(rr, REFERENCE, t0, t1, points)
+        _, result = _run(rr, settings, t0, t1, points)
+        return _error(result, reference) <= accuracy
+    except Exception:
+        return False
+    finally:
+        rr.reset()
+
+
+def tune(rr, t0: float, t1: float, points: int = 101, accuracy: float = ACCURACY,
+         repeats: int = 2) -> Tuple[Settings, List[Dict[str, Any]]]:
+    """
+    Pick the fastest candidate integrator that matches a tight reference run
+
+    Args:
+        rr: Model instance, reset to the state the simulation starts from
+        t0, t1: Horizon of the probe integrations
+        points: Output points of the probes
+        accuracy: Allowed error per column, as a fraction of its range
+        repeats: Timed runs per candidate (the fastest counts)
+
+    Returns:
+        (chosen settings, one report per probe); the settings are empty,
+        meaning RoadRunner's default, if no candidate qualifies
+    """
+    try:
+        _, reference = _run(rr, REFERENCE, t0, t1, points)
+    except Exception:
+        rr.reset()
+        return {}, []
+
+    report = []
+    for settings in CANDIDATES:
+        try:
+            seconds, result = min((_run(rr, settings, t0, t1, points) for _ in range(repeats)),
+                                  key=lambda run: run[0])
+            error = _error(result, reference)
+        except Exception:
+            seconds, error = math.inf, math.inf
+        report.append({"settings": settings, "seconds": seconds, "error": error, "ok": error <= accuracy})
+    rr.reset()
+
+    passed = [r for r in report if r["ok"]]
+    if not passed:
+        return {}, report
+    return dict(min(passed, key=lambda r: r["seconds"])["settings"]), report
+
+
+BENCHMARK_MODELS = {
+    # Non-stiff linear chain: explicit methods should win
+    "chain": (
+        "S1 -> S2; k1*S1; S2 -> S3; k2*S2; S3 -> S4; k3*S3; "
+        "k1 = 0.3; k2 = 0.2; k3 = 0.1; S1 = 10; S2 = 0; S3 = 0; S4 = 0",
+        0, 100,
+    ),
+    # Robertson's stiff chemical kinetics: needs an implicit method
+    "robertson": (
+        "A -> B; 0.04*A; B + B -> C + B; 3e7*B*B; B + C -> A + C; 1e4*B*C; "
+        "A = 1; B = 0; C = 0",
+        0, 1000,
+    ),
+    # Oscillator with a long horizon
+    "oscillator": (
+        "-> X; k0; X -> Y; k1*X*Y^2; Y -> ; k2*Y; -> Y; k3; "
+        "k0 = 0.5; k1 = 1; k2 = 1; k3 = 0.2; X = 1; Y = 1",
+        0, 500,
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the default integrator with the auto-tuned choice")
+    parser.add_argument("--models", nargs="+", default=list(BENCHMARK_MODELS), choices=list(BENCHMARK_MODELS))
+    parser.add_argument("--points", type=int, default=201)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--accuracy", type=float, default=ACCURACY)
+    args = parser.parse_args()
+
+    import tellurium as te
+
+    print(f"{'model':<11} {'default ms':>10} {'tuned ms':>9} {'speedup':>8} {'error':>9} {'tune s':>7}  choice")
+    for name in args.models:
+        antimony, t0, t1 = BENCHMARK_MODELS[name]
+        rr = te.loada(antimony)
+        start = time.perf_counter()
+        choice, _ = tune(rr, t0, t1, args.points, args.accuracy)
+        tune_s = time.perf_counter() - start
+
+        _, reference = _run(rr, REFERENCE, t0, t1, args.points)
+        default_ms = 1000 * min(_run(rr, {}, t0, t1, args.points)[0] for _ in range(args.repeats))
+        runs = [_run(rr, choice, t0, t1, args.points) for _ in range(args.repeats)]
+        tuned_ms = 1000 * min(seconds for seconds, _ in runs)
+        error = _error(runs[0][1], reference)
+        print(f"{name:<11} {default_ms:>10.3f} {tuned_ms:>9.3f} {default_ms / tuned_ms:>7.2f}x "
+              f"{error:>9.2e} {tune_s:>7.3f}  {choice or 'default'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Cancellable long-running requests that report progress.
+
+A handler that accepts a ``Job`` calls ``job.report(fraction, message)``
+as it advances and ``job.check()`` at safe points; ``check`` raises
+``Cancelled`` once someone called ``cancel_job`` with the job's id (or
+the client streaming its events went away). ``stream_events`` runs a
+handler on its own thread and turns it into a sequence of events, which
+the endpoint sends as newline-delimited JSON. A client may choose the id
+itself (``valid_job_id``), so it can cancel a job whose events it never
+saw.
+"""
+import queue
+import re
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+CANCELLED = 499  # status of a cancelled request ("client closed request")
+
+ProgressCallback = Callable[[float, str], None]
+
+
+class Cancelled(Exception):
+    """
+    The job was cancelled by its client
+    """
+
+
+class Job:
+    """
+    Progress sink and cancellation flag of one request
+    """
+
+    def __init__(self, on_progress: Optional[ProgressCallback] = None, job_id: Optional[str] = None):
+        """
+        Initialize the job
+
+        Args:
+            on_progress: Called with (fraction done, message) on each report
+            job_id: Id chosen by the client (see valid_job_id); random by default
+        """
+        self.id = job_id or uuid.uuid4().hex
+        self.cancelled = threading.Event()
+        self._on_progress = on_progress
+
+    def report(self, progress: float, message: str = ""):
+        if self._on_progress is not None:
+            self._on_progress(min(1.0, max(0.0, progress)), message)
+
+    def check(self):
+        """
+        Raise Cancelled if the job was cancelled
+        """
+        if self.cancelled.is_set():
+            raise Cancelled(f"job {self.id} was cancelled")
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def valid_job_id(job_id: Any) -> Optional[str]:
+    """
+    The job id a client asked for if it is well formed (32 lowercase hex
+    digits, e.g. uuid4().hex), else None
+    """
+    return job_id if isinstance(job_id, str) and _JOB_ID.fullmatch(job_id) else None
+
+
+_jobs: Dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+
+
+def register(job: Job) -> Job:
+    with _jobs_lock:
+        _jobs[job.id] = job
+    return job
+
+
+def unregister(job: Job):
+    with _jobs_lock:
+        _jobs.pop(job.id, None)
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Cancel a running job
+
+    Returns:
+        True if the job was running
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return False
+    job.cancel()
+    return True
+
+
+def running_jobs() -> int:
+    with _jobs_lock:
+        return len(_jobs)
+
+
+class EventStream:
+    """
+    Events of a job running on its own thread
+    """
+
+    def __init__(self, job: Job, events: "queue.Queue[Dict[str, Any]]"):
+        self.job = job
+        self._events = events
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        yield {"type": "job", "job_id": self.job.id}
+        while True:
+            event = self._events.get()
+            yield event
+            if event["type"] == "result":
+                return
+
+    def close(self):
+        """
+        Stop listening; cancels the job if it is still running
+        """
+        self.job.cancel()
+
+
+def stream_events(handler: Callable[..., Tuple[Dict[str, Any], int]],
+                  payload: Optional[dict],
+                  on_finish: Optional[Callable[[], None]] = None,
+                  job_id: Optional[str] = None) -> EventStream:
+    """
+    Start handler(payload, job) on a thread and return its events
+
+    Iterating yields {"type": "job", "job_id": ...} first, then
+    {"type": "progress", "progress": 0..1, "message": ...} as the handler
+    reports, and last {"type": "result", "status": code, "body": body}.
+
+    Closing the stream early (the client disconnected) cancels the job,
+    which stops at the handler's next check. on_finish is called on the
+    job's thread once the handler has returned, however the stream ended.
+    job_id is the client's id for the job, if it chose one.
+    """
+    events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    job = register(Job(lambda progress, message: events.put(
+        {"type": "progress", "progress": progress, "message": message}), valid_job_id(job_id)))
+
+    def run():
+        try:
+            body, code = handler(payload, job)
+        except Cancelled:
+            body, code = {"error": "Cancelled"}, CANCELLED
+        except Exception as exc:
+            body, code = {"error": str(exc)}, 500
+        finally:
+            unregister(job)
+            if on_finish is not None:
+                on_finish()
+        events.put({"type": "result", "status": code, "body": body})
+
+    threading.Thread(target=run, name=f"job-{job.id[:8]}", daemon=True).start()
+    return EventStream(job, events)
@@ -1,6 +1,24 @@
-from typing import Any, Dict, List, Optional, Union
+import argparse
+import asyncio
+import json as jsonlib
+import os
+import random
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
 import httpx
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+# Allow running as a script (python llm_service/servers/mcp_server.py)
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from llm_service.servers import simulation
+from llm_service.servers.integrators import FIXED_STEP, INTEGRATORS
+from llm_service.servers.jobs import Job, cancel_job, register, unregister, valid_job_id
+from llm_service.utils.artifact_store import ArtifactStore, HANDLE_PREFIX, to_tsv
 
 # ----------------------------------------------------------------------
 #  FastMCP server initialisation
@@ -14,6 +32,290 @@ mcp = FastMCP("tellurium_server")
 
 LOCAL_API_BASE = "http://127.0.0.1:5000"  # adjust port/host if needed
 DEFAULT_TIMEOUT = 10.0  # seconds
+FIT_TIMEOUT = 600.0  # parameter estimation runs much longer than a simulation
+BUSY_RETRIES = 3  # attempts after a 429 before giving up
+BUSY_MAX_DELAY = 8.0  # seconds, cap for one backoff
+
+# Receives (fraction done, message) while a long request runs
+ProgressReporter = Callable[[float, str], Awaitable[None]]
+
+
+class ServerBusy(Exception):
+    """
+    The simulation endpoint kept rejecting the request with 429
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"server busy, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def busy_message(exc: ServerBusy, what: str) -> str:
+    """
+    Tell the model plainly that the server is overloaded (not that the input was wrong)
+    """
+    return (f"⏳ The {what} server is overloaded and did not accept the request after "
+            f"{BUSY_RETRIES} retries. Nothing is wrong with the input. Tell the user to try "
+            f"again in about {exc.retry_after:.0f} seconds; do not retry immediately.")
+
+
+def session_id_of(ctx: Context | None) -> str | None:
+    """
+    Chat session id the client attached to the tool call's _meta, if any
+    """
+    try:
+        meta = ctx.request_context.meta if ctx is not None else None
+    except (AttributeError, ValueError):
+        return None
+    return getattr(meta, "session_id", None) if meta is not None else None
+
+
+def job_id_of(ctx: Context | None) -> str | None:
+    """
+    Id the client chose for a streamed tool call's job (see jobs.valid_job_id),
+    which it cancels through DELETE /jobs/<id>
+    """
+    try:
+        meta = ctx.request_context.meta if ctx is not None else None
+    except (AttributeError, ValueError):
+        return None
+    return valid_job_id(getattr(meta, "job_id", None)) if meta is not None else None
+
+
+def progress_reporter(ctx: Context | None) -> ProgressReporter | None:
+    """
+    Forward a request's progress to the client as MCP progress notifications
+
+    Returns None unless the client asked for progress with a progress
+    token, so such calls take the plain (unstreamed) path.
+    """
+    try:
+        meta = ctx.request_context.meta if ctx is not None else None
+    except (AttributeError, ValueError):
+        return None
+    if meta is None or getattr(meta, "progressToken", None) is None:
+        return None
+
+    async def report(progress: float, message: str):
+        try:
+            await ctx.report_progress(progress, total=1.0, message=message)
+        except Exception:
+            pass  # progress is best effort; never fail the tool over it
+
+    return report
+
+
+# One pooled HTTP client per server process, shared by every MCP session
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide pooled HTTP client, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+    return _http_client
+
+
+# ----------------------------------------------------------------------
+#  Simulation backends
+# ----------------------------------------------------------------------
+#
+#  "http"      – forward to the Flask endpoint (remote deployments)
+#  "inprocess" – call simulation.py directly on a dedicated thread
+#  "pool"      – call simulation.py in a pool of local worker processes
+#
+#  All three return the same parsed body the Flask endpoint would send,
+#  or None on a non-2xx status.
+
+BACKENDS = ("http", "inprocess", "pool")
+SIMULATION_BACKEND = os.getenv("SIMULATION_BACKEND", "http")
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+
+_executor: Executor | None = None
+
+# Simulation results live here; tools return handles instead of raw tables
+artifacts = ArtifactStore()
+
+
+def configure_backend(name: str, workers: int = SIMULATION_WORKERS) -> None:
+    """
+    Select the simulation backend. Call once at startup.
+
+    Args:
+        name:    One of BACKENDS
+        workers: Number of worker processes for the "pool" backend
+    """
+    global SIMULATION_BACKEND, _executor
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown simulation backend '{name}', expected one of {BACKENDS}")
+
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+    if name == "inprocess":
+        # libantimony keeps global parser state, so loads are serialised
+        # on one thread; the event loop stays free while it works.
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tellurium")
+        _executor.submit(simulation.warm_up)
+    elif name == "pool":
+        # Each worker rehydrates popular models from the shared disk cache
+        _executor = ProcessPoolExecutor(max_workers=max(1, workers), initializer=simulation.warm_up)
+
+    SIMULATION_BACKEND = name
+
+
+# Routes that can report progress, and the handlers behind them
+STREAMED_ROUTES = {"/simulate": simulation.simulate, "/fit": simulation.fit}
+
+# Fire-and-forget cancellations, kept referenced until they finish
+_cancellations: set[asyncio.Task] = set()
+
+
+def _busy_delay(resp: httpx.Response, attempt: int) -> float:
+    """
+    Seconds to back off after a 429
+
+    Raises:
+        ServerBusy: This was the last attempt
+    """
+    try:
+        retry_after = float(resp.headers.get("Retry-After", "1"))
+    except ValueError:
+        retry_after = 1.0
+    if attempt == BUSY_RETRIES:
+        raise ServerBusy(retry_after)
+    # Jittered backoff around the server's hint, so rejected callers
+    # don't all come back at the same instant
+    delay = min(BUSY_MAX_DELAY, retry_after * 2 ** attempt)
+    return random.uniform(0.5 * delay, delay)
+
+
+async def _call_http(method: str, path: str, json: dict[str, Any] | None,
+                     timeout: float, session_id: str | None) -> dict[str, Any] | None:
+    url = f"{LOCAL_API_BASE}{path}"
+    headers = {"X-Session-Id": session_id} if session_id else None
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            resp = await get_http_client().request(method, url, json=json, headers=headers, timeout=timeout)
+        except Exception:
+            return None
+        if resp.status_code != 429:
+            try:
+                resp.raise_for_status()
+                return resp.json()
+            except Exception:
+                return None
+        await asyncio.sleep(_busy_delay(resp, attempt))
+
+
+async def _cancel_http_job(job_id: str):
+    try:
+        await get_http_client().delete(f"{LOCAL_API_BASE}/jobs/{job_id}", timeout=DEFAULT_TIMEOUT)
+    except Exception:
+        pass
+
+
+async def _stream_http(path: str, json: dict[str, Any] | None, timeout: float, session_id: str | None,
+                       progress: ProgressReporter, job_id: str | None = None) -> dict[str, Any] | None:
+    """
+    POST to the streaming variant of a route, forwarding its progress events
+
+    If the tool call is cancelled (or the stream fails), the endpoint's job
+    is cancelled too so it stops integrating and frees its slot.
+    """
+    url = f"{LOCAL_API_BASE}{path}/stream"
+    headers = {"X-Session-Id": session_id} if session_id else {}
+    if job_id:
+        headers["X-Job-Id"] = job_id
+    job_id, finished = None, False
+    try:
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                async with get_http_client().stream("POST", url, json=json, headers=headers,
+                                                    timeout=timeout) as resp:
+                    if resp.status_code == 429:
+                        delay = _busy_delay(resp, attempt)
+                    elif resp.status_code >= 300:
+                        return None
+                    else:
+                        async for line in resp.aiter_lines():
+                            if not line:
+                                continue
+                            event = jsonlib.loads(line)
+                            if event["type"] == "job":
+                                job_id = event["job_id"]
+                            elif event["type"] == "progress":
+                                await progress(event["progress"], event.get("message", ""))
+                            elif event["type"] == "result":
+                                finished = True
+                                return event["body"] if 200 <= event["status"] < 300 else None
+                        return None
+            except (ServerBusy, asyncio.CancelledError):
+                raise
+            except Exception:
+                return None
+            await asyncio.sleep(delay)
+    finally:
+        if job_id is not None and not finished:
+            # A separate task, so it still runs while this one is being cancelled
+            task = asyncio.get_running_loop().create_task(_cancel_http_job(job_id))
+            _cancellations.add(task)
+            task.add_done_callback(_cancellations.discard)
+
+
+async def _call_local(method: str, path: str, json: dict[str, Any] | None) -> dict[str, Any] | None:
+    if _executor is None:
+        configure_backend(SIMULATION_BACKEND)
+    loop = asyncio.get_running_loop()
+    try:
+        body, code = await loop.run_in_executor(_executor, simulation.handle_request, method, path, json)
+    except Exception:
+        return None
+    return body if 200 <= code < 300 else None
+
+
+async def _stream_local(path: str, json: dict[str, Any] | None,
+                        progress: ProgressReporter, job_id: str | None = None) -> dict[str, Any] | None:
+    """
+    Run a route's handler on the in-process executor with a Job whose
+    progress is forwarded from the worker thread
+
+    Worker processes of the "pool" backend can't share a Job, so there the
+    request runs without progress.
+    """
+    if _executor is None:
+        configure_backend(SIMULATION_BACKEND)
+    if SIMULATION_BACKEND != "inprocess":
+        return await _call_local("POST", path, json)
+
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+    job = register(Job(lambda fraction, message: loop.call_soon_threadsafe(updates.put_nowait, (fraction, message)),
+                       job_id))
+
+    async def forward():
+        while True:
+            await progress(*await updates.get())
+
+    forwarder = asyncio.create_task(forward())
+    try:
+        body, code = await loop.run_in_executor(_executor, STREAMED_ROUTES[path], json, job)
+    except asyncio.CancelledError:
+        job.cancel()  # the handler stops at its next progress point
+        raise
+    except Exception:
+        return None
+    finally:
+        forwarder.cancel()
+        unregister(job)
+    return body if 200 <= code < 300 else None
 
 
 async def call_local_api(
@@ -21,26 +323,56 @@ async def call_local_api(
         path: str,
         *,
         json: dict[str, Any] | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        session_id: str | None = None,
+        progress: ProgressReporter | None = None,
+        job_id: str | None = None,
 ) -> dict[str, Any] | None:
     """
-    Helper that performs an HTTP request against your local Flask server.
+    Helper that performs a request against the configured simulation backend.
 
     Args:
-        method:  "GET", "POST", etc.
-        path:    Endpoint path beginning with '/' (e.g. '/status')
-        json:    Optional JSON body for POST/PUT requests
+        method:     "GET", "POST", etc.
+        path:       Endpoint path beginning with '/' (e.g. '/status')
+        json:       Optional JSON body for POST/PUT requests
+        timeout:    Seconds to wait for the HTTP backend
+        session_id: Chat session the request is accounted to for fair share
+        progress:   Receives progress of long requests (/simulate, /fit),
+                    which are then run as cancellable streamed jobs
+        job_id:     Client-chosen id of that job, for DELETE /jobs/<id>
 
     Returns:
         Parsed JSON dict *or* None on any exception / non-2xx status.
+
+    Raises:
+        ServerBusy: The HTTP backend was still overloaded after retries
     """
-    url = f"{LOCAL_API_BASE}{path}"
-    async with httpx.AsyncClient() as client:
+    if progress is not None and method == "POST" and path in STREAMED_ROUTES:
+        if SIMULATION_BACKEND == "http":
+            return await _stream_http(path, json, timeout, session_id, progress, job_id)
+        return await _stream_local(path, json, progress, job_id)
+    if SIMULATION_BACKEND == "http":
+        return await _call_http(method, path, json, timeout, session_id)
+    return await _call_local(method, path, json)
+
+
+@mcp.custom_route("/jobs/{job_id}", methods=["DELETE"])
+async def cancel_job_route(request: Request) -> JSONResponse:
+    """
+    Cancel a streamed tool call by the job id the client sent in its _meta
+    (served next to the MCP endpoint when running over streamable HTTP)
+    """
+    job_id = request.path_params["job_id"]
+    cancelled = cancel_job(job_id)  # "inprocess" jobs run in this process
+    if not cancelled and SIMULATION_BACKEND == "http":
         try:
-            resp = await client.request(method, url, json=json, timeout=DEFAULT_TIMEOUT)
-            resp.raise_for_status()
-            return resp.json()
+            resp = await get_http_client().delete(f"{LOCAL_API_BASE}/jobs/{job_id}", timeout=DEFAULT_TIMEOUT)
+            cancelled = resp.status_code == 200
         except Exception:
-            return None
+            pass
+    if not cancelled:
+        return JSONResponse({"error": f"No running job {job_id}"}, status_code=404)
+    return JSONResponse({"cancelled": job_id})
 
 
 # ----------------------------------------------------------------------
@@ -147,13 +479,20 @@ async def tellurium_simulate(
         antimony: str,
         t_start: int,
         t_end: int,
-        n_steps: int
+        n_steps: int,
+        output: str = "adaptive",
+        integrator: Optional[str] = None,
+        relative_tolerance: Optional[float] = None,
+        absolute_tolerance: Optional[float] = None,
+        ctx: Context = None
 ) -> str:
     """
-    Run a Tellurium biochemical model simulation and return the time-series results.
+    Run a Tellurium biochemical model simulation and return a handle to the results.
 
     This tool takes an Antimony model string and simulation parameters, sends them
-    to the server for processing, and returns tabular simulation results.
+    to the server for processing, stores the time series in the artifact store and
+    returns a short summary with an `artifact://<id>` handle. Use
+    `tellurium_slice_artifact` with that handle to read actual values.
 
     Args:
         antimony: Antimony model string defining the biochemical system.
@@ -167,22 +506,34 @@ async def tellurium_simulate(
                Must be greater than t_start.
                Typical values range from 10 to 100 depending on model dynamics.
 
-        n_steps: Number of data points to compute (integer).
-                Must be a positive integer between 10 and 1000.
-                Higher values give smoother curves but take longer to compute.
+        n_steps: Number of data points (integer) between 10 and 1000.
+                With adaptive output this is the most rows returned; fewer
+                are returned when they already trace every curve closely.
+
+        output: "adaptive" (default) returns the integrator's own time points,
+                dense around fast changes and sparse on plateaus.
+                "uniform" returns n_steps evenly spaced time points.
+
+        integrator: Optional. "cvode" (stiff-capable, the default), "rk45",
+                    "rk4" or "euler", or "auto" to use the fastest
+                    integrator that stays accurate for this model (tuned
+                    once per model). Omit unless the simulation is slow or
+                    fails to converge. rk4 and euler have fixed steps, so
+                    they always give uniform output.
+
+        relative_tolerance, absolute_tolerance: Optional error tolerances
+                    for cvode, e.g. 1e-8 and 1e-12 for stiff models that stall.
 
     Returns:
-        A tab-separated values (TSV) string containing the simulation results.
-        The first row contains column headers (typically "time" followed by species names).
-        Subsequent rows contain the simulation data points.
+        A short multi-line summary: the artifact handle, table size, time span and
+        the initial, final, min and max value of each species.
 
         Example return value:
         ```
-        time	S1	S2
-        0.0	10.0	0.0
-        1.0	9.048	0.952
-        2.0	8.187	1.813
-        ...
+        Result stored as artifact://3f2a9c0e1b7d4a6c8e5f1a2b (200 rows × 3 columns).
+        Time span: t=0 to t=50
+        - S1: 10 → 0.06738 (min 0.06738, max 10)
+        - S2: 0 → 9.933 (min 0, max 9.933)
         ```
 
     If the simulation fails or the server is unreachable, returns an error message.
@@ -190,6 +541,7 @@ async def tellurium_simulate(
     Usage tips:
     - Ensure your Antimony model is syntactically correct
     - Use sufficient n_steps (>= 100) for complex dynamics
+    - Use output="uniform" only when evenly spaced time points are needed
     - Set t_end large enough to capture the behavior of interest
     - Check that all reactions and parameters are properly defined
     """
@@ -206,13 +558,34 @@ async def tellurium_simulate(
     if not isinstance(n_steps, int) or n_steps < 10 or n_steps > 1000:
         return "Error: 'n_steps' must be an integer between 10 and 1000."
 
+    if output not in ("adaptive", "uniform"):
+        return "Error: 'output' must be \"adaptive\" or \"uniform\"."
+
+    if integrator is not None and integrator not in ("auto", *INTEGRATORS):
+        return f"Error: 'integrator' must be \"auto\" or one of {', '.join(INTEGRATORS)}."
+    if integrator in FIXED_STEP:
+        output = "uniform"
+
     payload = {
         "antimony": antimony,
         "t_start": t_start,
         "t_end": t_end,
         "n_steps": n_steps,
+        "output": output,
     }
-    data = await call_local_api("POST", "/simulate", json=payload)
+    tolerances = {key: value for key, value in (("relative_tolerance", relative_tolerance),
+                                                ("absolute_tolerance", absolute_tolerance)) if value is not None}
+    if tolerances:
+        if integrator in (None, "auto"):
+            integrator = "cvode"
+        payload["integrator"] = {"name": integrator, **tolerances}
+    elif integrator is not None:
+        payload["integrator"] = integrator
+    try:
+        data = await call_local_api("POST", "/simulate", json=payload, session_id=session_id_of(ctx),
+                                    progress=progress_reporter(ctx), job_id=job_id_of(ctx))
+    except ServerBusy as exc:
+        return busy_message(exc, "simulation")
 
     if not data:
         return "❌ Simulation failed or endpoint unreachable. The server may be offline or not responding."
@@ -220,10 +593,151 @@ async def tellurium_simulate(
     if "columns" not in data:
         return "❌ Simulation failed to return expected data format. Server response: " + str(data)
 
-    # Convert to TSV for easy reading inside chat
-    header = "\t".join(data["columns"])
-    rows = ["\t".join(map(str, row)) for row in data["data"]]
-    return "\n".join([header] + rows)
+    # Keep the table out of the prompt: store it and hand back a summary
+    artifact_id = artifacts.put(data["columns"], data["data"], meta={"tool": "tellurium_simulate", **payload})
+    return artifacts.summarize(artifact_id)
+
+
+@mcp.tool()
+async def tellurium_slice_artifact(
+        artifact_id: str,
+        t_from: Optional[float] = None,
+        t_to: Optional[float] = None,
+        species: Optional[List[str]] = None,
+        max_rows: int = 50
+) -> str:
+    """
+    Read part of a stored simulation result as a table.
+
+    Args:
+        artifact_id: Handle returned by a simulation, with or without the
+                     "artifact://" prefix.
+        t_from: Start of the time window (inclusive). Omit for the beginning.
+        t_to: End of the time window (inclusive). Omit for the end.
+        species: Column names to include besides time, e.g. ["S1"]. Omit for all.
+        max_rows: Maximum number of rows to return (1-500); rows are evenly
+                  thinned when the window holds more.
+
+    Returns:
+        A tab-separated values (TSV) string with a header row.
+
+        Example return value:
+        ```
+        time	S1
+        10	3.679
+        20	1.353
+        ```
+
+    If the artifact does not exist or the selection is invalid, returns an error message.
+    """
+    artifact_id = artifact_id.strip().removeprefix(HANDLE_PREFIX)
+    if not isinstance(max_rows, int) or max_rows < 1 or max_rows > 500:
+        return "Error: 'max_rows' must be an integer between 1 and 500."
+
+    try:
+        if not artifacts.exists(artifact_id):
+            return f"Error: artifact '{artifact_id}' not found."
+        columns, data = artifacts.slice(artifact_id, t_from, t_to, species, max_rows)
+    except (KeyError, ValueError) as exc:
+        return f"Error: {exc}"
+
+    if len(data) == 0:
+        return "Error: the requested time window contains no data points."
+    return to_tsv(columns, data)
+
+
+@mcp.tool()
+async def tellurium_fit(
+        antimony: str,
+        parameters: Dict[str, List[float]],
+        data: Dict[str, List[float]],
+        max_iterations: int = 50,
+        ctx: Context = None
+) -> str:
+    """
+    Fit model parameters to observed time-course data.
+
+    Runs a bounded global optimisation (differential evolution) on the server,
+    evaluating candidate parameter sets in parallel on all CPU cores. Use this
+    instead of repeated `tellurium_simulate` calls whenever the user wants
+    parameters estimated from data.
+
+    Args:
+        antimony: Antimony model string. Parameters to fit must be defined in it
+                  (their values are used only as placeholders).
+                  Example: "S1 -> S2; k1*S1; k1=0.1; S1 = 10"
+
+        parameters: Free parameters with search bounds, as name -> [lower, upper].
+                    Example: {"k1": [0.001, 10], "k2": [0.01, 1]}
+
+        data: Observed data as column -> values. Must contain "time" (strictly
+              increasing) and one or more species columns of the same length.
+              Example: {"time": [0, 1, 2], "S1": [10, 9.1, 8.2]}
+
+        max_iterations: Maximum optimiser generations (1-500). Default 50.
+
+    Returns:
+        Best-fit parameter values, goodness of fit (SSE, RMSE), per-species
+        residual RMSE, the number of evaluations and the wall-clock time, plus an
+        `artifact://<id>` handle to the residual table.
+
+    If the fit fails or the server is unreachable, returns an error message.
+    """
+    if not antimony or not isinstance(antimony, str):
+        return "Error: 'antimony' parameter must be a non-empty string containing a valid Antimony model."
+
+    if not isinstance(parameters, dict) or not parameters:
+        return "Error: 'parameters' must map parameter names to [lower, upper] bounds."
+
+    if not isinstance(data, dict) or "time" not in data or len(data) < 2:
+        return "Error: 'data' must contain a 'time' column and at least one species column."
+
+    if not isinstance(max_iterations, int) or max_iterations < 1 or max_iterations > 500:
+        return "Error: 'max_iterations' must be an integer between 1 and 500."
+
+    payload = {
+        "antimony": antimony,
+        "parameters": parameters,
+        "data": data,
+        "max_iterations": max_iterations,
+    }
+    try:
+        result = await call_local_api("POST", "/fit", json=payload, timeout=FIT_TIMEOUT,
+                                      session_id=session_id_of(ctx), progress=progress_reporter(ctx),
+                                      job_id=job_id_of(ctx))
+    except ServerBusy as exc:
+        return busy_message(exc, "fitting")
+
+    if not result:
+        return "❌ Fit failed or endpoint unreachable. Check the model, bounds and data, or the server may be offline."
+
+    if "parameters" not in result:
+        return "❌ Fit failed: " + str(result.get("error", result))
+
+    residuals = result["residuals"]
+    species = [k for k in residuals if k != "time"]
+    rows = list(zip(residuals["time"], *[residuals[s] for s in species]))
+    artifact_id = artifacts.put(
+        ["time"] + [f"{s}_residual" for s in species],
+        [[float("nan") if v is None else v for v in row] for row in rows],
+        meta={"tool": "tellurium_fit", "parameters": result["parameters"]},
+    )
+
+    lines = ["Best-fit parameters:"]
+    lines += [f"- {name} = {value:.6g}" for name, value in result["parameters"].items()]
+    rmse = result.get("rmse")
+    lines.append(f"SSE = {result['sse']:.6g}" + (f", RMSE = {rmse:.6g}" if rmse is not None else ""))
+    for s in species:
+        values = [v for v in residuals[s] if v is not None]
+        if values:
+            lines.append(f"- {s} residual RMSE: {(sum(v * v for v in values) / len(values)) ** 0.5:.4g}")
+    lines.append(
+        f"{result['evaluations']} evaluations over {result['iterations']} generations on "
+        f"{result['workers']} workers in {result['elapsed']:.2f}s"
+        + (" (converged)" if result.get("converged") else " (iteration limit reached)")
+    )
+    lines.append(f"Residuals stored as {HANDLE_PREFIX}{artifact_id}")
+    return "\n".join(lines)
 
 
 # ----------------------------------------------------------------------
@@ -232,4 +746,26 @@ async def tellurium_simulate(
 
 if __name__ == "__main__":
     # Make sure your Flask app is running *before* starting FastMCP.
-    mcp.run(transport="stdio")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Tellurium MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "sse", "streamable-http"],
+        default="stdio",
+        help="'stdio' for a per-client child process, 'streamable-http' or 'sse' for one shared network server"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for network transports")
+    parser.add_argument("--port", type=int, default=8000, help="Port for network transports")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=SIMULATION_BACKEND,
+        help="'http' to call the Flask endpoint, 'inprocess' or 'pool' to run tellurium locally"
+    )
+    parser.add_argument("--workers", type=int, default=SIMULATION_WORKERS, help="Worker processes for --backend pool")
+    args = parser.parse_args()
+
+    configure_backend(args.backend, args.workers)
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
\ No newline at end of file
@@ -0,0 +1,457 @@
+"""
+Compiled-model cache for the simulation backends.
+
+Models are keyed by their structure rather than their full text: the
+Antimony is split into its structure (reactions, rate laws, rules,
+events, declarations) and its values (statements assigning a plain
+number to a parameter, species or compartment). Edits that only change
+values reuse the compiled model; the request's values are applied with
+``setValue`` after ``resetToOrigin``, so "what if k1 doubles?" costs one
+integration instead of a recompile. Structures whose values cannot be
+mapped onto the compiled model fall back to a key on the full text.
+
+The sidecar of a structure also records the integrators chosen for it by
+auto-tuning (see ``integrators``), per tuning context.
+
+Loaded instances are kept in memory (checked out while a simulation
+runs, so concurrent requests never share one), and the serialized
+RoadRunner state plus the converted SBML are kept on disk so a restarted
+endpoint or a new worker process can rehydrate a model without parsing
+Antimony or generating SBML again.
+"""
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from importlib import import_module
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MODEL_CACHE_DIR = os.getenv(
+    "TELLURIUM_MODEL_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tellurium_chatbot", "models"),
+)
+# File (models separated by lines of '---') or directory of *.ant files
+MODEL_CACHE_WARMUP = os.getenv("TELLURIUM_MODEL_WARMUP", "")
+
+# (selector, value) pairs applied to a compiled model, e.g. ("init([S1])", 10.0)
+Values = List[Tuple[str, float]]
+
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_VALUE = re.compile(
+    r"^(?:(const|var) )?([A-Za-z_]\w*) ?= ?([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)$"
+)
+
+
+def canonicalize(antimony: str) -> Tuple[str, Dict[str, float]]:
+    """
+    Split an Antimony model into its structure and its values
+
+    Statements of the form ``name = <number>`` (optionally ``const``/``var``)
+    become values; in the structure they are replaced by ``name = ?``.
+    Comments and whitespace are dropped. Models defining submodels, or
+    assigning a name twice, are returned whole with no values, since a
+    bare name may not identify one symbol.
+
+    Args:
+        antimony: Antimony model text
+
+    Returns:
+        (structure, {name: value})
+    """
+    text = _COMMENT.sub("", antimony)
+    statements = [" ".join(part.split()) for line in text.splitlines() for part in line.split(";")]
+    statements = [stmt for stmt in statements if stmt]
+    structure, values = [], {}
+    for stmt in statements:
+        match = _VALUE.match(stmt)
+        if match is None:
+            structure.append(stmt)
+            continue
+        prefix, name, number = match.groups()
+        if name in values:
+            return "\n".join(statements), {}
+        values[name] = float(number)
+        structure.append(f"{prefix + ' ' if prefix else ''}{name} = ?")
+    if sum(stmt.startswith("model ") for stmt in statements) > 1:
+        return "\n".join(statements), {}
+    return "\n".join(structure), values
+
+
+def bind_values(rr, values: Values):
+    """
+    Reset a compiled model to its original state, then apply a request's values
+
+    Initial values are set first and the model is reset, so initial
+    assignments depending on them are recomputed; the current values are
+    then set too, for selectors the reset leaves alone.
+    """
+    rr.resetToOrigin()
+    if not values:
+        return
+    for selector, value in values:
+        if selector.startswith("init("):
+            rr.setValue(selector, value)
+    rr.reset()
+    for selector, value in values:
+        rr.setValue(selector[5:-1] if selector.startswith("init(") else selector, value)
+
+
+class ModelCache:
+    """
+    Two-level (memory, disk) cache of compiled RoadRunner models
+    """
+
+    def __init__(self, cache_dir: str = MODEL_CACHE_DIR, max_in_memory: int = 32):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for persisted states (shared by all workers)
+            max_in_memory: Maximum number of distinct models kept loaded
+        """
+        self.cache_dir = cache_dir
+        self.max_in_memory = max_in_memory
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "compiles": 0, "value_edits": 0,
+                      "integrator_tunings": 0, "disk_errors": 0}
+        self._idle: "OrderedDict[str, List[Any]]" = OrderedDict()
+        # Per structure key: selectors and values of the compiled model, or
+        # None if its values cannot be rebound (then the full text is the key)
+        self._templates: Dict[str, Optional[Dict[str, Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._roadrunner = None
+        self._version = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _rr_module(self):
+        if self._roadrunner is None:
+            self._roadrunner = import_module("roadrunner")
+            self._version = getattr(self._roadrunner, "__version__", "unknown")
+        return self._roadrunner
+
+    def key(self, text: str, exact: bool = False) -> str:
+        """
+        Cache key: hash of the roadrunner version and a model structure
+        (or, with exact=True, the full Antimony text)
+        """
+        self._rr_module()
+        kind = "exact" if exact else "structure"
+        return hashlib.sha256(f"{self._version}\0{kind}\0{text}".encode()).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".rrstate", base + ".xml", base + ".json"
+
+    def _read_template(self, key: str):
+        """
+        Template of a structure key: known in memory, else from its disk sidecar
+
+        Returns:
+            The template, None if the structure is not rebindable, or
+            False if nothing is known
+        """
+        with self._lock:
+            if key in self._templates:
+                return self._templates[key]
+        try:
+            with open(self._paths(key)[2]) as f:
+                template = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._templates[key] = template
+        return template
+
+    def _write_template(self, key: str, template):
+        with self._lock:
+            self._templates[key] = template
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".json.tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(template, f)
+            os.replace(tmp, self._paths(key)[2])
+        except Exception:
+            self._count("disk_errors")
+
+    def _load_from_disk(self, key: str):
+        state_path, sbml_path, _ = self._paths(key)
+        rr_mod = self._rr_module()
+        try:
+            if os.path.exists(state_path):
+                rr = rr_mod.RoadRunner()
+                rr.loadState(state_path)
+                os.utime(state_path)  # recency for warm_up_from_disk
+                return rr
+            if os.path.exists(sbml_path):
+                with open(sbml_path) as f:
+                    return rr_mod.RoadRunner(f.read())
+        except Exception:
+            self._count("disk_errors")
+            for path in (state_path, sbml_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return None
+
+    def _save_to_disk(self, key: str, rr):
+        state_path, sbml_path, _ = self._paths(key)
+        try:
+            # Write to temporary files so other workers never read partial state
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".xml.tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(rr.getSBML())
+            os.replace(tmp, sbml_path)
+
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".rrstate.tmp")
+            os.close(fd)
+            rr.saveState(tmp)
+            os.replace(tmp, state_path)
+        except Exception:
+            self._count("disk_errors")
+
+    def _compile(self, antimony: str):
+        te = import_module("tellurium")
+        return te.loada(antimony)
+
+    @staticmethod
+    def _resolve(rr, values: Dict[str, float]) -> Optional[Dict[str, str]]:
+        """
+        Find the selector through which each value reaches the compiled model
+
+        A selector qualifies if it reads back the value the model was
+        compiled with (initial concentration, initial amount or value, in
+        that order). Returns None if some value cannot be located.
+        """
+        selectors = {}
+        for name, value in values.items():
+            for selector in (f"init([{name}])", f"init({name})", name):
+                try:
+                    current = rr.getValue(selector)
+                except Exception:
+                    continue
+                if math.isclose(current, value, rel_tol=1e-9, abs_tol=1e-12):
+                    selectors[name] = selector
+                    break
+            else:
+                return None
+        return selectors
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _lookup(self, key: str):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["memory_hits"] += 1
+                rr = idle.pop()
+                if idle:
+                    self._idle.move_to_end(key)
+                else:
+                    # Only models with an idle instance count toward max_in_memory
+                    del self._idle[key]
+                return rr
+        rr = self._load_from_disk(key)
+        if rr is not None:
+            self._count("disk_hits")
+        return rr
+
+    def _template_of(self, antimony: str):
+        """
+        (key, values, template) of a model; see _read_template for the template
+        """
+        structure, values = canonicalize(antimony)
+        key = self.key(structure)
+        template = self._read_template(key)
+        if template is None:
+            # Values of this structure can't be rebound: cache the exact text
+            key, values = self.key(antimony, exact=True), {}
+            template = self._read_template(key)
+        return key, values, template
+
+    def _acquire(self, antimony: str) -> Tuple[str, Any, Values]:
+        key, values, template = self._template_of(antimony)
+
+        rr = self._lookup(key) if template is not False else None
+        if rr is None:
+            rr = self._compile(antimony)
+            self._count("compiles")
+            selectors = self._resolve(rr, values)
+            if selectors is None:
+                self._write_template(key, None)
+                key, values, selectors = self.key(antimony, exact=True), {}, {}
+            template = {"selectors": selectors, "values": values}
+            self._write_template(key, template)
+            self._save_to_disk(key, rr)
+        elif values != template["values"]:
+            self._count("value_edits")
+
+        selectors = template["selectors"]
+        return key, rr, [(selectors[name], value) for name, value in values.items()]
+
+    def get_integrators(self, antimony: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Integrator settings tuned for a model's structure, by tuning context,
+        oldest first
+        """
+        _, _, template = self._template_of(antimony)
+        return dict(template.get("integrators", {})) if template else {}
+
+    def set_integrator(self, antimony: str, context: str, settings: Dict[str, Any],
+                       max_contexts: int = 32):
+        """
+        Remember the integrator settings chosen for a model's structure in
+        one tuning context (values and horizon)
+        """
+        key, _, template = self._template_of(antimony)
+        if not template:
+            return
+        choices = {c: s for c, s in template.get("integrators", {}).items() if c != context}
+        choices[context] = settings
+        while len(choices) > max_contexts:
+            choices.pop(next(iter(choices)))
+        self._write_template(key, {**template, "integrators": choices})
+        self._count("integrator_tunings")
+
+    def _release(self, key: str, rr):
+        with self._lock:
+            self._idle.setdefault(key, []).append(rr)
+            self._idle.move_to_end(key)
+            while len(self._idle) > self.max_in_memory:
+                self._idle.popitem(last=False)
+
+    def instance(self, antimony: str) -> Tuple[Any, Values]:
+        """
+        Get a model instance owned by the caller (never returned to the pool)
+
+        Used by long-lived workers that keep one compiled model for many runs;
+        call bind_values(rr, values) before each run to reset it to this
+        model's values.
+
+        Args:
+            antimony: Antimony model text
+
+        Returns:
+            (RoadRunner instance, values of this model)
+        """
+        _, rr, values = self._acquire(antimony)
+        bind_values(rr, values)
+        return rr, values
+
+    @contextmanager
+    def checkout(self, antimony: str) -> Iterator[Any]:
+        """
+        Borrow a freshly reset model instance for one simulation
+
+        Args:
+            antimony: Antimony model text
+
+        Yields:
+            RoadRunner instance, reset to the initial state of this model's values
+        """
+        key, rr, values = self._acquire(antimony)
+        ok = False
+        try:
+            bind_values(rr, values)
+            yield rr
+            ok = True
+        finally:
+            # Instances that raised may be in an odd state; let them go
+            if ok:
+                self._release(key, rr)
+
+    def warm_up(self, models: Iterable[str]) -> int:
+        """
+        Load (compiling if needed) a list of popular models
+
+        Args:
+            models: Antimony texts
+
+        Returns:
+            Number of models loaded
+        """
+        loaded = 0
+        for antimony in models:
+            try:
+                key, rr, _ = self._acquire(antimony)
+                self._release(key, rr)
+                loaded += 1
+            except Exception:
+                continue
+        return loaded
+
+    def warm_up_from_disk(self, limit: int = 8) -> int:
+        """
+        Load the most recently used persisted states into memory
+
+        Args:
+            limit: Maximum number of models to load
+
+        Returns:
+            Number of models loaded
+        """
+        states = sorted(
+            glob.glob(os.path.join(self.cache_dir, "*.rrstate")),
+            key=os.path.getmtime,
+            reverse=True,
+        )[:limit]
+        loaded = 0
+        for path in states:
+            key = os.path.basename(path)[: -len(".rrstate")]
+            if not self._read_template(key):
+                continue  # written before values were split off; recompiled on demand
+            rr = self._load_from_disk(key)
+            if rr is not None:
+                self._release(key, rr)
+                loaded += 1
+        return loaded
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "models_in_memory": len(self._idle),
+                    "structures": sum(1 for t in self._templates.values() if t)}
+
+
+def read_warmup_list(path: str = MODEL_CACHE_WARMUP) -> List[str]:
+    """
+    Read Antimony models from a warm-up file or directory
+
+    Args:
+        path: File with models separated by '---' lines, or a directory of *.ant files
+
+    Returns:
+        List of Antimony texts
+    """
+    if not path:
+        return []
+    if os.path.isdir(path):
+        models = []
+        for name in sorted(glob.glob(os.path.join(path, "*.ant"))):
+            with open(name) as f:
+                models.append(f.read())
+        return models
+    if os.path.isfile(path):
+        with open(path) as f:
+            chunks = f.read().split("\n---\n")
+        return [c.strip() for c in chunks if c.strip()]
+    return []
+
+
+_model_cache: Optional[ModelCache] = None
+_model_cache_lock = threading.Lock()
+
+
+def get_model_cache() -> ModelCache:
+    """
+    Process-wide model cache (one per endpoint process or pool worker)
+    """
+    global _model_cache
+    with _model_cache_lock:
+        if _model_cache is None:
+            _model_cache = ModelCache()
+        return _model_cache
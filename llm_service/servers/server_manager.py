@@ -1,5 +1,6 @@
 import os
 import sys
+import socket
 import subprocess
 import time
 import signal
@@ -7,22 +8,48 @@ import atexit
 import threading
 
 class ServerManager:
-    def __init__(self):
+    def __init__(self, mcp_host="127.0.0.1", mcp_port=8000, endpoint_port=5000, simulation_backend="http"):
         self._endpoint_script = "llm_service/servers/endpoint.py"
         self._mcp_script      = "llm_service/servers/mcp_server.py"
+        self.mcp_host      = mcp_host
+        self.mcp_port      = mcp_port
+        self.endpoint_port = endpoint_port
+        # "http" uses the Flask endpoint; "inprocess"/"pool" run tellurium inside the MCP server
+        self.simulation_backend = simulation_backend
         self.endpoint_proc = None
         self.mcp_proc      = None
 
-        # Register cleanup and signal handlers:
+        # Register cleanup and signal handlers. SIGINT keeps raising
+        # KeyboardInterrupt, so Ctrl+C can cancel a request; the servers are
+        # still stopped by atexit when it ends the program.
         if threading.current_thread() is threading.main_thread():
-            for sig in (signal.SIGINT, signal.SIGTERM):
-                signal.signal(sig, lambda s, f: self._cleanup_and_exit())
+            signal.signal(signal.SIGTERM, lambda s, f: self._cleanup_and_exit())
         atexit.register(self._cleanup)
 
+    @property
+    def mcp_url(self):
+        # FastMCP serves streamable HTTP under /mcp
+        return f"http://{self.mcp_host}:{self.mcp_port}/mcp"
+
     def ensure_running(self):
-        self._start_endpoint()
+        if self.simulation_backend == "http":
+            self._start_endpoint()
         self._start_mcp()
 
+    @staticmethod
+    def _wait_for_port(host, port, proc, timeout=15.0):
+        # Poll until the child accepts connections instead of sleeping blindly
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server process exited with code {proc.returncode}")
+            try:
+                with socket.create_connection((host, port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise TimeoutError(f"Server on {host}:{port} did not start within {timeout}s")
+
     def _start_endpoint(self):
         # Only start if not running:
         if not self.endpoint_proc or self.endpoint_proc.poll() is not None:
@@ -30,17 +57,19 @@ class ServerManager:
                 [sys.executable, self._endpoint_script],
                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
             )
-            time.sleep(1)
+            self._wait_for_port("127.0.0.1", self.endpoint_port, self.endpoint_proc)
 
     def _start_mcp(self):
+        # One long-lived tool server shared by every client over streamable HTTP
         if not self.mcp_proc or self.mcp_proc.poll() is not None:
-            # Assume 'mcp' exe is still in Python env dir:
-            mcp_exe = os.path.join(os.path.dirname(sys.executable), "mcp")
             self.mcp_proc = subprocess.Popen(
-                [mcp_exe, "dev", self._mcp_script],
+                [sys.executable, self._mcp_script,
+                 "--transport", "streamable-http",
+                 "--host", self.mcp_host, "--port", str(self.mcp_port),
+                 "--backend", self.simulation_backend],
                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
             )
-            time.sleep(1)
+            self._wait_for_port(self.mcp_host, self.mcp_port, self.mcp_proc)
 
     def _cleanup(self):
         for proc in (self.endpoint_proc, self.mcp_proc):
@@ -0,0 +1,299 @@
+"""
+Simulation logic shared by the Flask endpoint and the MCP server's
+in-process backends.
+
+Every handler takes the decoded JSON body (or None) and returns a
+``(body, status_code)`` tuple, so the HTTP and in-process paths share one
+validation and response contract. Long-running handlers also accept an
+optional ``Job`` to report progress to and to be cancelled through.
+"""
+from contextlib import contextmanager
+from importlib import import_module, metadata
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llm_service.servers.integrators import (AUTO, FIXED_STEP, parse_settings, tune, tuning_context,
+                                             use_integrator, verify)
+from llm_service.servers.jobs import CANCELLED, Cancelled, Job
+from llm_service.servers.model_cache import canonicalize, get_model_cache, read_warmup_list
+
+Response = Tuple[Dict[str, Any], int]
+
+PROGRESS_CHUNKS = 10  # a streamed simulation integrates in this many segments
+
+OUTPUT_MODES = ("uniform", "adaptive")
+DEFAULT_TOLERANCE = 0.01  # adaptive output: error allowed per column, as a fraction of its range
+
+
+def index(payload: Optional[dict] = None) -> Response:
+    return {"message": "Welcome to the API"}, 200
+
+
+def status(payload: Optional[dict] = None) -> Response:
+    return {"ok": True, "message": "API is alive"}, 200
+
+
+def echo(payload: Optional[dict] = None) -> Response:
+    data = payload or {}
+    return {"received": data, "length": len(data)}, 200
+
+
+def version(payload: Optional[dict] = None) -> Response:
+    try:
+        ver = metadata.version("tellurium")
+    except metadata.PackageNotFoundError:
+        ver = "not-installed"
+    return {"package": "tellurium", "version": ver}, 200
+
+
+@contextmanager
+def _variable_step(rr, enabled: bool):
+    """
+    Make rr.simulate return the integrator's own steps for the duration
+
+    The instance goes back to the model cache afterwards, so the previous
+    setting is restored.
+    """
+    if not enabled:
+        yield
+        return
+    integrator = rr.getIntegrator()
+    previous = integrator.getValue("variable_step_size")
+    integrator.setValue("variable_step_size", True)
+    try:
+        yield
+    finally:
+        integrator.setValue("variable_step_size", previous)
+
+
+def _segments(t0: float, t1: float, n_steps: Optional[int], chunks: int):
+    """
+    (start, end, points) of consecutive integration segments; points is
+    None for integrator steps
+    """
+    if n_steps is None:
+        edges = [t0 + (t1 - t0) * i / chunks for i in range(chunks + 1)]
+        return [(start, end, None) for start, end in zip(edges, edges[1:])]
+    # Consecutive slices of the same output grid as rr.simulate(t0, t1, n_steps)
+    chunks = max(1, min(chunks, n_steps - 1))
+    step = (t1 - t0) / (n_steps - 1) if n_steps > 1 else 0.0
+    bounds = [round(i * (n_steps - 1) / chunks) for i in range(chunks + 1)]
+    return [(t0 + first * step, t0 + last * step if last < n_steps - 1 else t1, last - first + 1)
+            for first, last in zip(bounds, bounds[1:])]
+
+
+def _simulate_chunked(rr, t0: float, t1: float, n_steps: Optional[int], job: Optional[Job]):
+    """
+    Integrate, in segments when there is a job to report progress to and to
+    check for cancellation between them
+
+    Each segment continues from the state the previous one ended in, so the
+    result equals a single rr.simulate over the whole horizon. With n_steps
+    None the rows are the integrator's steps.
+    """
+    columns, data = None, []
+    segments = _segments(t0, t1, n_steps, PROGRESS_CHUNKS if job is not None else 1)
+    for i, (start, end, points) in enumerate(segments):
+        if job is not None:
+            job.check()
+        result = rr.simulate(start, end, points) if points is not None else rr.simulate(start, end)
+        columns = list(result.colnames)
+        rows = result.tolist()  # numpy ndarray → list of lists
+        data.extend(rows[1:] if i else rows)  # segments share their boundary point
+        if job is not None:
+            job.report((i + 1) / len(segments), f"t = {end:g} of {t1:g}")
+    return columns, data
+
+
+def _auto_integrator(cache, rr, antimony: str, t0: float, t1: float, points: int, job: Optional[Job]):
+    """
+    Integrator settings tuned for this model, its values and its horizon
+
+    Settings tuned for other values or another horizon are reused if they
+    pass one accuracy check here; otherwise the model is tuned again.
+    """
+    context = tuning_context(canonicalize(antimony)[1], t0, t1)
+    choices = cache.get_integrators(antimony)
+    if context in choices:
+        return choices[context]
+    if job is not None:
+        job.report(0.0, "tuning the integrator")
+    latest = list(choices.values())[-1] if choices else None
+    if latest is not None and verify(rr, latest, t0, t1, points):
+        settings = latest
+    else:
+        settings, _ = tune(rr, t0, t1, points)
+    cache.set_integrator(antimony, context, settings)
+    return settings
+
+
+def simulate(payload: Optional[dict] = None, job: Optional[Job] = None) -> Response:
+    """
+    Body JSON:
+        {
+          "antimony": "<Antimony text>",
+          "t_start": 0,
+          "t_end":   100,
+          "n_steps": 200,
+          "output":    "uniform",   (optional, or "adaptive")
+          "tolerance": 0.01,        (optional, adaptive only)
+          "integrator": "auto"      (optional: a name, "auto", or
+                                     {"name": "cvode", "stiff": true, ...})
+        }
+    Returns:
+        {
+          "columns": [...],
+          "data":    [[row0], [row1], ...]
+        }
+
+    "uniform" output samples n_steps evenly spaced points. "adaptive"
+    output takes the integrator's variable steps and thins them to at most
+    n_steps rows that still follow every column to within tolerance (a
+    fraction of the column's range), so rows cluster where the dynamics
+    change; the response then also carries "integrator_steps".
+
+    "integrator" selects a RoadRunner integrator (cvode, rk45, rk4, euler)
+    and its settings for this run; rk4 and euler only support uniform
+    output. "auto" uses the integrator tuned for the model's structure,
+    values and horizon (see _auto_integrator). The settings used are
+    returned as "integrator".
+
+    With a job, the time horizon is integrated in PROGRESS_CHUNKS segments
+    and the fraction integrated is reported after each.
+    """
+    payload = payload or {}
+    antimony = payload.get("antimony")
+    try:
+        t0 = int(payload.get("t_start", 0))
+        t1 = int(payload.get("t_end", 100))
+        n_steps = int(payload.get("n_steps", 100))
+        tolerance = float(payload.get("tolerance", DEFAULT_TOLERANCE))
+    except (TypeError, ValueError) as exc:
+        return {"error": f"Invalid time settings: {exc}"}, 400
+    output = payload.get("output", "uniform")
+    if output not in OUTPUT_MODES:
+        return {"error": f"Unknown output mode {output!r}; choose from {OUTPUT_MODES}"}, 400
+    adaptive = output == "adaptive"
+    if adaptive and (n_steps < 2 or tolerance < 0):
+        return {"error": "Adaptive output needs n_steps >= 2 and a non-negative tolerance"}, 400
+    try:
+        integrator = parse_settings(payload.get("integrator"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    if adaptive and isinstance(integrator, dict) and integrator["name"] in FIXED_STEP:
+        return {"error": f"Integrator {integrator['name']!r} has fixed steps; use uniform output with it"}, 400
+
+    if not antimony:
+        return {"error": "Field 'antimony' is required."}, 400
+
+    # Import tellurium only when needed (avoids startup cost elsewhere)
+    try:
+        import_module("tellurium")
+    except ModuleNotFoundError:
+        return {"error": "Tellurium is not installed on the server"}, 500
+
+    try:
+        # Compiled models are reused from memory or rehydrated from disk
+        cache = get_model_cache()
+        with cache.checkout(antimony) as rr:
+            if integrator == AUTO:
+                integrator = _auto_integrator(cache, rr, antimony, t0, t1, max(2, n_steps), job)
+            with use_integrator(rr, integrator), _variable_step(rr, adaptive):
+                columns, data = _simulate_chunked(rr, t0, t1, None if adaptive else n_steps, job)
+
+        body = {"columns": columns, "data": data}
+        if adaptive:
+            from llm_service.servers.thinning import thin
+            body.update(data=thin(data, n_steps, tolerance), integrator_steps=len(data))
+        if integrator is not None:
+            body["integrator"] = integrator or "default"
+        return body, 200
+    except Cancelled:
+        return {"error": "Cancelled"}, CANCELLED
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    except Exception as exc:
+        return {"error": str(exc)}, 500
+
+
+def fit(payload: Optional[dict] = None, job: Optional[Job] = None) -> Response:
+    """
+    Body JSON:
+        {
+          "antimony":   "<Antimony text>",
+          "parameters": {"k1": [lower, upper], ...},
+          "data":       {"time": [...], "S1": [...], ...},
+          "max_iterations": 50,      (optional, at most 500)
+          "population":     16,      (optional, at most 200)
+          "workers":        null     (optional, all cores by default and at most)
+        }
+    Returns:
+        {
+          "parameters": {"k1": best, ...},
+          "sse": ..., "rmse": ...,
+          "residuals": {"time": [...], "S1": [...]},
+          "evaluations": ..., "iterations": ..., "converged": ...,
+          "workers": ..., "elapsed": ...
+        }
+
+    With a job, progress is reported after each optimizer generation.
+    """
+    try:
+        import_module("tellurium")
+    except ModuleNotFoundError:
+        return {"error": "Tellurium is not installed on the server"}, 500
+
+    from llm_service.servers.fitting import FitProblem, run_fit
+    try:
+        problem = FitProblem(payload or {})
+    except (TypeError, ValueError) as exc:
+        return {"error": str(exc)}, 400
+
+    try:
+        return run_fit(problem, job), 200
+    except Cancelled:
+        return {"error": "Cancelled"}, CANCELLED
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    except Exception as exc:
+        return {"error": str(exc)}, 500
+
+
+def cache_stats(payload: Optional[dict] = None) -> Response:
+    return get_model_cache().get_stats(), 200
+
+
+def warm_up() -> None:
+    """
+    Preload popular models: the configured warm-up list, then the most
+    recently used persisted states. Safe to call from any worker.
+    """
+    try:
+        import_module("tellurium")
+    except ModuleNotFoundError:
+        return
+    cache = get_model_cache()
+    cache.warm_up(read_warmup_list())
+    cache.warm_up_from_disk()
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[Optional[dict]], Response]] = {
+    ("GET", "/"): index,
+    ("GET", "/status"): status,
+    ("POST", "/echo"): echo,
+    ("GET", "/version"): version,
+    ("POST", "/simulate"): simulate,
+    ("POST", "/fit"): fit,
+    ("GET", "/cache"): cache_stats,
+}
+
+
+def handle_request(method: str, path: str, payload: Optional[dict] = None) -> Response:
+    """
+    Dispatch a request to its handler without going through HTTP.
+
+    Module-level so it can be submitted to a process pool.
+    """
+    handler = ROUTES.get((method.upper(), path))
+    if handler is None:
+        return {"error": f"No route for {method} {path}"}, 404
+    return handler(payload)
@@ -0,0 +1,66 @@
+"""
+Thinning of variable-step simulation output.
+
+The integrator's own steps are dense where the dynamics change fast and
+sparse on plateaus, but a stiff model can still take thousands of them.
+``thin`` keeps the subset of rows that reproduces every column to within
+a tolerance under linear interpolation, splitting at the worst-fitting
+row first (top-down Douglas-Peucker), until the tolerance is met or the
+row budget is spent. Rows therefore stay clustered around transients.
+"""
+import heapq
+from typing import List, Sequence
+
+import numpy as np
+
+
+def thin(rows: Sequence[Sequence[float]], max_points: int, tolerance: float) -> List[List[float]]:
+    """
+    Keep at most max_points rows that follow the trajectory within tolerance
+
+    Args:
+        rows: Simulation rows, time in the first column, in time order
+        max_points: Row budget (at least 2; the first and last rows are always kept)
+        tolerance: Allowed interpolation error, as a fraction of each
+                   column's range over the whole simulation
+
+    Returns:
+        The kept rows, in their original order
+    """
+    data = np.asarray(rows, dtype=float)
+    n = len(data)
+    if n <= 2:
+        return data.tolist()
+
+    t = data[:, 0]
+    values = data[:, 1:]
+    scale = np.ptp(values, axis=0)
+    scale[scale == 0] = 1.0
+    values = values / scale
+
+    def worst(a: int, b: int):
+        """
+        Largest interpolation error strictly between rows a and b, and its row
+        """
+        if b - a < 2 or not values.shape[1]:
+            return 0.0, a
+        span = t[b] - t[a]
+        frac = (t[a + 1:b] - t[a]) / span if span > 0 else np.zeros(b - a - 1)
+        line = values[a] + frac[:, None] * (values[b] - values[a])
+        error = np.abs(values[a + 1:b] - line).max(axis=1)
+        i = int(error.argmax())
+        return float(error[i]), a + 1 + i
+
+    keep = {0, n - 1}
+    error, row = worst(0, n - 1)
+    heap = [(-error, 0, n - 1, row)]
+    while heap and len(keep) < max(2, max_points):
+        error, a, b, row = heapq.heappop(heap)
+        if -error <= tolerance:
+            break
+        keep.add(row)
+        for start, end in ((a, row), (row, b)):
+            error, split = worst(start, end)
+            if error > 0:
+                heapq.heappush(heap, (-error, start, end, split))
+    return data[sorted(keep)].tolist()
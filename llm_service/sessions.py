@@ -0,0 +1,341 @@
+# sessions.py
+import asyncio
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from llm_service.clients import MCPClient
+from llm_service.clients.mcp_connection import ProgressHandler
+from llm_service.clients.memory_store import drop_namespace
+from llm_service.clients.response_cache import ResponseCache
+from llm_service.utils.logging_utils import setup_logging
+
+logger = setup_logging("llm_service.sessions")
+
+# Called in the sender's thread with (tool name, progress, total, message)
+ProgressCallback = Callable[[str, float, Optional[float], Optional[str]], None]
+
+
+class ChatSession:
+    """
+    One conversation: its own client (which holds the conversation state),
+    model choice and memory namespace
+    """
+
+    def __init__(
+            self,
+            session_id: str,
+            model_name: str,
+            server_script: str,
+            server_url: Optional[str] = None,
+            max_concurrent: int = 1,
+            response_cache: Optional[ResponseCache] = None,
+            small_model_name: Optional[str] = None,
+    ):
+        """
+        Initialize a chat session
+
+        Args:
+            session_id: Unique session identifier (also the memory namespace)
+            model_name: Model to use for this session
+            server_script: Path to MCP server script
+            server_url: Shared MCP server endpoint; a stdio server is spawned if omitted
+            max_concurrent: Maximum number of in-flight queries for this session
+            response_cache: Semantic response cache shared with other sessions
+            small_model_name: Fast model for simple queries (enables routing)
+        """
+        self.session_id = session_id
+        self.model_name = model_name
+        self.server_script = server_script
+        self.server_url = server_url
+        self.response_cache = response_cache
+        self.small_model_name = small_model_name
+        self.client: Optional[MCPClient] = None
+        self.last_active = time.monotonic()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._client_lock = asyncio.Lock()
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def _ensure_client(self) -> MCPClient:
+        """
+        Lazily create and connect the session's MCP client
+        """
+        async with self._client_lock:
+            if self.client is None:
+                client = MCPClient(
+                    server_script=self.server_script,
+                    model_name=self.model_name,
+                    namespace=self.session_id,
+                    server_url=self.server_url,
+                    response_cache=self.response_cache,
+                    small_model_name=self.small_model_name,
+                )
+                await client.start()
+                self.client = client
+            return self.client
+
+    async def ask(self, query: str, on_progress: Optional[ProgressHandler] = None) -> str:
+        """
+        Process a query within this session's concurrency limit
+
+        Args:
+            query: User query text
+            on_progress: Receives progress notifications of long-running tools
+
+        Returns:
+            Response text
+        """
+        self.last_active = time.monotonic()
+        task = asyncio.current_task()
+        self._in_flight.add(task)
+        try:
+            async with self._semaphore:
+                client = await self._ensure_client()
+                reply = await client.process_query(query, on_progress)
+        finally:
+            self._in_flight.discard(task)
+        self.last_active = time.monotonic()
+        return reply
+
+    async def set_model(self, model_name: str) -> str:
+        """
+        Change the model used by this session
+
+        Args:
+            model_name: New model name
+
+        Returns:
+            Status message
+        """
+        self.model_name = model_name
+        if self.client is None:
+            return f"Model changed to: {model_name}"
+        return await self.client.set_model(model_name)
+
+    def cancel(self) -> int:
+        """
+        Cancel the session's in-flight queries; tool calls they are waiting
+        on are cancelled on the server too. Call on the runtime loop.
+
+        Returns:
+            Number of queries cancelled
+        """
+        for task in self._in_flight:
+            task.cancel()
+        return len(self._in_flight)
+
+    async def close(self):
+        """
+        Disconnect the session's MCP client and forget its retrieval memory
+        """
+        async with self._client_lock:
+            if self.client is not None:
+                await self.client.stop()
+                self.client = None
+        # Takes the store's locks; keep the shared loop free
+        await asyncio.get_running_loop().run_in_executor(None, drop_namespace, self.session_id)
+
+
+class SessionManager:
+    """
+    Multiplexes many chat sessions onto one background asyncio runtime
+    """
+
+    def __init__(
+            self,
+            server_script: str,
+            server_url: Optional[str] = None,
+            default_model: str = "gpt-4o",
+            max_concurrent_per_session: int = 1,
+            max_concurrent_total: int = 16,
+            idle_timeout: float = 1800.0,
+            response_cache: Optional[ResponseCache] = None,
+            small_model_name: Optional[str] = None,
+    ):
+        """
+        Initialize the session manager and start its event loop thread
+
+        Args:
+            server_script: Path to MCP server script
+            server_url: Shared MCP server endpoint used by every session
+            default_model: Model used by sessions that don't choose one
+            max_concurrent_per_session: In-flight query limit per session
+            max_concurrent_total: In-flight query limit across all sessions
+            idle_timeout: Seconds after which an idle session is closed
+            response_cache: Opt-in semantic response cache shared by all sessions
+            small_model_name: Fast model that new sessions route simple queries to
+        """
+        self.server_script = server_script
+        self.server_url = server_url
+        self.default_model = default_model
+        self.max_concurrent_per_session = max_concurrent_per_session
+        self.idle_timeout = idle_timeout
+        self.response_cache = response_cache
+        self.small_model_name = small_model_name
+        self._sessions: Dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+        self._global_semaphore = asyncio.Semaphore(max_concurrent_total)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-service-runtime", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        """
+        Schedule a coroutine on the shared runtime
+
+        Args:
+            coro: Coroutine to run
+
+        Returns:
+            concurrent.futures.Future for the result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def get_session(self, session_id: Optional[str] = None, model_name: Optional[str] = None) -> ChatSession:
+        """
+        Return an existing session or create a new one
+
+        Args:
+            session_id: Session identifier; a new one is generated if omitted
+            model_name: Model for a newly created session
+
+        Returns:
+            The ChatSession
+        """
+        self._reap_idle()
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(
+                    session_id=session_id,
+                    model_name=model_name or self.default_model,
+                    server_script=self.server_script,
+                    server_url=self.server_url,
+                    max_concurrent=self.max_concurrent_per_session,
+                    response_cache=self.response_cache,
+                    small_model_name=self.small_model_name,
+                )
+                self._sessions[session_id] = session
+                logger.info(f"Created session {session_id} (model: {session.model_name})")
+            return session
+
+    def list_sessions(self) -> List[str]:
+        """
+        List the identifiers of all open sessions
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    async def _ask(self, session: ChatSession, query: str, on_progress: Optional[ProgressHandler] = None) -> str:
+        async with self._global_semaphore:
+            return await session.ask(query, on_progress)
+
+    def send(self, session_id: str, query: str, timeout: Optional[float] = None,
+             on_progress: Optional[ProgressCallback] = None) -> str:
+        """
+        Send a query to a session and block until the reply arrives
+
+        If the calling thread is interrupted while waiting (e.g. Ctrl+C),
+        the query is cancelled.
+
+        Args:
+            session_id: Session identifier
+            query: User query text
+            timeout: Optional timeout in seconds
+            on_progress: Called in this thread with progress of long-running tools
+
+        Returns:
+            Response text
+
+        Raises:
+            concurrent.futures.CancelledError: The query was cancelled
+        """
+        session = self.get_session(session_id)
+        updates: "queue.Queue" = queue.Queue()
+        forward = None
+        if on_progress is not None:
+            async def forward(tool: str, progress: float, total: Optional[float], message: Optional[str]):
+                updates.put((tool, progress, total, message))
+
+        future = self.submit(self._ask(session, query, forward))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except FutureTimeoutError:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise
+                while on_progress is not None and not updates.empty():
+                    on_progress(*updates.get_nowait())
+        except BaseException:
+            future.cancel()
+            raise
+
+    def cancel(self, session_id: str):
+        """
+        Cancel the in-flight queries of a session (from any thread)
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            self._loop.call_soon_threadsafe(session.cancel)
+
+    def set_model(self, session_id: str, model_name: str) -> str:
+        """
+        Change the model of one session
+
+        Args:
+            session_id: Session identifier
+            model_name: New model name
+
+        Returns:
+            Status message
+        """
+        session = self.get_session(session_id, model_name=model_name)
+        return self.submit(session.set_model(model_name)).result()
+
+    def close_session(self, session_id: str) -> Optional[Future]:
+        """
+        Close a session and release its connections
+
+        Returns:
+            Future that completes once the session is closed, or None if unknown
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return None
+        logger.info(f"Closing session {session_id}")
+        return self.submit(session.close())
+
+    def _reap_idle(self):
+        """
+        Close sessions that have been idle longer than idle_timeout
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if now - s.last_active > self.idle_timeout]
+        for session_id in idle:
+            self.close_session(session_id)
+
+    def shutdown(self):
+        """
+        Close every session and stop the runtime
+        """
+        pending = [self.close_session(sid) for sid in self.list_sessions()]
+        for future in pending:
+            try:
+                future.result(timeout=5)
+            except Exception as e:
+                logger.warning(f"Error closing session during shutdown: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
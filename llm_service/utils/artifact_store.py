@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ARTIFACT_DIR = os.getenv(
+    "TELLURIUM_ARTIFACT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tellurium_chatbot", "artifacts"),
+)
+HANDLE_PREFIX = "artifact://"
+_HANDLE = re.compile(r"artifact://([0-9a-f]{16,64})")
+
+
+def find_handles(text: str) -> List[str]:
+    """
+    Extract artifact IDs referenced in a piece of text
+
+    Args:
+        text: Chat or tool output
+
+    Returns:
+        Artifact IDs in order of first appearance
+    """
+    seen = []
+    for artifact_id in _HANDLE.findall(text or ""):
+        if artifact_id not in seen:
+            seen.append(artifact_id)
+    return seen
+
+
+def to_tsv(columns: Sequence[str], data: np.ndarray) -> str:
+    """
+    Render a table as tab-separated values with a header row
+    """
+    rows = ["\t".join(f"{v:.6g}" for v in row) for row in data]
+    return "\n".join(["\t".join(columns)] + rows)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of simulation results as memory-mapped .npy files
+
+    Results are kept out of prompts and chat text: tools hand out an
+    `artifact://<id>` handle and readers load (or slice) the array lazily.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR):
+        """
+        Initialize the store
+
+        Args:
+            root: Directory holding <id>.npy and <id>.json files
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, artifact_id: str) -> Tuple[str, str]:
+        if not re.fullmatch(r"[0-9a-f]{16,64}", artifact_id):
+            raise ValueError(f"Invalid artifact id: {artifact_id!r}")
+        base = os.path.join(self.root, artifact_id)
+        return base + ".npy", base + ".json"
+
+    def put(self, columns: Sequence[str], data: Any, meta: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store a result table
+
+        Args:
+            columns: Column names ("time" first)
+            data: Rows of numbers
+            meta: Extra metadata kept next to the array
+
+        Returns:
+            Artifact ID (content hash)
+        """
+        array = np.ascontiguousarray(np.asarray(data, dtype=np.float64))
+        digest = hashlib.sha256(json.dumps(list(columns)).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+        artifact_id = digest.hexdigest()[:24]
+
+        npy_path, meta_path = self._paths(artifact_id)
+        if os.path.exists(npy_path) and os.path.exists(meta_path):
+            return artifact_id
+
+        # Write to temporary files first so readers never see partial artifacts
+        fd, tmp_npy = tempfile.mkstemp(dir=self.root, suffix=".npy.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_npy, npy_path)
+
+        fd, tmp_meta = tempfile.mkstemp(dir=self.root, suffix=".json.tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"columns": list(columns), "shape": list(array.shape),
+                       "created": time.time(), **(meta or {})}, f)
+        os.replace(tmp_meta, meta_path)
+        return artifact_id
+
+    def exists(self, artifact_id: str) -> bool:
+        npy_path, meta_path = self._paths(artifact_id)
+        return os.path.exists(npy_path) and os.path.exists(meta_path)
+
+    def meta(self, artifact_id: str) -> Dict[str, Any]:
+        """
+        Metadata of an artifact (columns, shape, ...)
+        """
+        _, meta_path = self._paths(artifact_id)
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def load(self, artifact_id: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Open an artifact without reading it into memory
+
+        Returns:
+            (columns, read-only memory-mapped array)
+        """
+        npy_path, _ = self._paths(artifact_id)
+        return self.meta(artifact_id)["columns"], np.load(npy_path, mmap_mode="r")
+
+    def slice(
+            self,
+            artifact_id: str,
+            t_from: Optional[float] = None,
+            t_to: Optional[float] = None,
+            species: Optional[Sequence[str]] = None,
+            max_rows: Optional[int] = None,
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Select a time window and/or columns of an artifact
+
+        Args:
+            artifact_id: Artifact ID
+            t_from: Start of the time window (inclusive)
+            t_to: End of the time window (inclusive)
+            species: Columns to keep besides time
+            max_rows: Evenly thin the selection to at most this many rows
+
+        Returns:
+            (columns, array) of the selection
+        """
+        columns, data = self.load(artifact_id)
+        time_col = data[:, 0]
+        lo = 0 if t_from is None else int(np.searchsorted(time_col, t_from, side="left"))
+        hi = len(time_col) if t_to is None else int(np.searchsorted(time_col, t_to, side="right"))
+
+        col_idx = [0]
+        if species:
+            missing = [s for s in species if s not in columns]
+            if missing:
+                raise KeyError(f"Unknown columns {missing}; available: {columns[1:]}")
+            col_idx += [columns.index(s) for s in species if columns.index(s) != 0]
+        else:
+            col_idx = list(range(len(columns)))
+
+        rows = np.arange(lo, hi)
+        if max_rows and len(rows) > max_rows:
+            rows = rows[np.linspace(0, len(rows) - 1, max_rows).round().astype(int)]
+
+        return [columns[i] for i in col_idx], np.asarray(data[np.ix_(rows, col_idx)])
+
+    def summarize(self, artifact_id: str) -> str:
+        """
+        Short text summary suitable for a prompt
+
+        Returns:
+            Handle, size, time span and initial/final/min/max per column
+        """
+        columns, data = self.load(artifact_id)
+        lines = [
+            f"Result stored as {HANDLE_PREFIX}{artifact_id} "
+            f"({data.shape[0]} rows × {len(columns)} columns).",
+        ]
+        if data.shape[0]:
+            lines.append(f"Time span: t={data[0, 0]:g} to t={data[-1, 0]:g}")
+            for i, name in enumerate(columns[1:], start=1):
+                col = data[:, i]
+                lines.append(
+                    f"- {name}: {col[0]:.4g} → {col[-1]:.4g} (min {col.min():.4g}, max {col.max():.4g})"
+                )
+        return "\n".join(lines)
@@ -1,5 +1,196 @@
+"""
+Logging setup shared by the service's modules.
+
+By default records are handed to a queue and written to stdout by one
+background thread (``LOG_QUEUE=0`` writes synchronously instead), so a
+request thread or the event loop never blocks on log I/O. Messages are
+rendered on the calling thread, so they show the arguments' state at
+the call, but only for records that pass the level and sampling checks.
+``Truncated`` bounds how much of a large argument (a tool call's
+Antimony model, say) is rendered at all. INFO lines are sampled per message
+template (``LOG_SAMPLE_RATE`` per second); the next line that gets
+through reports how many were dropped. ``LOG_FORMAT=json`` writes one
+JSON object per line.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") != "0"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "5"))  # INFO lines/s per template; 0 = all
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "2000"))  # longest message written
+LOG_ARG_CHARS = 200  # default bound for Truncated arguments
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def _clip(value: Any, limit: int, depth: int = 0) -> str:
+    """
+    str() of a value in O(limit) work: long strings are cut, containers
+    show their first items, each cut in turn
+    """
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value if depth == 0 else repr(value)
+        head = value[:limit]
+        return (head if depth == 0 else repr(head)) + f"... (+{len(value) - limit} chars)"
+    if isinstance(value, dict) and depth < 2:
+        items = [f"{k!r}: {_clip(v, limit, depth + 1)}" for k, v in list(value.items())[:20]]
+        more = f", ... (+{len(value) - 20} items)" if len(value) > 20 else ""
+        return "{" + ", ".join(items) + more + "}"
+    if isinstance(value, (list, tuple)) and depth < 2:
+        items = [_clip(v, limit, depth + 1) for v in value[:20]]
+        more = f", ... (+{len(value) - 20} items)" if len(value) > 20 else ""
+        return "[" + ", ".join(items) + more + "]"
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + f"... (+{len(text) - limit} chars)"
+
+
+class Truncated:
+    """
+    Log argument rendered lazily and cut to a bounded size, e.g.
+    ``logger.info("Calling tool %s with args: %s", name, Truncated(args))``
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = LOG_ARG_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return _clip(self.value, self.limit)
+
+    __repr__ = __str__
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let at most `rate` INFO (and DEBUG) records per second through for each
+    message template (with bursts of up to max(1, rate)); warnings and
+    errors always pass
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        # (logger, template) -> (tokens, last refill, suppressed since last pass)
+        self._buckets: Dict[Tuple[str, Any], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) > 4096:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """
+    The classic one-line format, with long messages cut
+    """
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = _clip(record.message, LOG_MAX_CHARS)
+        if getattr(record, "suppressed", 0):
+            record.message += f" [+{record.suppressed} similar suppressed]"
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _clip(record.getMessage(), LOG_MAX_CHARS),
+            "thread": record.threadName,
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = _clip(record.exc_text, LOG_MAX_CHARS)
+        return json.dumps(entry, default=str)
+
+
+_FORMATTER = logging.Formatter()
+
+
+class _RenderingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Render the message on the calling thread and leave only formatting and
+    I/O to the writer thread
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated once the call returns; render them now
+        # (Truncated keeps that O(limit)) and drop the references
+        record = copy.copy(record)
+        record.msg = _clip(record.getMessage(), LOG_MAX_CHARS)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler: Optional[logging.Handler] = None
+_handler_lock = threading.Lock()
+
+
+def _shared_handler() -> logging.Handler:
+    """
+    Handler every service logger writes through (created on first use)
+    """
+    global _handler
+    with _handler_lock:
+        if _handler is not None:
+            return _handler
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
+        if LOG_QUEUE:
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)  # flush what is still queued
+            handler = _RenderingQueueHandler(records)
+        else:
+            handler = stream
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+        _handler = handler
+        return handler
 
 
 def setup_logging(name="llm_service", level=logging.INFO):
@@ -17,16 +208,6 @@ def setup_logging(name="llm_service", level=logging.INFO):
 
     if not logger.handlers:
         logger.setLevel(level)
+        logger.addHandler(_shared_handler())
 
-        # Create console handler
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(level)
-
-        # Create formatter
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-
-        # Add handler to logger
-        logger.addHandler(handler)
-
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,36 @@
+CHARS_PER_TOKEN = 4  # rough average for English text and BPE tokenizers
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token-count estimate used for prompt budgeting
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate number of tokens
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """
+    Trim text to roughly max_tokens tokens
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+        keep: "head" keeps the beginning, "tail" keeps the end
+
+    Returns:
+        Trimmed text, marked with an ellipsis when shortened
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if keep == "tail":
+        return "…" + text[-max_chars:]
+    return text[:max_chars] + "…"
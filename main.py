@@ -20,21 +20,44 @@ def main():
         default="llama3.2",
         help="Name of the LLM model to use (e.g. llama3.2, gpt-4o, etc.)"
     )
+    parser.add_argument(
+        "--small-model",
+        type=str,
+        default=None,
+        help="Optional fast model for simple requests (e.g. llama3.2:1b); complex ones use --model"
+    )
+    parser.add_argument(
+        "--simulation-backend", "-s",
+        choices=["http", "inprocess", "pool"],
+        default="http",
+        help="Where simulations run: 'http' via the Flask endpoint, 'inprocess' or 'pool' inside the MCP server"
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Answer near-duplicate questions from a semantic cache without calling the LLM"
+    )
     args = parser.parse_args()
 
     # Set the model once for all messages
     from llm_service import llm_service
     llm_service.set_model_name(args.model)
+    llm_service.set_small_model_name(args.small_model)
+    llm_service.set_simulation_backend(args.simulation_backend)
+    if args.response_cache:
+        llm_service.enable_response_cache()
 
     script_path = os.path.abspath(__file__)
 
     # If user requested the UI but we're not yet running under Streamlit, re-launch
     if args.interface == "ui" and not os.environ.get("STREAMLIT_RUN"):
         os.environ["STREAMLIT_RUN"] = "1"
-        subprocess.run([
-            "streamlit", "run", script_path,
-            "--", "-i", "ui", "-m", args.model
-        ])
+        ui_args = ["-i", "ui", "-m", args.model, "-s", args.simulation_backend]
+        if args.small_model:
+            ui_args += ["--small-model", args.small_model]
+        if args.response_cache:
+            ui_args.append("--response-cache")
+        subprocess.run(["streamlit", "run", script_path, "--"] + ui_args)
         sys.exit()
 
     # Dispatch to UI or CLI
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Keep persisted models out of the user's cache; set before any server
+# module reads it (worker processes inherit it)
+os.environ.setdefault("TELLURIUM_MODEL_CACHE_DIR", tempfile.mkdtemp(prefix="tellurium-test-models-"))
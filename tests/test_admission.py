@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from llm_service.servers import endpoint
+from llm_service.servers.admission import AdmissionController, Rejected
+
+
+class Request(threading.Thread):
+    """
+    One request waiting for a slot; it holds the slot until `done` is set
+    and records the order slots were granted in
+    """
+
+    def __init__(self, controller, session_id, granted, done):
+        super().__init__(daemon=True)
+        self.controller, self.session_id = controller, session_id
+        self.granted, self.done = granted, done
+        self.outcome = None
+
+    def run(self):
+        try:
+            session_id = self.controller.acquire(self.session_id)
+        except Rejected as exc:
+            self.outcome = exc.reason
+            return
+        self.outcome = "granted"
+        self.granted.append(self)
+        self.done.wait(5)
+        self.controller.release(session_id, 0.01)
+
+
+def _wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def _queue(controller, session_id, granted, done):
+    """
+    Start a request and return once it is queued
+    """
+    queued = controller.get_stats()["queued"]
+    request = Request(controller, session_id, granted, done)
+    request.start()
+    _wait_until(lambda: controller.get_stats()["queued"] == queued + 1)
+    return request
+
+
+@pytest.fixture
+def flooded():
+    """
+    A controller whose only slot and whole queue belong to session "a"
+    """
+    controller = AdmissionController("test", max_concurrent=1, max_queue=4, queue_timeout=5.0)
+    granted, done = [], threading.Event()
+    holder = controller.acquire("a")
+    flood = [_queue(controller, "a", granted, done) for _ in range(4)]
+    yield controller, holder, flood, granted, done
+    done.set()
+    for request in flood:
+        request.join(5)
+
+
+def _queue_after_shed(controller, flood, granted, done):
+    """
+    Queue a request from session "b" into the full queue; it takes the
+    newest slot of session "a"
+    """
+    other = Request(controller, "b", granted, done)
+    other.start()
+    flood[-1].join(5)
+    _wait_until(lambda: controller.get_stats()["queued"] == 4)
+    return other
+
+
+def test_flooding_session_cannot_lock_out_another(flooded):
+    controller, holder, flood, granted, done = flooded
+    with pytest.raises(Rejected, match="share"):
+        controller.acquire("a")
+    other = _queue_after_shed(controller, flood, granted, done)
+
+    done.set()
+    controller.release(holder, 0.01)
+    other.join(5)
+    assert other.outcome == "granted"
+    assert controller.get_stats()["rejected_share"] == 2  # the extra request and the shed one
+
+
+def test_full_queue_sheds_the_flooders_newest_waiter(flooded):
+    controller, holder, flood, granted, done = flooded
+    _queue_after_shed(controller, flood, granted, done)
+    assert flood[-1].outcome.endswith("queue slot given to another session")
+    assert all(r.outcome is None for r in flood[:-1])
+    assert controller.get_stats()["queued"] == 4
+    controller.release(holder, 0.01)
+
+
+def test_free_slot_goes_to_the_session_running_the_fewest():
+    controller = AdmissionController("test", max_concurrent=2, max_queue=4, queue_timeout=5.0)
+    granted, done = [], threading.Event()
+    first = controller.acquire("a")
+    controller.acquire("a")
+    older = _queue(controller, "a", granted, done)
+    newer = _queue(controller, "b", granted, done)
+
+    controller.release(first, 0.01)
+    _wait_until(lambda: granted)
+    assert granted == [newer]  # "b" runs nothing, "a" still runs one
+    assert older.outcome is None
+
+    done.set()
+    controller.release("a", 0.01)
+    older.join(5)
+    newer.join(5)
+    assert granted == [newer, older]
+
+
+def test_waiter_times_out():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=2, queue_timeout=0.1)
+    holder = controller.acquire("a")
+    with pytest.raises(Rejected, match="timed out") as exc_info:
+        controller.acquire("b")
+    assert exc_info.value.retry_after >= 1
+    stats = controller.get_stats()
+    assert stats["rejected_timeout"] == 1 and stats["queued"] == 0
+    controller.release(holder, 0.01)
+    assert controller.acquire("b") == "b"
+
+
+def test_overload_is_a_429_with_retry_after():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=0)
+    controller._service_time = 2.5
+    app = Flask(__name__)
+    app.add_url_rule("/run", "run", lambda: endpoint.run_admitted(controller, lambda payload: ({"ok": True}, 200)),
+                     methods=["POST"])
+    client = app.test_client()
+
+    holder = controller.acquire("a")
+    resp = client.post("/run", json={}, headers={"X-Session-Id": "b"})
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "3"
+    assert resp.get_json()["retry_after"] == 3
+    assert controller.get_stats()["rejected_full"] == 1
+
+    controller.release(holder, 2.5)
+    assert client.post("/run", json={}).status_code == 200
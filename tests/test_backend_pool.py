@@ -0,0 +1,155 @@
+import asyncio
+import socket
+import time
+
+import httpx
+import pytest
+
+from llm_service.clients.backend_pool import BackendPool, start_stub_ollama
+
+
+class StubError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+async def chat(client: httpx.AsyncClient) -> str:
+    resp = await client.post("/api/chat", json={"model": "stub", "messages": []})
+    if resp.status_code >= 400:
+        raise StubError(resp.status_code)
+    return resp.json()["message"]["content"]
+
+
+async def tags(client: httpx.AsyncClient):
+    (await client.get("/api/tags")).raise_for_status()
+
+
+@pytest.fixture
+def stubs():
+    servers = []
+
+    def start(**kwargs):
+        server = start_stub_ollama(**kwargs)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def _pool(urls, **kwargs) -> BackendPool:
+    return BackendPool("test", urls, lambda url: httpx.AsyncClient(base_url=url, timeout=5.0), **kwargs)
+
+
+def test_load_is_spread_over_the_backends(stubs):
+    pool = _pool([stubs(delay=0.05), stubs(delay=0.05)])
+
+    async def run():
+        return await asyncio.gather(*(pool.call(chat) for _ in range(8)))
+
+    replies = asyncio.run(run())
+    assert len(set(replies)) == 2
+    assert [b.stats["requests"] for b in pool.backends] == [4, 4]
+
+
+def test_failures_fail_over_and_open_the_breaker(stubs):
+    broken, healthy = stubs(delay=0.0, failure_rate=1.0), stubs(delay=0.0)
+    pool = _pool([broken, healthy], failure_threshold=2, cooldown=60.0)
+    pool.backends[1].latencies.append(1.0)  # prefer the broken one while it looks healthy
+
+    async def run():
+        return [await pool.call(chat) for _ in range(5)]
+
+    assert set(asyncio.run(run())) == {f"reply from stub :{healthy.rsplit(':', 1)[1]}"}
+    assert pool.backends[0].state == "open"
+    assert pool.backends[0].stats["requests"] == 2  # skipped once open
+    assert pool.stats["failovers"] == 2 and pool.stats["failed"] == 0
+
+
+def test_unreachable_backend_counts_as_transient(stubs):
+    pool = _pool([_closed_port_url(), stubs(delay=0.0)], failure_threshold=1)
+    pool.backends[1].latencies.append(1.0)
+    assert asyncio.run(pool.call(chat)).startswith("reply from stub")
+    assert pool.backends[0].state == "open"
+
+
+def test_client_errors_are_not_retried(stubs):
+    pool = _pool([stubs(delay=0.0), stubs(delay=0.0)])
+
+    async def bad(client):
+        raise StubError(400)
+
+    with pytest.raises(StubError):
+        asyncio.run(pool.call(bad))
+    assert pool.stats["failovers"] == 0
+    assert all(b.state == "closed" for b in pool.backends)
+
+
+def test_only_the_picked_backend_goes_half_open():
+    pool = _pool(["http://a", "http://b", "http://c"], cooldown=1.0)
+    for backend in pool.backends:
+        backend.state, backend.opened_at = "open", time.monotonic() - 5.0
+    pool.backends[2].opened_at = time.monotonic()  # still cooling down
+
+    trial = pool.pick()
+    assert trial in pool.backends[:2] and trial.state == "half_open"
+    assert sorted(b.state for b in pool.backends) == ["half_open", "open", "open"]
+
+    second = pool.pick()  # the other cooled-down backend gets its own trial
+    assert second is not trial and second.state == "half_open"
+    assert pool.pick() is None
+
+
+def test_half_open_trial_closes_or_reopens(stubs):
+    healthy, broken = stubs(delay=0.0), stubs(delay=0.0, failure_rate=1.0)
+    for url, state in ((healthy, "closed"), (broken, "open")):
+        pool = _pool([url], cooldown=0.0, max_attempts=1)
+        backend = pool.backends[0]
+        backend.state, backend.opened_at = "open", time.monotonic() - 1.0
+        try:
+            asyncio.run(pool.call(chat))
+        except StubError:
+            pass
+        assert backend.state == state
+
+
+def test_slow_requests_are_hedged(stubs):
+    slow, fast = stubs(delay=2.0), stubs(delay=0.0)
+    pool = _pool([slow, fast], hedge=True, hedge_min_delay=0.05)
+    pool._latencies.extend([0.05] * 20)
+    pool.backends[1].latencies.append(0.5)  # the slow one is picked first
+
+    async def run():
+        start = time.perf_counter()
+        reply = await pool.call(chat)
+        return reply, time.perf_counter() - start
+
+    reply, elapsed = asyncio.run(run())
+    assert reply.endswith(fast.rsplit(":", 1)[1])
+    assert elapsed < 1.0
+    assert pool.stats["hedged"] == 1 and pool.backends[1].stats["hedges_won"] == 1
+
+
+def test_health_checks_close_recovered_breakers(stubs):
+    pool = _pool([stubs(delay=0.0)], health_check=tags, health_interval=0.05, cooldown=60.0)
+    backend = pool.backends[0]
+
+    async def run():
+        pool._ensure_health_checks()
+        backend.state, backend.opened_at = "open", time.monotonic()
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if backend.state == "closed":
+                break
+        pool._health_task.cancel()
+
+    asyncio.run(run())
+    assert backend.state == "closed"
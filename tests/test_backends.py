@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+pytest.importorskip("tellurium")
+
+from llm_service.servers import mcp_server, simulation  # noqa: E402
+from llm_service.servers.endpoint import app  # noqa: E402
+
+MODEL = "S1 -> S2; k1*S1; k1 = 0.3; S1 = 10; S2 = 0"
+
+REQUESTS = [
+    ("GET", "/version", None),
+    ("POST", "/echo", {"hello": "world"}),
+    ("POST", "/simulate", {"antimony": MODEL, "t_start": 0, "t_end": 20, "n_steps": 50}),
+    ("POST", "/simulate", {"antimony": MODEL, "t_start": 0, "t_end": 20, "n_steps": 50,
+                           "output": "adaptive", "parameters": {"k1": 0.1}}),
+]
+
+
+@pytest.fixture(scope="module")
+def endpoint_url():
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _call_all(backend, monkeypatch, endpoint_url, requests=REQUESTS):
+    monkeypatch.setattr(mcp_server, "LOCAL_API_BASE", endpoint_url)
+    mcp_server.configure_backend(backend, workers=1)
+
+    async def run():
+        try:
+            return [await mcp_server.call_local_api(method, path, json=payload)
+                    for method, path, payload in requests]
+        finally:
+            await mcp_server.get_http_client().aclose()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        mcp_server.configure_backend("http")
+
+
+def test_backends_return_the_same_bodies(monkeypatch, endpoint_url):
+    expected = []
+    for method, path, payload in REQUESTS:
+        body, code = simulation.handle_request(method, path, payload)
+        assert code == 200, body
+        expected.append(body)
+
+    for backend in mcp_server.BACKENDS:
+        assert _call_all(backend, monkeypatch, endpoint_url) == expected, backend
+
+
+def test_backends_agree_on_errors(monkeypatch, endpoint_url):
+    bad = {"antimony": MODEL, "n_steps": "many"}
+    body, code = simulation.handle_request("POST", "/simulate", bad)
+    assert code == 400 and "error" in body
+    for backend in mcp_server.BACKENDS:
+        assert _call_all(backend, monkeypatch, endpoint_url, [("POST", "/simulate", bad)]) == [None], backend
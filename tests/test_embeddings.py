@@ -0,0 +1,41 @@
+import sys
+import types
+
+import pytest
+
+from llm_service.clients import embeddings
+
+
+class _TorchModel:
+    backend = "torch"
+
+    def __init__(self, name, device=None):
+        self.name = name
+
+
+@pytest.fixture
+def no_onnx(monkeypatch):
+    """
+    sentence-transformers with only the torch backend available
+    """
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=_TorchModel))
+
+    def missing(model_name, quantize):
+        raise ImportError("No module named 'optimum'")
+
+    monkeypatch.setattr(embeddings, "_load_onnx", missing)
+
+
+def test_service_falls_back_to_torch(no_onnx):
+    assert isinstance(embeddings.create_embedder("m", "onnx"), _TorchModel)
+
+
+def test_fallback_can_be_refused(no_onnx):
+    with pytest.raises(ImportError):
+        embeddings.create_embedder("m", "onnx", fallback=False)
+
+
+def test_benchmark_never_labels_torch_as_onnx(no_onnx):
+    with pytest.raises(ImportError):
+        embeddings.benchmark_backend("onnx-int8", "m")
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pytest
+
+from llm_service.servers.fitting import (FAILED, MAX_ITERATIONS, MAX_POPULATION, FitProblem,
+                                         differential_evolution, run_fit)
+from llm_service.servers.jobs import Cancelled, Job
+
+MODEL = "S1 -> S2; k1*S1; k1 = 0.3; S1 = 10; S2 = 0"
+
+
+def _payload(**changes):
+    payload = {
+        "antimony": MODEL,
+        "parameters": {"k1": [0.01, 1.0]},
+        "data": {"time": [0, 1, 2, 4], "S1": [10, 7.4, 5.5, 3.0]},
+    }
+    payload.update(changes)
+    return payload
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"antimony": ""}, "antimony"),
+    ({"parameters": {}}, "parameters"),
+    ({"parameters": ["k1"]}, "parameters"),
+    ({"parameters": {"k1": [1.0, 0.5]}}, "lower < upper"),
+    ({"parameters": {"k1": [0.1]}}, "lower < upper"),
+    ({"data": {"S1": [1, 2]}}, "'time' column"),
+    ({"data": {"time": [0, 1]}}, "one species"),
+    ({"data": {"time": [0], "S1": [1]}}, "two time points"),
+    ({"data": {"time": [0, 2, 1], "S1": [1, 2, 3]}}, "strictly increasing"),
+    ({"data": {"time": [-1, 2], "S1": [1, 2]}}, "non-negative"),
+    ({"data": {"time": [0, 1, 2], "S1": [1, 2]}}, "as many values"),
+    ({"max_iterations": 0}, "max_iterations"),
+    ({"max_iterations": MAX_ITERATIONS + 1}, "max_iterations"),
+    ({"population": MAX_POPULATION + 1}, "population"),
+    ({"population": 10 ** 9}, "population"),
+    ({"workers": "many"}, "invalid literal"),
+])
+def test_invalid_requests_are_rejected(changes, message):
+    with pytest.raises(ValueError, match=message):
+        FitProblem(_payload(**changes))
+
+
+def test_wide_positive_bounds_are_searched_in_log_space():
+    problem = FitProblem(_payload(parameters={"k1": [1e-3, 10.0], "k2": [0.5, 2.0], "k3": [-1.0, 1e3]}))
+    assert problem.log_scale.tolist() == [True, False, False]
+    np.testing.assert_allclose(problem.from_unit(np.array([0.5, 0.5, 0.5])), [0.1, 1.25, 499.5])
+    np.testing.assert_allclose(problem.from_unit(np.array([[0.0, 0.0, 0.0], [1.2, 1.0, 1.0]])),
+                               [[1e-3, 0.5, -1.0], [10.0, 2.0, 1e3]])
+
+
+@pytest.mark.parametrize("workers, expected", [
+    (1, 1), (-4, 1), (512, os.cpu_count() or 1), (None, os.cpu_count() or 1),
+])
+def test_workers_are_clamped_to_the_cores(workers, expected):
+    assert FitProblem(_payload(workers=workers)).workers == expected
+
+
+def test_default_population_respects_the_cap():
+    problem = FitProblem(_payload(parameters={f"k{i}": [0, 1] for i in range(100)}))
+    assert problem.population == MAX_POPULATION
+
+
+def test_defaults_scale_with_the_parameters():
+    problem = FitProblem(_payload(parameters={f"k{i}": [0, 1] for i in range(4)}))
+    assert problem.population == 20
+    assert problem.max_iterations == 50
+
+
+def _sphere(batch):
+    return np.sum((batch - 0.3) ** 2, axis=1)
+
+
+def test_differential_evolution_finds_the_minimum():
+    population, fitness, evaluations, iterations, converged = differential_evolution(
+        _sphere, dim=3, size=15, max_iterations=300, tolerance=1e-10, rng=np.random.default_rng(0))
+    best = population[np.argmin(fitness)]
+    np.testing.assert_allclose(best, [0.3, 0.3, 0.3], atol=1e-3)
+    assert converged
+    assert evaluations == 15 * (iterations + 1)
+
+
+def test_differential_evolution_is_reproducible_and_reports_generations():
+    runs, reports = [], []
+    for _ in range(2):
+        seen = []
+        runs.append(differential_evolution(_sphere, 2, 8, 10, 0.0, np.random.default_rng(42),
+                                           lambda generation, best: seen.append((generation, best))))
+        reports.append(seen)
+    np.testing.assert_array_equal(runs[0][0], runs[1][0])
+    assert reports[0] == reports[1]
+    assert [g for g, _ in reports[0]] == list(range(1, 11))
+    best_values = [b for _, b in reports[0]]
+    assert best_values == sorted(best_values, reverse=True)  # never gets worse
+
+
+def test_failed_evaluations_never_count_as_converged():
+    def score(batch):
+        return np.full(len(batch), FAILED)
+
+    *_, converged = differential_evolution(score, 1, 6, 5, 1.0, np.random.default_rng(1))
+    assert not converged
+
+
+def test_on_generation_can_stop_the_search():
+    def stop(generation, best):
+        if generation == 3:
+            raise Cancelled("stop")
+
+    with pytest.raises(Cancelled):
+        differential_evolution(_sphere, 2, 6, 50, 0.0, np.random.default_rng(0), stop)
+
+
+def test_fit_recovers_a_rate_constant():
+    pytest.importorskip("tellurium")
+    times = np.linspace(0, 5, 6)
+    data = {"time": times.tolist(), "S1": (10 * np.exp(-0.3 * times)).tolist()}
+    progress = []
+    job = Job(lambda fraction, message: progress.append(fraction))
+    result = run_fit(FitProblem(_payload(data=data, workers=1, seed=0, max_iterations=12, population=6)), job)
+    assert result["parameters"]["k1"] == pytest.approx(0.3, rel=1e-2)
+    assert result["sse"] < 1e-2
+    assert progress and progress == sorted(progress)
@@ -0,0 +1,48 @@
+import pytest
+
+from llm_service.clients.intent_parser import DEFAULT_N_STEPS, parse_intent
+
+MODEL = "S1 -> S2; k1*S1; k1=0.1; S1=10"
+
+
+@pytest.mark.parametrize("query, t_end, n_steps", [
+    (f"simulate `{MODEL}` from 0 to 50", 50, DEFAULT_N_STEPS),
+    (f"Please simulate this model `{MODEL}` from 0 to 50 with 200 points.", 50, 200),
+    (f"run `{MODEL}` for 20 time units", 20, DEFAULT_N_STEPS),
+    (f"Could you simulate `{MODEL}` for 20, using 50 steps?", 20, 50),
+])
+def test_plain_simulate_commands_take_the_fast_path(query, t_end, n_steps):
+    intent = parse_intent(query)
+    assert intent is not None
+    assert intent.tool == "tellurium_simulate"
+    assert intent.arguments == {"antimony": MODEL, "t_start": 0, "t_end": t_end, "n_steps": n_steps}
+
+
+@pytest.mark.parametrize("query", [
+    f"simulate `{MODEL}` from 0 to 50 with k1 set to 0.5",
+    f"simulate `{MODEL}` from 0 to 50 then double k1",
+    f"simulate `{MODEL}` from 0 to 50 and show S2 only",
+    f"simulate `{MODEL}` from 0 to 50 and explain the result",
+    f"simulate `{MODEL}` from 0 to 50 with 200 points at steady state",
+])
+def test_leftover_requests_go_to_the_llm(query):
+    assert parse_intent(query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "simulate a decay model from 0 to 50",  # no model given
+    f"simulate `{MODEL}`",  # no time range
+    f"simulate `{MODEL}` from 50 to 0",  # invalid range
+    f"simulate `{MODEL}` from 0 to 50 with 5 points",  # outside the tool's step limits
+])
+def test_incomplete_or_invalid_commands_go_to_the_llm(query):
+    assert parse_intent(query) is None
+
+
+@pytest.mark.parametrize("query, tool", [
+    ("status", "status"),
+    ("Is the server up?", "status"),
+    ("what tellurium version is installed?", "tellurium_version"),
+])
+def test_status_and_version(query, tool):
+    assert parse_intent(query).tool == tool
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from llm_service.servers import endpoint, jobs
+from llm_service.servers.admission import AdmissionController
+from llm_service.servers.mcp_server import job_id_of, progress_reporter
+
+
+def _blocking_handler(started, finish, check=True):
+    def handler(payload, job):
+        started.set()
+        while not finish.wait(0.01):
+            if check:
+                job.check()
+        return {"ok": True}, 200
+    return handler
+
+
+def test_stream_events_yields_progress_then_result():
+    def handler(payload, job):
+        job.report(0.5, "half")
+        return {"echo": payload}, 200
+
+    events = list(jobs.stream_events(handler, {"x": 1}))
+    assert [e["type"] for e in events] == ["job", "progress", "result"]
+    assert events[-1] == {"type": "result", "status": 200, "body": {"echo": {"x": 1}}}
+
+
+def test_closed_stream_cancels_and_finishes_on_the_job_thread():
+    started, finish, done = threading.Event(), threading.Event(), threading.Event()
+    stream = jobs.stream_events(_blocking_handler(started, finish), None, on_finish=done.set,
+                                job_id="a" * 32)
+    assert started.wait(5)
+    assert stream.job.id == "a" * 32
+    stream.close()
+    assert done.wait(5)
+    assert not jobs.cancel_job("a" * 32)  # unregistered once the handler returned
+
+
+def test_malformed_job_ids_are_replaced():
+    assert jobs.valid_job_id("ab" * 16) == "ab" * 16
+    assert jobs.valid_job_id("../status") is None
+    assert jobs.valid_job_id(42) is None
+
+
+def test_streamed_slot_is_held_until_the_handler_returns():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=0)
+    started, finish = threading.Event(), threading.Event()
+    app = Flask(__name__)
+    app.add_url_rule("/run", "run", lambda: endpoint.run_streamed(controller, _blocking_handler(started, finish, check=False)),
+                     methods=["POST"])
+    client = app.test_client()
+
+    resp = client.post("/run", json={}, buffered=False, headers={"X-Job-Id": "b" * 32})
+    first = json.loads(next(resp.response))
+    assert first == {"type": "job", "job_id": "b" * 32}
+    assert started.wait(5)
+    resp.close()  # the client went away, but the handler has not reached a check yet
+    assert client.post("/run", json={}).status_code == 429
+
+    finish.set()
+    for _ in range(500):
+        if controller.get_stats()["running"] == 0:
+            break
+        time.sleep(0.01)
+    assert controller.get_stats()["running"] == 0
+
+
+def _ctx(meta):
+    return SimpleNamespace(request_context=SimpleNamespace(meta=meta))
+
+
+def test_progress_reporter_needs_a_progress_token():
+    assert progress_reporter(None) is None
+    assert progress_reporter(_ctx(None)) is None
+    assert progress_reporter(_ctx(SimpleNamespace(progressToken=None))) is None
+    assert progress_reporter(_ctx(SimpleNamespace(progressToken=7))) is not None
+
+
+def test_job_id_from_meta():
+    assert job_id_of(_ctx(SimpleNamespace(job_id="c" * 32))) == "c" * 32
+    assert job_id_of(_ctx(SimpleNamespace(job_id="nope"))) is None
+    assert job_id_of(_ctx(None)) is None
+
+
+def test_mcp_server_cancels_a_job_by_its_client_id(monkeypatch):
+    from starlette.testclient import TestClient
+    from llm_service.servers import mcp_server
+
+    monkeypatch.setattr(mcp_server, "SIMULATION_BACKEND", "inprocess")
+    job = jobs.register(jobs.Job(job_id="d" * 32))
+    try:
+        with TestClient(mcp_server.mcp.streamable_http_app()) as client:
+            assert client.delete("/jobs/" + "d" * 32).status_code == 200
+            assert client.delete("/jobs/" + "e" * 32).status_code == 404
+        assert job.cancelled.is_set()
+    finally:
+        jobs.unregister(job)
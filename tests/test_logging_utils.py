@@ -0,0 +1,75 @@
+import logging
+import queue
+import sys
+
+from llm_service.utils import logging_utils
+from llm_service.utils.logging_utils import SamplingFilter, Truncated, _RenderingQueueHandler
+
+
+def _record(msg="Calling tool %s", args=("x",), level=logging.INFO):
+    return logging.LogRecord("llm_service.test", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_limits_each_template(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_utils.time, "monotonic", lambda: now[0])
+    sampler = SamplingFilter(2)
+    assert [sampler.filter(_record()) for _ in range(4)] == [True, True, False, False]
+    assert sampler.filter(_record("Other template"))
+    assert sampler.filter(_record(level=logging.WARNING))
+
+    now[0] += 0.5
+    record = _record()
+    assert sampler.filter(record)
+    assert record.suppressed == 2
+
+
+def test_sampling_below_one_per_second(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_utils.time, "monotonic", lambda: now[0])
+    sampler = SamplingFilter(0.5)
+    assert sampler.filter(_record())
+    assert not sampler.filter(_record())
+    now[0] += 1.0
+    assert not sampler.filter(_record())
+    now[0] += 1.5
+    assert sampler.filter(_record())
+
+
+def test_sampling_disabled():
+    sampler = SamplingFilter(0)
+    assert all(sampler.filter(_record()) for _ in range(100))
+
+
+def test_truncated_is_bounded():
+    args = {"antimony": "S1 -> S2; k1*S1\n" * 100000, "xs": list(range(1000))}
+    text = str(Truncated(args, 50))
+    assert len(text) < 1000
+    assert "chars)" in text and "items)" in text
+
+
+def test_queue_handler_renders_at_call_time():
+    records = queue.SimpleQueue()
+    handler = _RenderingQueueHandler(records)
+    args = {"k1": 1}
+    handler.handle(_record("args: %s", (Truncated(args),)))
+    args["k1"] = 2
+    args.update({f"p{i}": i for i in range(100)})
+
+    record = records.get_nowait()
+    assert record.getMessage() == "args: {'k1': 1}"
+    assert record.args is None
+
+
+def test_queue_handler_keeps_exception_text():
+    records = queue.SimpleQueue()
+    handler = _RenderingQueueHandler(records)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logging.LogRecord("llm_service.test", logging.ERROR, __file__, 1, "boom", None,
+                                   sys.exc_info())
+    handler.handle(record)
+    queued = records.get_nowait()
+    assert queued.exc_info is None
+    assert "ZeroDivisionError" in logging_utils.JsonFormatter().format(queued)
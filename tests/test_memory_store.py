@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from llm_service.clients import memory_store  # noqa: E402
+from llm_service.clients.memory_store import MemoryStore  # noqa: E402
+
+DIM = 8
+
+
+def _vector(i: int) -> np.ndarray:
+    return np.random.default_rng(i).random(DIM, dtype=np.float32)
+
+
+def test_search_skips_expired_entries_that_are_not_evicted_yet(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_store.time, "time", lambda: now[0])
+    store = MemoryStore(DIM, capacity=100, max_age=60.0)
+    query = _vector(0)
+    # Old entries sit right on the query; newer ones further away
+    for i in range(10):
+        store.add("s", f"old {i}", "", query + 1e-4 * i)
+    now[0] += 30
+    for i in range(5):
+        store.add("s", f"new {i}", "", _vector(i + 1))
+    now[0] += 40  # the old entries expire, but no add has evicted them
+
+    found = store.search("s", query, 3)
+    assert len(found) == 3
+    assert all(e.user_msg.startswith("new") for e in found)
+
+
+def test_search_skips_tombstones():
+    store = MemoryStore(DIM, capacity=100, compact_ratio=10.0)
+    ids = [store.add("s", str(i), "", _vector(0) + 1e-4 * i) for i in range(10)]
+    store.add("s", "kept", "", _vector(1))
+    store.remove("s", ids)
+    assert [e.user_msg for e in store.search("s", _vector(0), 1)] == ["kept"]
+
+
+def test_namespaces_are_isolated():
+    store = MemoryStore(DIM)
+    store.add("a", "from a", "", _vector(0))
+    store.add("b", "from b", "", _vector(0))
+    assert [e.user_msg for e in store.search("a", _vector(0), 5)] == ["from a"]
+    assert store.drop_namespace("a") == 1
+    assert store.search("a", _vector(0), 5) == []
+
+
+def test_searches_and_compaction_run_concurrently():
+    store = MemoryStore(DIM, capacity=50, compact_ratio=0.1)
+    errors = []
+
+    def writer():
+        for i in range(400):
+            store.add("s", str(i), "", _vector(i))
+
+    def reader():
+        try:
+            for i in range(200):
+                found = store.search("s", _vector(i), 5)
+                assert len(found) <= 5 and len({e.entry_id for e in found}) == len(found)
+        except Exception as e:  # surfaced in the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.compact("s")
+    stats = store.get_stats("s")
+    assert not errors
+    assert stats["size"] == 50 and stats["compactions"] >= 1
+    assert len(store.search("s", _vector(0), 10)) == 10
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+pytest.importorskip("tellurium")
+
+from llm_service.servers.model_cache import ModelCache  # noqa: E402
+
+MODELS = [f"S1 -> S2; k{i}*S1; k{i} = 0.1; S1 = 10; S2 = 0" for i in range(3)]
+
+
+def test_checked_out_models_do_not_count_toward_the_memory_limit(tmp_path):
+    cache = ModelCache(str(tmp_path), max_in_memory=2)
+    for model in MODELS[:2]:
+        with cache.checkout(model):
+            pass
+    assert cache.get_stats()["models_in_memory"] == 2
+
+    with cache.checkout(MODELS[0]):
+        # Its only idle instance is in use, so just MODELS[1] is held idle
+        assert cache.get_stats()["models_in_memory"] == 1
+        with cache.checkout(MODELS[2]):
+            pass
+        assert cache.get_stats()["models_in_memory"] == 2
+    stats = cache.get_stats()
+    assert stats["models_in_memory"] == 2
+    assert stats["memory_hits"] == 1 and stats["compiles"] == 3
+
+
+def test_stats_are_counted_under_concurrency(tmp_path):
+    ModelCache(str(tmp_path)).warm_up(MODELS[:1])  # persisted for the disk hits below
+    cache = ModelCache(str(tmp_path))
+
+    def borrow():
+        for _ in range(5):
+            with cache.checkout(MODELS[0]):
+                pass
+
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.get_stats()
+    assert stats["memory_hits"] + stats["disk_hits"] + stats["compiles"] == 20
+    assert stats["disk_hits"] >= 1 and stats["compiles"] == 0
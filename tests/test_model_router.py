@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+from llm_service.clients.model_router import ModelRouter
+
+TOOLS = [SimpleNamespace(name=n) for n in ("tellurium_simulate", "tellurium_version", "echo")]
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "simulate the model"}]
+
+
+class FakeAdapter:
+    def __init__(self, model_name, history):
+        self.model_name = model_name
+        self.history = history
+        self.calls = []
+
+    async def process_query(self, messages, tools, mcp_session):
+        self.calls.append((messages, tools))
+        return list(self.history)
+
+
+def _route(small_history):
+    large = FakeAdapter("large", [{"role": "assistant", "content": "S1 decays to 3.0", "has_tool_calls": False}])
+    router = ModelRouter(FakeAdapter("small", small_history), large)
+    history = asyncio.run(router.process_query(MESSAGES, TOOLS, mcp_session=None))
+    return router, large, history
+
+
+def test_confident_small_answer_is_not_escalated():
+    router, large, history = _route([{"role": "assistant", "content": "done", "has_tool_calls": False}])
+    assert not large.calls
+    assert history[-1]["content"] == "done"
+    assert router.get_stats()["small"]["escalations"] == 0
+
+
+def test_escalation_continues_from_the_small_models_tool_results():
+    simulated = {"role": "tool", "name": "tellurium_simulate", "arguments": {"end": 10}, "result": "S1: 3.0"}
+    failed = {"role": "tool_error", "name": "echo", "error": "boom"}
+    router, large, history = _route([
+        {"role": "assistant", "content": "", "has_tool_calls": True},
+        simulated,
+        failed,
+        {"role": "assistant_final", "content": "I'm not sure"},
+    ])
+
+    (messages, tools), = large.calls
+    assert messages[:2] == MESSAGES
+    assert messages[-1]["role"] == "system"
+    assert "tellurium_simulate" in messages[-1]["content"] and "S1: 3.0" in messages[-1]["content"]
+    # The simulation already ran; the failed tool may be retried
+    assert [t.name for t in tools] == ["tellurium_version", "echo"]
+    assert history[:2] == [simulated, failed]
+    assert history[-1]["content"] == "S1 decays to 3.0"
+    assert router.get_stats()["small"]["escalations"] == 1
+
+
+def test_escalation_without_tool_calls_reruns_the_query_unchanged():
+    _, large, _ = _route([{"role": "assistant", "content": "I don't know", "has_tool_calls": False}])
+    (messages, tools), = large.calls
+    assert messages == MESSAGES and tools == TOOLS
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import signal
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from llm_service.servers.server_manager import ServerManager
+from llm_service.sessions import SessionManager
+
+
+@pytest.fixture
+def manager():
+    manager = SessionManager(server_script="unused.py")
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def restore_signals():
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
+
+
+def _stuck_session(manager, session_id):
+    """
+    A session whose query never finishes; the returned event is set once
+    the query was cancelled
+    """
+    session = manager.get_session(session_id)
+    cancelled = threading.Event()
+
+    class StuckClient:
+        async def process_query(self, query, on_progress=None):
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "reply"
+
+        async def stop(self):
+            pass
+
+    session.client = StuckClient()
+    return cancelled
+
+
+def test_ctrl_c_during_send_cancels_the_query(manager, restore_signals):
+    ServerManager()  # installs its handlers, as llm_service does on import
+    cancelled = _stuck_session(manager, "s")
+    timer = threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT))
+    timer.start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            manager.send("s", "simulate something")
+    finally:
+        timer.cancel()
+    assert cancelled.wait(5)
+
+
+def test_cancel_from_another_thread(manager):
+    cancelled = _stuck_session(manager, "s")
+    timer = threading.Timer(0.3, manager.cancel, ("s",))
+    timer.start()
+    with pytest.raises(CancelledError):
+        manager.send("s", "simulate something")
+    assert cancelled.wait(5)
@@ -1,5 +1,14 @@
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
 from llm_service import llm_service
+from llm_service.utils.artifact_store import ArtifactStore, find_handles
 
 def load_css():
     with open("assets/styles.css") as f:
@@ -8,6 +17,43 @@ def load_css():
 def init_session():
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+def render_artifacts(text, key):
+    # Only load the stored array when the user asks for the plot or export
+    for artifact_id in find_handles(text):
+        store = ArtifactStore()
+        if not store.exists(artifact_id):
+            continue
+        if st.checkbox(f"Show result {artifact_id[:8]}", key=f"{key}-{artifact_id}"):
+            columns, data = store.load(artifact_id)
+            frame = pd.DataFrame(data, columns=columns).set_index(columns[0])
+            st.line_chart(frame)
+            st.download_button(
+                "Download CSV",
+                frame.to_csv(),
+                file_name=f"{artifact_id}.csv",
+                mime="text/csv",
+                key=f"{key}-{artifact_id}-csv",
+            )
+
+def send_in_background(prompt, session_id, updates):
+    # The script thread must stay free to make st.* calls: a click on Stop
+    # only interrupts the script at its next one
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(llm_service.send_message(
+                prompt, session_id=session_id, on_progress=lambda *update: updates.put(update)))
+        except BaseException as err:
+            future.set_exception(err)
+
+    thread = threading.Thread(target=run, name="chat-send", daemon=True)
+    add_script_run_ctx(thread)  # send_message reports errors with st.error
+    thread.start()
+    return future
 
 def render_chat():
     st.title("Tellurium Chatbot")
@@ -17,9 +63,11 @@ def render_chat():
 
     # display history
     with container:
-        for msg in st.session_state.messages:
+        for i, msg in enumerate(st.session_state.messages):
             with st.chat_message(msg["role"]):
                 st.markdown(msg["content"])
+                if msg["role"] == "assistant":
+                    render_artifacts(msg["content"], key=f"msg-{i}")
 
     # input loop
     if prompt := st.chat_input("Type your message…"):
@@ -28,8 +76,38 @@ def render_chat():
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking…"):
-                reply = llm_service.send_message(prompt)
-                st.markdown(reply)
+            session_id = st.session_state.session_id
+            # Clicking Stop reruns the script, which interrupts the wait below
+            st.button("Stop", key=f"stop-{len(st.session_state.messages)}")
+            status = st.empty()
+            progress = st.empty()
+
+            def show_progress(tool, value, total, message):
+                fraction = min(1.0, value / total) if total else 0.0
+                progress.progress(fraction, text=f"{tool}: {message or f'{fraction:.0%}'}")
+
+            updates = queue.Queue()
+            future = send_in_background(prompt, session_id, updates)
+            start = time.monotonic()
+            try:
+                while True:
+                    try:
+                        reply = future.result(timeout=0.25)
+                        break
+                    except FutureTimeoutError:
+                        pass
+                    while not updates.empty():
+                        show_progress(*updates.get_nowait())
+                    # One st.* call per poll, so a Stop click is noticed even without progress
+                    status.caption(f"Thinking… {time.monotonic() - start:.0f}s")
+            except BaseException:
+                # Stop (or another rerun) interrupted the wait
+                llm_service.cancel_message(session_id)
+                st.session_state.messages.append({"role": "assistant", "content": "Cancelled."})
+                raise
+            status.empty()
+            progress.empty()
+            st.markdown(reply)
+            render_artifacts(reply, key=f"msg-{len(st.session_state.messages)}")
 
         st.session_state.messages.append({"role":"assistant", "content": reply})